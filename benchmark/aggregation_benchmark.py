@@ -0,0 +1,78 @@
+import argparse
+import copy
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fedml_api.model.cv.resnet import resnet56
+from fedml_core.aggregation.weighted_aggregation import FlatWeightedAggregator
+
+
+def loop_aggregate(model_list):
+    training_num = sum(sample_num for sample_num, _ in model_list)
+    (num0, averaged_params) = model_list[0]
+    for k in averaged_params.keys():
+        for i in range(0, len(model_list)):
+            local_sample_number, local_model_params = model_list[i]
+            w = local_sample_number / training_num
+            if i == 0:
+                averaged_params[k] = local_model_params[k] * w
+            else:
+                averaged_params[k] += local_model_params[k] * w
+    return averaged_params
+
+
+def make_client_models(client_num):
+    base = resnet56(10).state_dict()
+    model_list = []
+    for idx in range(client_num):
+        params = copy.deepcopy(base)
+        for k, v in params.items():
+            if v.is_floating_point():
+                v.add_(torch.randn_like(v))
+        model_list.append((100 + idx, params))
+    return model_list
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--client_num', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    model_list = make_client_models(args.client_num)
+
+    loop_times = []
+    for _ in range(args.repeat):
+        copies = [(n, copy.deepcopy(p)) for n, p in model_list]
+        start = time.time()
+        expected = loop_aggregate(copies)
+        loop_times.append(time.time() - start)
+
+    add_times = []
+    reduce_times = []
+    aggregator = FlatWeightedAggregator(args.client_num)
+    for _ in range(args.repeat):
+        start = time.time()
+        for idx, (n, p) in enumerate(model_list):
+            aggregator.add(idx, p, n)
+        add_times.append(time.time() - start)
+        start = time.time()
+        averaged = aggregator.aggregate()
+        reduce_times.append(time.time() - start)
+
+    max_diff = max((averaged[k].double() - expected[k].double()).abs().max().item() for k in expected.keys()
+                   if expected[k].is_floating_point())
+    print('clients: {}, params: {}'.format(args.client_num, aggregator.layout.numel))
+    print('loop aggregate:         {:.4f}s'.format(min(loop_times)))
+    print('flat pack (on arrival): {:.4f}s'.format(min(add_times)))
+    print('flat reduce:            {:.4f}s'.format(min(reduce_times)))
+    print('max abs diff:           {:.3e}'.format(max_diff))
+
+
+if __name__ == '__main__':
+    main()
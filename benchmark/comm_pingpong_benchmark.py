@@ -0,0 +1,116 @@
+"""Ping-pong round-trip latency between two ranks for each communication backend.
+
+    MPI:        mpirun -np 2 python comm_pingpong_benchmark.py --backend MPI
+    GRPC/TRPC:  python comm_pingpong_benchmark.py --backend GRPC
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fedml_core.distributed.communication.message import Message
+from fedml_core.distributed.communication.observer import Observer
+
+MSG_TYPE_PING = 1
+MSG_TYPE_PONG = 2
+MSG_TYPE_STOP = 3
+
+
+class PingPong(Observer):
+    def __init__(self, com_manager, rank, args):
+        self.com_manager = com_manager
+        self.rank = rank
+        self.args = args
+        self.round_trips = []
+        self.sent_at = 0
+        self.done = threading.Event()
+
+    def send(self, msg_type):
+        message = Message(msg_type, self.rank, 1 - self.rank)
+        message.add_params(Message.MSG_ARG_KEY_MODEL_PARAMS, {'weight': torch.zeros(self.args.param_num)})
+        self.sent_at = time.time()
+        self.com_manager.send_message(message)
+
+    def receive_message(self, msg_type, msg_params) -> None:
+        if msg_type == MSG_TYPE_STOP:
+            self.finish()
+        elif msg_type == MSG_TYPE_PING:
+            self.send(MSG_TYPE_PONG)
+        else:
+            self.round_trips.append(time.time() - self.sent_at)
+            if len(self.round_trips) < self.args.iterations:
+                self.send(MSG_TYPE_PING)
+            else:
+                self.send(MSG_TYPE_STOP)
+                rtt = np.array(self.round_trips[1:] if len(self.round_trips) > 1 else self.round_trips) * 1000
+                print('{}: {} round trips, median {:.3f} ms, p90 {:.3f} ms'.format(
+                    self.args.backend, len(rtt), np.median(rtt), np.percentile(rtt, 90)))
+                self.finish()
+
+    def finish(self):
+        self.com_manager.stop_receive_message()
+        self.done.set()
+
+
+def create_com_manager(rank, args):
+    if args.backend == "MPI":
+        from mpi4py import MPI
+        from fedml_core.distributed.communication.mpi.com_manager import MpiCommunicationManager
+        return MpiCommunicationManager(MPI.COMM_WORLD, rank, 2, node_type="server" if rank == 0 else "client")
+    elif args.backend == "GRPC":
+        from fedml_core.distributed.communication.gRPC.grpc_comm_manager import GRPCCommManager
+        return GRPCCommManager("127.0.0.1", 8888 + rank, args.config_path, client_id=rank, client_num=1)
+    else:
+        from fedml_core.distributed.communication.trpc.trpc_comm_manager import TRPCCommManager
+        return TRPCCommManager(args.config_path, process_id=rank, world_size=2)
+
+
+def run(rank, args):
+    com_manager = create_com_manager(rank, args)
+    ping_pong = PingPong(com_manager, rank, args)
+    com_manager.add_observer(ping_pong)
+    if rank == 0:
+        # give the peer time to come up before the first ping
+        time.sleep(1)
+        ping_pong.send(MSG_TYPE_PING)
+    # MPI blocks here until stopped, gRPC and TRPC return after starting their receive thread
+    com_manager.handle_receive_message()
+    ping_pong.done.wait()
+
+
+def write_config(backend):
+    f = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+    if backend == "GRPC":
+        f.write('receiver_id,ip\n0,127.0.0.1\n1,127.0.0.1\n')
+    else:
+        f.write('master_ip,master_port\n127.0.0.1,29500\n')
+    f.close()
+    return f.name
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', type=str, default='GRPC')  # "MPI" or "GRPC" or "TRPC"
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--param_num', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.backend == "MPI":
+        from mpi4py import MPI
+        run(MPI.COMM_WORLD.Get_rank(), args)
+    else:
+        args.config_path = write_config(args.backend)
+        mp.spawn(run, args=(args,), nprocs=2, join=True)
+        os.remove(args.config_path)
+
+
+if __name__ == '__main__':
+    main()
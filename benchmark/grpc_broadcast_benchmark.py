@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import grpc
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fedml_core.distributed.communication.gRPC import grpc_comm_manager_pb2, grpc_comm_manager_pb2_grpc
+from fedml_core.distributed.communication.gRPC.grpc_comm_manager import GRPCCommManager
+from fedml_core.distributed.communication.message import Message
+
+PORT_BASE = 8888
+
+
+def write_ip_config(client_num):
+    f = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+    f.write('receiver_id,ip\n')
+    for receiver_id in range(client_num + 1):
+        f.write('{},127.0.0.1\n'.format(receiver_id))
+    f.close()
+    return f.name
+
+
+def make_message(receiver_id, param_num):
+    message = Message(1, 0, receiver_id)
+    message.add_params(Message.MSG_ARG_KEY_MODEL_PARAMS, {'weight': torch.randn(param_num)})
+    return message
+
+
+def wait_for_delivery(receivers):
+    for receiver in receivers:
+        receiver.grpc_servicer.message_q.get()
+
+
+def broadcast_one_channel_per_message(server, receivers, param_num):
+    # the previous GRPCCommManager.send_message: new channel per message, one receiver after another
+    for receiver_id in range(1, len(receivers) + 1):
+        channel = grpc.insecure_channel('127.0.0.1:{}'.format(PORT_BASE + receiver_id), options=server.opts)
+        stub = grpc_comm_manager_pb2_grpc.gRPCCommManagerStub(channel)
+        request = grpc_comm_manager_pb2.CommRequest()
+        request.client_id = server.client_id
+        request.message = bytes(make_message(receiver_id, param_num).to_bytes())
+        stub.sendMessage(request)
+        channel.close()
+    wait_for_delivery(receivers)
+
+
+def broadcast_pooled(server, receivers, param_num):
+    for receiver_id in range(1, len(receivers) + 1):
+        server.send_message(make_message(receiver_id, param_num))
+    server.flush()
+    wait_for_delivery(receivers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--client_nums', nargs='+', type=int, default=[1, 4, 16, 32])
+    parser.add_argument('--param_num', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    max_client_num = max(args.client_nums)
+    ip_config_path = write_ip_config(max_client_num)
+    server = GRPCCommManager('127.0.0.1', PORT_BASE, ip_config_path, client_id=0, client_num=max_client_num)
+    receivers = [GRPCCommManager('127.0.0.1', PORT_BASE + i, ip_config_path, client_id=i, client_num=1)
+                 for i in range(1, max_client_num + 1)]
+
+    print('{:>8s} {:>22s} {:>12s}'.format('clients', 'channel per message', 'pooled'))
+    for client_num in args.client_nums:
+        results = []
+        for broadcast in [broadcast_one_channel_per_message, broadcast_pooled]:
+            times = []
+            for _ in range(args.repeat):
+                start = time.time()
+                broadcast(server, receivers[:client_num], args.param_num)
+                times.append(time.time() - start)
+            results.append(min(times))
+        print('{:>8d} {:>21.4f}s {:>11.4f}s'.format(client_num, results[0], results[1]))
+
+    for manager in [server] + receivers:
+        manager.stop_receive_message()
+    os.remove(ip_config_path)
+
+
+if __name__ == '__main__':
+    main()
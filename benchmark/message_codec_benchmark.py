@@ -0,0 +1,59 @@
+import argparse
+import copy
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fedml_api.distributed.fedavg.utils import transform_list_to_tensor, transform_tensor_to_list
+from fedml_core.distributed.communication.message import Message
+from fedml_core.distributed.communication.message_codec import BinaryMessageCodec, JsonMessageCodec
+
+
+def make_model_params(param_num, layer_num):
+    layer_size = param_num // layer_num
+    return {'layer{}.weight'.format(i): torch.randn(layer_size) for i in range(layer_num)}
+
+
+def json_round_trip(model_params):
+    message = Message(3, 0, 1)
+    message.add_params(Message.MSG_ARG_KEY_MODEL_PARAMS, transform_tensor_to_list(copy.copy(model_params)))
+    payload = JsonMessageCodec().encode(message.get_params())
+    received = Message()
+    received.init_from_bytes(payload)
+    transform_list_to_tensor(received.get(Message.MSG_ARG_KEY_MODEL_PARAMS))
+    return len(payload)
+
+
+def binary_round_trip(model_params):
+    message = Message(3, 0, 1)
+    message.add_params(Message.MSG_ARG_KEY_MODEL_PARAMS, model_params)
+    payload = BinaryMessageCodec().encode(message.get_params())
+    received = Message()
+    received.init_from_bytes(bytes(payload))
+    received.get(Message.MSG_ARG_KEY_MODEL_PARAMS)
+    return len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--param_num', type=int, default=10000000)
+    parser.add_argument('--layer_num', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    model_params = make_model_params(args.param_num, args.layer_num)
+    for name, round_trip in [('json/list', json_round_trip), ('binary', binary_round_trip)]:
+        times = []
+        for _ in range(args.repeat):
+            start = time.time()
+            size = round_trip(model_params)
+            times.append(time.time() - start)
+        print('{:10s} round trip: {:.4f}s, payload: {:.1f} MB'.format(name, min(times), size / 1024.0 / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
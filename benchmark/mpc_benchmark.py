@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fedml_api.distributed.turboaggregate.mpc_function import PI, divmod, gen_Lagrange_coeffs, LCC_encoding, \
+    LCC_decoding_with_points
+
+
+def loop_Lagrange_coeffs(alpha_s, beta_s, p):
+    U = np.zeros((len(alpha_s), len(beta_s)), dtype='int64')
+    for i in range(len(alpha_s)):
+        for j in range(len(beta_s)):
+            cur_beta = beta_s[j]
+            den = PI([cur_beta - o for o in beta_s if cur_beta != o], p)
+            num = PI([alpha_s[i] - o for o in beta_s if cur_beta != o], p)
+            U[i][j] = divmod(num, den, p)
+    return U
+
+
+def loop_LCC_encoding(X_sub, U, p):
+    X_LCC = np.zeros((U.shape[0],) + X_sub.shape[1:], dtype='int64')
+    for i in range(U.shape[0]):
+        for j in range(U.shape[1]):
+            X_LCC[i] = np.mod(X_LCC[i] + np.mod(U[i][j] * X_sub[j], p), p)
+    return X_LCC
+
+
+def best_of(repeat, fn, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        result = fn(*args)
+        times.append(time.time() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--client_num', type=int, default=100)
+    parser.add_argument('--K', type=int, default=40)
+    parser.add_argument('--T', type=int, default=10)
+    parser.add_argument('--dim', type=int, default=1000000)
+    parser.add_argument('--prime', type=int, default=2 ** 31 - 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    N, K, T, p = args.client_num, args.K, args.T, args.prime
+    np.random.seed(0)
+    X = np.random.randint(p, size=(args.dim // K * K, 1))
+
+    stt_b, stt_a = -int(np.floor((K + T) / 2)), -int(np.floor(N / 2))
+    beta_s = np.mod(np.arange(stt_b, stt_b + K + T), p)
+    alpha_s = np.mod(np.arange(stt_a, stt_a + N), p)
+
+    loop_coeff_time, U_loop = best_of(1, loop_Lagrange_coeffs, alpha_s, beta_s, p)
+    coeff_time, U = best_of(args.repeat, gen_Lagrange_coeffs, alpha_s, beta_s, p)
+
+    # the same random rows LCC_encoding draws after seeding
+    np.random.seed(1)
+    X_sub = np.concatenate([X.reshape(K, -1)] + [np.random.randint(p, size=(1, X.shape[0] // K)) for _ in range(T)])
+    loop_enc_time, X_loop = best_of(1, loop_LCC_encoding, X_sub, U_loop, p)
+    np.random.seed(1)
+    enc_time, X_LCC = best_of(1, LCC_encoding, X, N, K, T, p)
+
+    # any K + T shares recover the data
+    dec_time, X_dec = best_of(args.repeat, LCC_decoding_with_points, X_LCC[:K + T].reshape(K + T, -1),
+                              alpha_s[:K + T], beta_s[:K], p)
+
+    print('clients: {}, K: {}, T: {}, dim: {}, p: {}'.format(N, K, T, X.shape[0], p))
+    print('Lagrange coeffs  loop: {:.4f}s  vectorized: {:.4f}s  equal: {}'.format(
+        loop_coeff_time, coeff_time, bool((U == U_loop).all())))
+    print('LCC encoding     loop: {:.4f}s  vectorized: {:.4f}s  equal: {}'.format(
+        loop_enc_time, enc_time, bool((X_LCC.reshape(N, -1) == X_loop).all())))
+    print('LCC decoding (K+T shares): {:.4f}s  recovered: {}'.format(
+        dec_time, bool((X_dec.reshape(-1) == X.reshape(-1)).all())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import time
+
+import torch
+import torch.multiprocessing as mp
+import torch.nn as nn
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fedml_api.distributed.split_nn.client import SplitNN_client
+from fedml_api.distributed.split_nn.server import SplitNN_server
+from fedml_api.model.cv.resnet import resnet56
+
+
+def split_model(split_layer=1, class_num=10):
+    torch.manual_seed(0)
+    model = resnet56(class_num=class_num)
+    model.fc = nn.Sequential(nn.Flatten(), nn.Linear(model.fc.in_features, class_num))
+    client_model = nn.Sequential(*nn.ModuleList(model.children())[:split_layer])
+    server_model = nn.Sequential(*nn.ModuleList(model.children())[split_layer:])
+    return client_model, server_model
+
+
+def deliver(queue, latency):
+    # messages carry their send time, the receiver waits until the simulated link has delivered them
+    sent, payload = queue.get()
+    if payload is not None:
+        time.sleep(max(0., sent + latency - time.time()))
+    return payload
+
+
+def server_loop(server_model, acts_queue, grads_queue, latency, num_threads):
+    torch.set_num_threads(num_threads)
+    server = SplitNN_server({"comm": None, "model": server_model, "max_rank": 1})
+    while True:
+        payload = deliver(acts_queue, latency)
+        if payload is None:
+            break
+        batch_idx, acts, labels = payload
+        server.forward_pass(acts.requires_grad_(), labels)
+        grads = server.backward_pass()
+        grads_queue.put((time.time(), (batch_idx, grads)))
+
+
+def run(args, micro_batches, staleness, batches):
+    client_model, server_model = split_model()
+    ctx = mp.get_context('fork')
+    acts_queue, grads_queue = ctx.SimpleQueue(), ctx.SimpleQueue()
+    server_process = ctx.Process(target=server_loop, args=(server_model, acts_queue, grads_queue, args.latency,
+                                                           args.num_threads))
+    server_process.start()
+
+    client = SplitNN_client({"comm": None, "model": client_model, "trainloader": batches, "testloader": [],
+                             "rank": 1, "max_rank": 1, "epochs": 1, "server_rank": 0, "device": "cpu",
+                             "args": argparse.Namespace(pipeline_micro_batches=micro_batches,
+                                                        pipeline_staleness=staleness)})
+    client.train_mode()
+    # same control flow as SplitNNClientManager: fill the window, apply each gradient as it arrives, refill
+    start = time.time()
+    while True:
+        while client.can_forward():
+            acts, labels = client.forward_pass()
+            acts_queue.put((time.time(), (client.batch_idx, acts.detach(), labels)))
+            client.batch_idx += 1
+        if not client.in_flight:
+            break
+        batch_idx, grads = deliver(grads_queue, args.latency)
+        client.backward_pass(grads, batch_idx)
+    elapsed = time.time() - start
+    acts_queue.put((time.time(), None))
+    server_process.join()
+    return len(batches) * args.batch_size / elapsed, client.staleness_seen
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--batch_num', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02, help='one-way link latency in seconds')
+    parser.add_argument('--micro_batches', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--num_threads', type=int, default=1, help='torch threads of each of the two processes')
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.num_threads)
+    torch.manual_seed(0)
+    batches = [(torch.randn(args.batch_size, 3, 32, 32), torch.randint(0, 10, (args.batch_size,)))
+               for _ in range(args.batch_num)]
+
+    print('batches: {} x {}, one-way latency: {:.0f}ms'.format(args.batch_num, args.batch_size, args.latency * 1000))
+    for micro_batches in args.micro_batches:
+        for staleness in sorted({0, micro_batches - 1}):
+            throughput, staleness_seen = run(args, micro_batches, staleness, batches)
+            name = 'lock-step' if micro_batches == 1 else 'in flight {}, staleness <= {}'.format(micro_batches,
+                                                                                               staleness)
+            print('{:32s} {:8.1f} samples/s  (max staleness {})'.format(name, throughput, staleness_seen))
+
+
+if __name__ == '__main__':
+    main()
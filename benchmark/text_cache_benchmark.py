@@ -0,0 +1,97 @@
+"""Cold start of the StackOverflow next-word-prediction data: HDF5 + tokenizer versus the token cache.
+
+Without --data_dir a synthetic StackOverflow-like HDF5 file is generated first.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fedml_api.data_preprocessing import token_cache
+from fedml_api.data_preprocessing.stackoverflow_nwp import utils
+from fedml_api.data_preprocessing.stackoverflow_nwp.data_loader import DEFAULT_TRAIN_FILE
+from fedml_api.data_preprocessing.stackoverflow_nwp.dataset import StackOverflowDataset
+
+
+def write_synthetic_data(data_dir, client_num, samples_per_client):
+    words = ['word{}'.format(i) for i in range(12000)]
+    with open(os.path.join(data_dir, utils.DEFAULT_WORD_COUNT_FILE), 'w') as f:
+        for w in words:
+            f.write('{} 1\n'.format(w))
+    rng = random.Random(0)
+    with h5py.File(os.path.join(data_dir, DEFAULT_TRAIN_FILE), 'w') as h5_file:
+        for client in range(client_num):
+            sentences = [' '.join(rng.choice(words) for _ in range(rng.randint(3, 30)))
+                         for _ in range(rng.randint(1, 2 * samples_per_client))]
+            h5_file['examples/{:08d}/tokens'.format(client)] = np.array([s.encode('utf8') for s in sentences])
+
+
+def iterate_hdf5(data_dir, client_indexes):
+    h5_path = os.path.join(data_dir, DEFAULT_TRAIN_FILE)
+    count = 0
+    for client_idx in client_indexes:
+        ds = StackOverflowDataset(h5_path, client_idx, "train", lambda x: utils.tokenize_sentences(x, data_dir))
+        for i in range(len(ds)):
+            ds[i]
+            count += 1
+    return count
+
+
+def iterate_cache(cache_dir, client_indexes):
+    cache = token_cache.TokenCache(cache_dir)
+    count = 0
+    for client_idx in client_indexes:
+        ds = token_cache.TokenCacheDataset(cache, client_idx)
+        for i in range(len(ds)):
+            ds[i]
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_dir', type=str, default=None)
+    parser.add_argument('--client_num', type=int, default=5000)
+    parser.add_argument('--samples_per_client', type=int, default=40)
+    parser.add_argument('--sampled_clients', type=int, default=50)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    data_dir = args.data_dir
+    if data_dir is None:
+        tmp_dir = data_dir = tempfile.mkdtemp()
+        write_synthetic_data(data_dir, args.client_num, args.samples_per_client)
+
+    cache_dir = token_cache.get_cache_dir(data_dir, 'stackoverflow_nwp_train')
+    if not token_cache.cache_exists(cache_dir):
+        start = time.time()
+        token_cache.write_token_cache(cache_dir, token_cache._stackoverflow_nwp_clients(
+            os.path.join(data_dir, DEFAULT_TRAIN_FILE), data_dir))
+        print('one-time conversion: {:.2f}s'.format(time.time() - start))
+
+    client_num = len(token_cache.TokenCache(cache_dir))
+    client_indexes = np.random.RandomState(0).choice(client_num, min(args.sampled_clients, client_num), replace=False)
+
+    start = time.time()
+    samples = iterate_hdf5(data_dir, client_indexes)
+    hdf5_time = time.time() - start
+    start = time.time()
+    iterate_cache(cache_dir, client_indexes)
+    cache_time = time.time() - start
+    print('cold start + one pass over {} clients ({} samples): hdf5 {:.3f}s, token cache {:.3f}s'.format(
+        len(client_indexes), samples, hdf5_time, cache_time))
+
+    if tmp_dir is not None:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -100,6 +100,36 @@ def load_partition_data_distributed_federated_emnist(process_id, dataset, data_d
     return DEFAULT_TRAIN_CLIENTS_NUM, train_data_num, train_data_global, test_data_global, local_data_num, train_data_local, test_data_local, class_num
 
 
+def load_all_clients(h5_path, client_ids):
+    """Reads the client groups of an h5 file in order into one shared tensor pair.
+
+    Returns the pixels, the labels and the offsets: client i owns samples offsets[i]:offsets[i + 1].
+    """
+    with h5py.File(h5_path, 'r') as h5_file:
+        examples = h5_file[_EXAMPLE]
+        counts = [examples[client_id][_LABEL].shape[0] for client_id in client_ids]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        pixels = examples[client_ids[0]][_IMGAE]
+        x = np.empty((offsets[-1],) + pixels.shape[1:], dtype=pixels.dtype)
+        y = np.empty(offsets[-1], dtype=np.int64)
+        for i, client_id in enumerate(client_ids):
+            start, end = offsets[i], offsets[i + 1]
+            if start == end:
+                continue
+            examples[client_id][_IMGAE].read_direct(x, dest_sel=np.s_[start:end])
+            y[start:end] = examples[client_id][_LABEL][()].reshape(-1)
+    return torch.from_numpy(x), torch.from_numpy(y), offsets
+
+
+def get_client_dataloader(x, y, offsets, client_idx, batch_size):
+    # a view of the shared tensors, no copy per client
+    start, end = offsets[client_idx], offsets[client_idx + 1]
+    return data.DataLoader(dataset=data.TensorDataset(x[start:end], y[start:end]),
+                           batch_size=batch_size,
+                           shuffle=True,
+                           drop_last=False)
+
+
 def load_partition_data_federated_emnist(dataset, data_dir, batch_size=DEFAULT_BATCH_SIZE):
 
     # client ids
@@ -110,13 +140,18 @@ def load_partition_data_federated_emnist(dataset, data_dir, batch_size=DEFAULT_B
         client_ids_train = list(train_h5[_EXAMPLE].keys())
         client_ids_test = list(test_h5[_EXAMPLE].keys())
 
+    # one pass over each file
+    train_x, train_y, train_offsets = load_all_clients(train_file_path, client_ids_train[:DEFAULT_TRAIN_CLIENTS_NUM])
+    test_x, test_y, test_offsets = load_all_clients(test_file_path, client_ids_test[:DEFAULT_TRAIN_CLIENTS_NUM])
+
     # local dataset
     data_local_num_dict = dict()
     train_data_local_dict = dict()
     test_data_local_dict = dict()
 
     for client_idx in range(DEFAULT_TRAIN_CLIENTS_NUM):
-        train_data_local, test_data_local = get_dataloader(dataset, data_dir, batch_size, batch_size, client_idx)
+        train_data_local = get_client_dataloader(train_x, train_y, train_offsets, client_idx, batch_size)
+        test_data_local = get_client_dataloader(test_x, test_y, test_offsets, client_idx, batch_size)
         local_data_num = len(train_data_local) + len(test_data_local)
         data_local_num_dict[client_idx] = local_data_num
         # logging.info("client_idx = %d, local_sample_number = %d" % (client_idx, local_data_num))
@@ -126,26 +161,16 @@ def load_partition_data_federated_emnist(dataset, data_dir, batch_size=DEFAULT_B
         test_data_local_dict[client_idx] = test_data_local
 
     # global dataset
-    train_data_global = data.DataLoader(
-                data.ConcatDataset(
-                    list(dl.dataset for dl in list(train_data_local_dict.values()))
-                ),
-                batch_size=batch_size, shuffle=True)
+    train_data_global = data.DataLoader(data.TensorDataset(train_x, train_y), batch_size=batch_size, shuffle=True)
     train_data_num = len(train_data_global.dataset)
-    
-    test_data_global = data.DataLoader(
-                data.ConcatDataset(
-                    list(dl.dataset for dl in list(test_data_local_dict.values()) if dl is not None)
-                ),
-                batch_size=batch_size, shuffle=True)
+
+    test_data_global = data.DataLoader(data.TensorDataset(test_x, test_y), batch_size=batch_size, shuffle=True)
     test_data_num = len(test_data_global.dataset)
-    
-    # class number
-    train_file_path = os.path.join(data_dir, DEFAULT_TRAIN_FILE)
-    with h5py.File(train_file_path, 'r') as train_h5:
-        class_num = len(np.unique([train_h5[_EXAMPLE][client_ids_train[idx]][_LABEL][0] for idx in range(DEFAULT_TRAIN_CLIENTS_NUM)]))
-        logging.info("class_num = %d" % class_num)
+
+    # class number, from the first label of every client
+    first_labels = train_y[train_offsets[:-1][np.diff(train_offsets) > 0]]
+    class_num = len(np.unique(first_labels.numpy()))
+    logging.info("class_num = %d" % class_num)
 
     return DEFAULT_TRAIN_CLIENTS_NUM, train_data_num, test_data_num, train_data_global, test_data_global, \
            data_local_num_dict, train_data_local_dict, test_data_local_dict, class_num
-
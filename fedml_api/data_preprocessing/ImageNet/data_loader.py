@@ -11,6 +11,7 @@ from .datasets import ImageNet
 from .datasets import ImageNet_truncated
 from .datasets_hdf5 import ImageNet_hdf5
 from .datasets_hdf5 import ImageNet_truncated_hdf5
+from .datasets_hdf5 import SortedBatchSampler
 
 
 logging.basicConfig()
@@ -96,6 +97,14 @@ def get_dataloader_ImageNet_truncated(imagenet_dataset_train, imagenet_dataset_t
     test_ds = dl_obj(imagenet_dataset_test, dataidxs=None, net_dataidx_map=None, train=False, transform=transform_test,
                      download=False)
 
+    if dl_obj == ImageNet_truncated_hdf5:
+        # sorted batches are read from the HDF5 file with a single call each
+        train_dl = data.DataLoader(dataset=train_ds, pin_memory=True, num_workers=4,
+                                   batch_sampler=SortedBatchSampler(data.RandomSampler(train_ds), train_bs, False))
+        test_dl = data.DataLoader(dataset=test_ds, pin_memory=True, num_workers=4,
+                                  batch_sampler=SortedBatchSampler(data.SequentialSampler(test_ds), test_bs, False))
+        return train_dl, test_dl
+
     train_dl = data.DataLoader(dataset=train_ds, batch_size=train_bs, shuffle=True, drop_last=False,
                         pin_memory=True, num_workers=4)
     test_dl = data.DataLoader(dataset=test_ds, batch_size=test_bs, shuffle=False, drop_last=False,
@@ -1,9 +1,15 @@
+import logging
 import os
 import os.path
 
+import numpy as np
 import torch.utils.data as data
 from PIL import Image
 
+from ..image_shards import load_image_shards
+
+IMG_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif']
+
 
 def has_file_allowed_extension(filename, extensions):
     """Checks if a file is an allowed extension.
@@ -97,20 +103,36 @@ class ImageNet(data.Dataset):
             self.data_dir = os.path.join(data_dir, 'val')
 
         self.all_data, self.data_local_num_dict, self.net_dataidx_map = self.__getdatasets__()
+        self.all_rows = np.arange(len(self.all_data))
         if dataidxs == None:
             self.local_data = self.all_data
+            self.local_rows = self.all_rows
         elif type(dataidxs) == int:
             (begin, end) = self.net_dataidx_map[dataidxs]
             self.local_data = self.all_data[begin: end]
+            self.local_rows = self.all_rows[begin: end]
         else:
             self.local_data = []
+            self.local_rows = []
             for idxs in dataidxs:
                 (begin, end) = self.net_dataidx_map[idxs]
                 self.local_data += self.all_data[begin: end]
+                self.local_rows.append(self.all_rows[begin: end])
+            self.local_rows = np.concatenate(self.local_rows) if self.local_rows else np.zeros(0, dtype=np.int64)
+
+        # decoded images written by image_shards.py, in the same order as all_data
+        self.shards = load_image_shards(self.data_dir)
+        if self.shards is not None and \
+                self.shards.keys != [os.path.relpath(path, self.data_dir) for path, _ in self.all_data]:
+            logging.warning("ignoring decoded images of %s, they do not match the image folder" % self.data_dir)
+            self.shards = None
 
     def get_local_data(self):
         return self.local_data
 
+    def get_local_rows(self):
+        return self.local_rows
+
     def get_net_dataidx_map(self):
         return self.net_dataidx_map
 
@@ -121,12 +143,11 @@ class ImageNet(data.Dataset):
         # all_data = datasets.ImageFolder(data_dir, self.transform, self.target_transform)
 
         classes, class_to_idx = find_classes(self.data_dir)
-        IMG_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif']
         all_data, data_local_num_dict, net_dataidx_map = make_dataset(self.data_dir, class_to_idx, IMG_EXTENSIONS)
         if len(all_data) == 0:
             raise (RuntimeError("Found 0 files in subfolders of: " + self.data_dir + "\n"
                                                                                      "Supported extensions are: " + ",".join(
-                extensions)))
+                IMG_EXTENSIONS)))
         return all_data, data_local_num_dict, net_dataidx_map
 
     def __getitem__(self, index):
@@ -140,7 +161,10 @@ class ImageNet(data.Dataset):
         # img, target = self.data[index], self.target[index]
 
         path, target = self.local_data[index]
-        img = self.loader(path)
+        if self.shards is not None:
+            img = self.shards.get_image(self.local_rows[index])
+        else:
+            img = self.loader(path)
         if self.transform is not None:
             img = self.transform(img)
 
@@ -166,16 +190,23 @@ class ImageNet_truncated(data.Dataset):
         self.net_dataidx_map = net_dataidx_map
         self.loader = default_loader
         self.all_data = imagenet_dataset.get_local_data()
+        self.all_rows = imagenet_dataset.get_local_rows()
+        self.shards = imagenet_dataset.shards
         if dataidxs == None:
             self.local_data = self.all_data
+            self.local_rows = self.all_rows
         elif type(dataidxs) == int:
             (begin, end) = self.net_dataidx_map[dataidxs]
             self.local_data = self.all_data[begin: end]
+            self.local_rows = self.all_rows[begin: end]
         else:
             self.local_data = []
+            self.local_rows = []
             for idxs in dataidxs:
                 (begin, end) = self.net_dataidx_map[idxs]
                 self.local_data += self.all_data[begin: end]
+                self.local_rows.append(self.all_rows[begin: end])
+            self.local_rows = np.concatenate(self.local_rows) if self.local_rows else np.zeros(0, dtype=np.int64)
 
     def __getitem__(self, index):
         """
@@ -188,7 +219,10 @@ class ImageNet_truncated(data.Dataset):
         # img, target = self.data[index], self.target[index]
 
         path, target = self.local_data[index]
-        img = self.loader(path)
+        if self.shards is not None:
+            img = self.shards.get_image(self.local_rows[index])
+        else:
+            img = self.loader(path)
         if self.transform is not None:
             img = self.transform(img)
 
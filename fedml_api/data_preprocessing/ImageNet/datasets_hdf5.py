@@ -15,19 +15,62 @@ class DatasetHDF5(data.Dataset):
         t: 'train' or 'val'
         """
         super(DatasetHDF5, self).__init__()
-        self.hf = h5py.File(hdf5fn, 'r', libver='latest', swmr=True)
+        self.hdf5fn = hdf5fn
         self.t = t
-        self.n_images= self.hf['%s_img'%self.t].shape[0]
-        self.dlabel = self.hf['%s_labels'%self.t][...]
-        self.d = self.hf['%s_img'%self.t]
+        with h5py.File(hdf5fn, 'r', libver='latest', swmr=True) as hf:
+            self.n_images = hf['%s_img' % self.t].shape[0]
+            self.dlabel = hf['%s_labels' % self.t][...]
+        # the file is opened lazily, once per process, so forked DataLoader workers never share a handle
+        self._hf = None
+        self._pid = None
         # self.transform = transform
         # self.target_transform = target_transform
 
+    @property
+    def hf(self):
+        if self._hf is None or self._pid != os.getpid():
+            self._hf = h5py.File(self.hdf5fn, 'r', libver='latest', swmr=True)
+            self._pid = os.getpid()
+        return self._hf
+
+    @property
+    def d(self):
+        return self.hf['%s_img' % self.t]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_hf'] = None
+        state['_pid'] = None
+        return state
+
     def _get_dataset_x_and_target(self, index):
         img = self.d[index, ...]
         target = self.dlabel[index]
         return img, np.int64(target)
 
+    def get_batch(self, indexes):
+        """Images and targets of indexes, read from the file in a single call."""
+        indexes = np.asarray(indexes, dtype=np.int64)
+        # h5py needs increasing, unique indexes
+        rows, inverse = np.unique(indexes, return_inverse=True)
+        d = self.d
+        if len(rows) == 0:
+            imgs = np.zeros((0,) + d.shape[1:], dtype=d.dtype)
+        elif d.chunks is not None and self._dense_in_chunks(rows, d.chunks[0]):
+            # most of the chunks in the range are needed anyway: read the whole chunk-aligned range at once
+            chunk_rows = d.chunks[0]
+            begin = rows[0] // chunk_rows * chunk_rows
+            end = min((rows[-1] // chunk_rows + 1) * chunk_rows, self.n_images)
+            imgs = d[begin:end][rows - begin]
+        else:
+            imgs = d[rows]
+        return imgs[inverse], self.dlabel[indexes].astype(np.int64)
+
+    @staticmethod
+    def _dense_in_chunks(rows, chunk_rows):
+        chunks = np.unique(rows // chunk_rows)
+        return chunks[-1] - chunks[0] + 1 <= 2 * len(chunks)
+
     def __getitem__(self, index):
         img, target = self._get_dataset_x_and_target(index)
         # if self.transform is not None:
@@ -36,10 +79,25 @@ class DatasetHDF5(data.Dataset):
         #     target = self.target_transform(target)
         return img, target
 
+    def __getitems__(self, indexes):
+        imgs, targets = self.get_batch(indexes)
+        return [(img, target) for img, target in zip(imgs, targets)]
+
     def __len__(self):
         return self.n_images
 
 
+class SortedBatchSampler(data.BatchSampler):
+    """BatchSampler whose batches are sorted, so a batch is read from the HDF5 file front to back in one call.
+
+    Only the order within a batch changes, which batch a sample lands in is still up to the sampler.
+    """
+
+    def __iter__(self):
+        for batch in super(SortedBatchSampler, self).__iter__():
+            yield sorted(batch)
+
+
 class ImageNet_hdf5(data.Dataset):
 
     def __init__(self, data_dir, dataidxs=None, train=True, transform=None, target_transform=None, download=False):
@@ -112,6 +170,14 @@ class ImageNet_hdf5(data.Dataset):
         """
 
         img, target = self.all_data_hdf5[self.local_data_idx[index]]
+        return self._transform(img, target)
+
+    def __getitems__(self, indexes):
+        # one read for the whole batch (see SortedBatchSampler), only the transforms run per sample
+        imgs, targets = self.all_data_hdf5.get_batch([self.local_data_idx[index] for index in indexes])
+        return [self._transform(img, target) for img, target in zip(imgs, targets)]
+
+    def _transform(self, img, target):
         img = transforms.ToPILImage()(img)
         # img = self.loader(path)
         if self.transform is not None:
@@ -177,6 +243,9 @@ class ImageNet_truncated_hdf5(data.Dataset):
         img, target = self.all_data_hdf5[self.local_data_idx[index]]
         return img, target
 
+    def __getitems__(self, indexes):
+        return self.all_data_hdf5.__getitems__([self.local_data_idx[index] for index in indexes])
+
     def __len__(self):
         return len(self.local_data_idx)
 
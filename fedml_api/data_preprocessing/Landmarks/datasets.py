@@ -5,6 +5,8 @@ import torch.utils.data as data
 from PIL import Image
 from torchvision import transforms
 
+from ..image_shards import load_image_shards
+
 logging.basicConfig()
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -29,6 +31,15 @@ class Landmarks(data.Dataset):
         self.transform = transform
         self.target_transform = target_transform
 
+        # decoded images written by image_shards.py, if data_dir has been converted
+        self.shards = load_image_shards(data_dir)
+        if self.shards is not None:
+            try:
+                self.rows = self.shards.get_rows([f['image_id'] for f in self.local_files])
+            except KeyError as e:
+                logging.warning("image %s has not been decoded, reading the jpg files of %s" % (e, data_dir))
+                self.shards = None
+
     def __len__(self):
         # if self.user_id != None:
         #     return sum([len(local_data) for local_data in self.mapping_per_user.values()])
@@ -46,10 +57,13 @@ class Landmarks(data.Dataset):
         img_name = self.local_files[idx]['image_id']
         label = int(self.local_files[idx]['class'])
 
-        img_name = os.path.join(self.data_dir, str(img_name) + ".jpg")
+        if self.shards is not None:
+            image = self.shards.get_image(self.rows[idx])
+        else:
+            img_name = os.path.join(self.data_dir, str(img_name) + ".jpg")
 
-        # convert jpg to PIL (jpg -> Tensor -> PIL)
-        image = Image.open(img_name)
+            # convert jpg to PIL (jpg -> Tensor -> PIL)
+            image = Image.open(img_name)
         # jpg_to_tensor = transforms.ToTensor()
         # tensor_to_pil = transforms.ToPILImage()
         # image = tensor_to_pil(jpg_to_tensor(image))
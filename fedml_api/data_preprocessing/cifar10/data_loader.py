@@ -6,6 +6,7 @@ import torch.utils.data as data
 import torchvision.transforms as transforms
 
 from .datasets import CIFAR10_truncated
+from ..partition_cache import load_cached_partition
 
 logging.basicConfig()
 logger = logging.getLogger()
@@ -205,6 +206,20 @@ def partition_data_test(dataset, datadir, partition, n_nets, alpha):
     return X_train, y_train, X_test, y_test, *indexes, *counts
 
 
+def load_partition(dataset, datadir, partition, n_nets, alpha):
+    """partition_data computed once and shared through the on-disk partition cache, without loading the images."""
+    if partition == "hetero-fix":
+        _, y_train, _, _, net_dataidx_map, traindata_cls_counts = partition_data(dataset, datadir, partition, n_nets,
+                                                                                 alpha)
+        return net_dataidx_map, traindata_cls_counts, len(np.unique(y_train))
+
+    def _partition():
+        _, y_train, _, _, net_dataidx_map, _ = partition_data(dataset, datadir, partition, n_nets, alpha)
+        return net_dataidx_map, y_train
+
+    return load_cached_partition(datadir, dataset, partition, alpha, n_nets, _partition)
+
+
 # for centralized training
 def get_dataloader(dataset, datadir, train_bs, test_bs, dataidxs=None):
     return get_dataloader_CIFAR10(datadir, train_bs, test_bs, dataidxs)
@@ -245,12 +260,8 @@ def get_dataloader_test_CIFAR10(datadir, train_bs, test_bs, dataidxs_train=None,
 
 def load_partition_data_distributed_cifar10(process_id, dataset, data_dir, partition_method, partition_alpha,
                                             client_number, batch_size):
-    X_train, y_train, X_test, y_test, net_dataidx_map, traindata_cls_counts = partition_data(dataset,
-                                                                                             data_dir,
-                                                                                             partition_method,
-                                                                                             client_number,
-                                                                                             partition_alpha)
-    class_num = len(np.unique(y_train))
+    net_dataidx_map, traindata_cls_counts, class_num = load_partition(dataset, data_dir, partition_method,
+                                                                      client_number, partition_alpha)
     logging.info("traindata_cls_counts = " + str(traindata_cls_counts))
     train_data_num = sum([len(net_dataidx_map[r]) for r in range(client_number)])
 
@@ -5,6 +5,8 @@ import torch.utils.data as data
 from PIL import Image
 from torchvision.datasets import CIFAR100
 
+from ..partition_cache import load_cached_arrays
+
 logging.basicConfig()
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -50,6 +52,17 @@ class CIFAR100_truncated(data.Dataset):
         self.data, self.target = self.__build_truncated_dataset__()
 
     def __build_truncated_dataset__(self):
+        if self.dataidxs is not None:
+            # a client reads only its own rows from a memory-mapped copy of the whole set
+            arrays = load_cached_arrays(self.root, 'cifar100_%s' % ('train' if self.train else 'test'),
+                                        self.__load_full_dataset__)
+            dataidxs = np.asarray(self.dataidxs, dtype=np.int64)
+            return arrays['data'][dataidxs], arrays['target'][dataidxs]
+
+        arrays = self.__load_full_dataset__()
+        return arrays['data'], arrays['target']
+
+    def __load_full_dataset__(self):
 
         cifar_dataobj = CIFAR100(self.root, self.train, self.transform, self.target_transform, self.download)
 
@@ -62,11 +75,7 @@ class CIFAR100_truncated(data.Dataset):
             data = cifar_dataobj.data
             target = np.array(cifar_dataobj.targets)
 
-        if self.dataidxs is not None:
-            data = data[self.dataidxs]
-            target = target[self.dataidxs]
-
-        return data, target
+        return {'data': data, 'target': target}
 
     def truncate_channel(self, index):
         for i in range(index.shape[0]):
@@ -8,6 +8,7 @@ import torch.utils.data as data
 import torchvision.transforms as transforms
 
 from .datasets import ImageFolderTruncated
+from ..partition_cache import load_cached_arrays, load_cached_partition
 
 logging.basicConfig()
 logger = logging.getLogger()
@@ -204,6 +205,34 @@ def partition_data(dataset, datadir, partition, n_nets, alpha):
     return X_train, y_train, X_test, y_test, net_dataidx_map, traindata_cls_counts
 
 
+def load_partition(dataset, datadir, partition, n_nets, alpha):
+    """partition_data computed once and shared through the on-disk partition cache, without loading the images."""
+    if partition == "hetero-fix":
+        _, y_train, _, _, net_dataidx_map, traindata_cls_counts = partition_data(dataset, datadir, partition, n_nets,
+                                                                                 alpha)
+        return net_dataidx_map, traindata_cls_counts, len(np.unique(y_train))
+
+    def _partition():
+        _, y_train, _, _, net_dataidx_map, _ = partition_data(dataset, datadir, partition, n_nets, alpha)
+        return net_dataidx_map, y_train
+
+    return load_cached_partition(datadir, dataset, partition, alpha, n_nets, _partition)
+
+
+def load_folder_samples(folder):
+    """The (image path, class_index) tuples of every image under folder, scanned once and cached."""
+    datadir, split = os.path.split(os.path.normpath(folder))
+
+    def _scan():
+        samples = ImageFolderTruncated(folder).samples
+        return {'paths': np.array([os.path.relpath(path, folder) for path, _ in samples], dtype=str),
+                'targets': np.array([target for _, target in samples], dtype=np.int64)}
+
+    files = load_cached_arrays(datadir, 'cinic10_%s_files' % split, _scan)
+    return [(os.path.join(folder, path), target)
+            for path, target in zip(files['paths'].tolist(), files['targets'].tolist())]
+
+
 # for centralized training
 def get_dataloader(dataset, datadir, train_bs, test_bs, dataidxs=None):
     return get_dataloader_cinic10(datadir, train_bs, test_bs, dataidxs)
@@ -222,7 +251,9 @@ def get_dataloader_cinic10(datadir, train_bs, test_bs, dataidxs=None):
     traindir = os.path.join(datadir, 'train')
     valdir = os.path.join(datadir, 'test')
 
-    train_ds = dl_obj(traindir, dataidxs=dataidxs, transform=transform_train)
+    # a client takes its images from the cached file list instead of scanning the whole train folder
+    train_ds = dl_obj(traindir, dataidxs=dataidxs, transform=transform_train,
+                      samples=load_folder_samples(traindir) if dataidxs is not None else None)
     test_ds = dl_obj(valdir, transform=transform_train)
 
     train_dl = data.DataLoader(dataset=train_ds, batch_size=train_bs, shuffle=True, drop_last=True)
@@ -238,8 +269,10 @@ def get_dataloader_test_cinic10(datadir, train_bs, test_bs, dataidxs_train=None,
     traindir = os.path.join(datadir, 'train')
     valdir = os.path.join(datadir, 'test')
 
-    train_ds = dl_obj(traindir, dataidxs=dataidxs_train, transform=transform_train)
-    test_ds = dl_obj(valdir, dataidxs=dataidxs_test, transform=transform_test)
+    train_ds = dl_obj(traindir, dataidxs=dataidxs_train, transform=transform_train,
+                      samples=load_folder_samples(traindir) if dataidxs_train is not None else None)
+    test_ds = dl_obj(valdir, dataidxs=dataidxs_test, transform=transform_test,
+                     samples=load_folder_samples(valdir) if dataidxs_test is not None else None)
 
     train_dl = data.DataLoader(dataset=train_ds, batch_size=train_bs, shuffle=True, drop_last=True)
     test_dl = data.DataLoader(dataset=test_ds, batch_size=test_bs, shuffle=False, drop_last=True)
@@ -249,12 +282,8 @@ def get_dataloader_test_cinic10(datadir, train_bs, test_bs, dataidxs_train=None,
 
 def load_partition_data_distributed_cinic10(process_id, dataset, data_dir, partition_method, partition_alpha,
                                             client_number, batch_size):
-    X_train, y_train, X_test, y_test, net_dataidx_map, traindata_cls_counts = partition_data(dataset,
-                                                                                             data_dir,
-                                                                                             partition_method,
-                                                                                             client_number,
-                                                                                             partition_alpha)
-    class_num = len(np.unique(y_train))
+    net_dataidx_map, traindata_cls_counts, class_num = load_partition(dataset, data_dir, partition_method,
+                                                                      client_number, partition_alpha)
     logging.info("traindata_cls_counts = " + str(traindata_cls_counts))
     train_data_num = sum([len(net_dataidx_map[r]) for r in range(client_number)])
 
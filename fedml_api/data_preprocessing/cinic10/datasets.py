@@ -60,10 +60,14 @@ class ImageFolderTruncated(DatasetFolder):
         classes (list): List of the class names.
         class_to_idx (dict): Dict with items (class_name, class_index).
         imgs (list): List of (image path, class_index) tuples
+
+    samples, the (image path, class_index) tuples of the whole folder from an earlier scan, skips scanning
+    the folder again.
     """
 
     def __init__(self, root, dataidxs=None, transform=None, target_transform=None,
-                 loader=default_loader, is_valid_file=None):
+                 loader=default_loader, is_valid_file=None, samples=None):
+        self._cached_samples = samples
         super(ImageFolderTruncated, self).__init__(root, loader, IMG_EXTENSIONS if is_valid_file is None else None,
                                                    transform=transform,
                                                    target_transform=target_transform,
@@ -76,6 +80,11 @@ class ImageFolderTruncated(DatasetFolder):
 
         self.__build_truncated_dataset__()
 
+    def make_dataset(self, *args, **kwargs):
+        if self._cached_samples is not None:
+            return self._cached_samples
+        return DatasetFolder.make_dataset(*args, **kwargs)
+
     def __build_truncated_dataset__(self):
         if self.dataidxs is not None:
             # self.imgs = self.imgs[self.dataidxs]
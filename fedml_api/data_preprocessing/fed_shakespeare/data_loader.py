@@ -2,10 +2,12 @@ import logging
 import os
 
 import h5py
+import numpy as np
 import torch
 import torch.utils.data as data
 
 from . import utils
+from ..token_cache import cache_exists, get_cache_dir, load_token_cache
 
 logging.basicConfig()
 logger = logging.getLogger()
@@ -24,8 +26,52 @@ _EXAMPLE = 'examples'
 _SNIPPETS = 'snippets'
 
 
+def load_client_ids(data_dir):
+    global client_ids_train, client_ids_test
+    train_cache_dir = get_cache_dir(data_dir, 'fed_shakespeare_train')
+    test_cache_dir = get_cache_dir(data_dir, 'fed_shakespeare_test')
+    if cache_exists(train_cache_dir) and cache_exists(test_cache_dir):
+        client_ids_train = load_token_cache(train_cache_dir).client_ids
+        client_ids_test = load_token_cache(test_cache_dir).client_ids
+        return
+    train_file_path = os.path.join(data_dir, DEFAULT_TRAIN_FILE)
+    test_file_path = os.path.join(data_dir, DEFAULT_TEST_FILE)
+    with h5py.File(train_file_path,'r') as train_h5, h5py.File(test_file_path, 'r') as test_h5:
+        client_ids_train = list(train_h5[_EXAMPLE].keys())
+        client_ids_test = list(test_h5[_EXAMPLE].keys())
+
+
+def get_cached_dataloader(train_cache_dir, test_cache_dir, train_bs, test_bs, client_idx=None):
+    train_cache = load_token_cache(train_cache_dir)
+    test_cache = load_token_cache(test_cache_dir)
+    if client_idx is None:
+        train_rows, test_rows = train_cache.tokens, test_cache.tokens
+    else:
+        train_rows, test_rows = train_cache.get_client(client_idx), test_cache.get_client(client_idx)
+
+    train_ds = data.TensorDataset(torch.from_numpy(np.ascontiguousarray(train_rows[:, :-1], dtype=np.int64)),
+                                  torch.from_numpy(np.ascontiguousarray(train_rows[:, 1:], dtype=np.int64)))
+    test_ds = data.TensorDataset(torch.from_numpy(np.ascontiguousarray(test_rows[:, :-1], dtype=np.int64)),
+                                 torch.from_numpy(np.ascontiguousarray(test_rows[:, 1:], dtype=np.int64)))
+    train_dl = data.DataLoader(dataset=train_ds,
+                               batch_size=train_bs,
+                               shuffle=True,
+                               drop_last=False)
+    test_dl = data.DataLoader(dataset=test_ds,
+                              batch_size=test_bs,
+                              shuffle=True,
+                              drop_last=False)
+    return train_dl, test_dl
+
+
 def get_dataloader(dataset, data_dir, train_bs, test_bs, client_idx=None):
 
+    train_cache_dir = get_cache_dir(data_dir, 'fed_shakespeare_train')
+    test_cache_dir = get_cache_dir(data_dir, 'fed_shakespeare_test')
+    if cache_exists(train_cache_dir) and cache_exists(test_cache_dir):
+        # pre-tokenized cache built by token_cache.py
+        return get_cached_dataloader(train_cache_dir, test_cache_dir, train_bs, test_bs, client_idx)
+
     train_h5 = h5py.File(os.path.join(data_dir, DEFAULT_TRAIN_FILE), 'r')
     test_h5 = h5py.File(os.path.join(data_dir, DEFAULT_TEST_FILE), 'r')
     train_ds = []
@@ -71,6 +117,45 @@ def get_dataloader(dataset, data_dir, train_bs, test_bs, client_idx=None):
     return train_dl, test_dl
 
 
+def read_all_clients(h5_path, client_ids):
+    # walk the file once, client groups in order
+    sequences = []
+    counts = []
+    with h5py.File(h5_path, 'r') as h5_file:
+        examples = h5_file[_EXAMPLE]
+        for client_id in client_ids:
+            raw = [x.decode('utf8') for x in examples[client_id][_SNIPPETS][()]]
+            client_sequences = utils.preprocess(raw)
+            sequences.extend(client_sequences)
+            counts.append(len(client_sequences))
+    rows = np.array(sequences, dtype=np.int64).reshape(-1, utils.SEQUENCE_LENGTH + 1)
+    return torch.from_numpy(rows), np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def load_all_clients(data_dir):
+    """Tokenized rows of all clients in one shared tensor per split, with per-client row offsets."""
+    train_cache_dir = get_cache_dir(data_dir, 'fed_shakespeare_train')
+    test_cache_dir = get_cache_dir(data_dir, 'fed_shakespeare_test')
+    if cache_exists(train_cache_dir) and cache_exists(test_cache_dir):
+        train_cache = load_token_cache(train_cache_dir)
+        test_cache = load_token_cache(test_cache_dir)
+        return torch.from_numpy(np.array(train_cache.tokens, dtype=np.int64)), train_cache.offsets, \
+            torch.from_numpy(np.array(test_cache.tokens, dtype=np.int64)), test_cache.offsets
+
+    train_rows, train_offsets = read_all_clients(os.path.join(data_dir, DEFAULT_TRAIN_FILE), client_ids_train)
+    test_rows, test_offsets = read_all_clients(os.path.join(data_dir, DEFAULT_TEST_FILE), client_ids_test)
+    return train_rows, train_offsets, test_rows, test_offsets
+
+
+def get_client_dataloader(rows, offsets, client_idx, batch_size):
+    # a view of the shared tensor, no copy per client
+    client_rows = rows[offsets[client_idx]:offsets[client_idx + 1]]
+    return data.DataLoader(dataset=data.TensorDataset(client_rows[:, :-1], client_rows[:, 1:]),
+                           batch_size=batch_size,
+                           shuffle=True,
+                           drop_last=False)
+
+
 def load_partition_data_distributed_federated_shakespeare(
         process_id, dataset, data_dir, batch_size=DEFAULT_BATCH_SIZE):
 
@@ -88,12 +173,7 @@ def load_partition_data_distributed_federated_shakespeare(
     else:
         # get local dataset
         #client id list
-        train_file_path = os.path.join(data_dir, DEFAULT_TRAIN_FILE)
-        test_file_path = os.path.join(data_dir, DEFAULT_TEST_FILE)
-        with h5py.File(train_file_path,'r') as train_h5, h5py.File(test_file_path,'r') as test_h5:
-            global client_ids_train, client_ids_test
-            client_ids_train = list(train_h5[_EXAMPLE].keys())
-            client_ids_test = list(test_h5[_EXAMPLE].keys())
+        load_client_ids(data_dir)
 
         train_data_local, test_data_local = get_dataloader(
             dataset, data_dir, batch_size, batch_size, process_id - 1)
@@ -112,12 +192,10 @@ def load_partition_data_federated_shakespeare(dataset,
                                               batch_size=DEFAULT_BATCH_SIZE):
 
     #client id list
-    train_file_path = os.path.join(data_dir, DEFAULT_TRAIN_FILE)
-    test_file_path = os.path.join(data_dir, DEFAULT_TEST_FILE)
-    with h5py.File(train_file_path,'r') as train_h5, h5py.File(test_file_path, 'r') as test_h5:
-        global client_ids_train, client_ids_test
-        client_ids_train = list(train_h5[_EXAMPLE].keys())
-        client_ids_test = list(test_h5[_EXAMPLE].keys())
+    load_client_ids(data_dir)
+
+    # one pass over each file
+    train_rows, train_offsets, test_rows, test_offsets = load_all_clients(data_dir)
 
     # get local dataset
     data_local_num_dict = dict()
@@ -125,8 +203,8 @@ def load_partition_data_federated_shakespeare(dataset,
     test_data_local_dict = dict()
 
     for client_idx in range(DEFAULT_TRAIN_CLIENTS_NUM):
-        train_data_local, test_data_local = get_dataloader(
-            dataset, data_dir, batch_size, batch_size, client_idx)
+        train_data_local = get_client_dataloader(train_rows, train_offsets, client_idx, batch_size)
+        test_data_local = get_client_dataloader(test_rows, test_offsets, client_idx, batch_size)
         local_data_num = len(train_data_local.dataset)
         data_local_num_dict[client_idx] = local_data_num
         logging.info("client_idx = %d, local_sample_number = %d" %(client_idx, local_data_num))
@@ -137,15 +215,14 @@ def load_partition_data_federated_shakespeare(dataset,
         test_data_local_dict[client_idx] = test_data_local
 
     # global dataset
-    train_data_global = data.DataLoader(data.ConcatDataset(
-        list(dl.dataset for dl in list(train_data_local_dict.values()))),
+    train_end = train_offsets[DEFAULT_TRAIN_CLIENTS_NUM]
+    train_data_global = data.DataLoader(data.TensorDataset(train_rows[:train_end, :-1], train_rows[:train_end, 1:]),
                                         batch_size=batch_size,
                                         shuffle=True)
     train_data_num = len(train_data_global.dataset)
 
-    test_data_global = data.DataLoader(data.ConcatDataset(
-        list(dl.dataset for dl in list(test_data_local_dict.values())
-             if dl is not None)),
+    test_end = test_offsets[DEFAULT_TRAIN_CLIENTS_NUM]
+    test_data_global = data.DataLoader(data.TensorDataset(test_rows[:test_end, :-1], test_rows[:test_end, 1:]),
                                        batch_size=batch_size,
                                        shuffle=True)
     test_data_num = len(test_data_global.dataset)
@@ -0,0 +1,147 @@
+"""Decoded-image cache for the JPEG based datasets (Landmarks, ImageNet).
+
+Every image is decoded once, its shorter side resized to image_size and center cropped, and stored as a
+uint8 row of a memory-mapped array. Images are written in the datasets' own order, in which every client
+owns a contiguous range, so a client's images are a contiguous shard of the file.
+A shard directory holds
+    images.bin  - uint8 [num_images, image_size, image_size, 3]
+    labels.npy  - int64 [num_images]
+    meta.json   - image size and the key (image id or relative path) of every row, written last
+
+Build it once, e.g.
+    python -m fedml_api.data_preprocessing.image_shards --dataset landmarks --data_dir ./cache/images \
+        --map_file gld23k_user_dict_train.csv --map_file gld23k_user_dict_test.csv
+    python -m fedml_api.data_preprocessing.image_shards --dataset ILSVRC2012 --data_dir ./data/ImageNet
+after which the datasets read the decoded images instead of the JPEGs and only run the augmentations.
+"""
+import argparse
+import json
+import logging
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+IMAGES_FILE = 'images.bin'
+LABELS_FILE = 'labels.npy'
+META_FILE = 'meta.json'
+DEFAULT_IMAGE_SIZE = 256
+
+
+def get_shard_dir(image_dir):
+    return image_dir.rstrip(os.sep) + '_shards'
+
+
+def shards_exist(shard_dir):
+    return os.path.exists(os.path.join(shard_dir, META_FILE))
+
+
+def decode_image(path, image_size=DEFAULT_IMAGE_SIZE):
+    with open(path, 'rb') as f:
+        img = Image.open(f).convert('RGB')
+    w, h = img.size
+    scale = image_size / min(w, h)
+    img = img.resize((max(image_size, round(w * scale)), max(image_size, round(h * scale))), Image.BILINEAR)
+    w, h = img.size
+    left, top = (w - image_size) // 2, (h - image_size) // 2
+    return np.asarray(img.crop((left, top, left + image_size, top + image_size)), dtype=np.uint8)
+
+
+def _decode(args):
+    return decode_image(*args)
+
+
+def write_image_shards(shard_dir, keys, paths, labels, image_size=DEFAULT_IMAGE_SIZE, num_workers=8):
+    os.makedirs(shard_dir, exist_ok=True)
+    images = np.memmap(os.path.join(shard_dir, IMAGES_FILE), dtype=np.uint8, mode='w+',
+                       shape=(max(len(paths), 1), image_size, image_size, 3))
+    with Pool(num_workers) as pool:
+        for row, image in enumerate(pool.imap(_decode, [(path, image_size) for path in paths], chunksize=64)):
+            images[row] = image
+            if row % 10000 == 0:
+                logging.info("decoded %d / %d images" % (row, len(paths)))
+    images.flush()
+    del images
+    np.save(os.path.join(shard_dir, LABELS_FILE), np.asarray(labels, dtype=np.int64))
+    with open(os.path.join(shard_dir, META_FILE), 'w') as f:
+        json.dump({'image_size': image_size, 'keys': list(keys)}, f)
+
+
+class ImageShards(object):
+
+    def __init__(self, shard_dir):
+        with open(os.path.join(shard_dir, META_FILE), 'r') as f:
+            meta = json.load(f)
+        self.keys = meta['keys']
+        self.image_size = meta['image_size']
+        self.labels = np.load(os.path.join(shard_dir, LABELS_FILE))
+        self.images = np.memmap(os.path.join(shard_dir, IMAGES_FILE), dtype=np.uint8, mode='r',
+                                shape=(max(len(self.keys), 1), self.image_size, self.image_size, 3))
+        self._rows = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_rows(self, keys):
+        if self._rows is None:
+            self._rows = {key: row for row, key in enumerate(self.keys)}
+        return np.array([self._rows[key] for key in keys], dtype=np.int64)
+
+    def get_image(self, row):
+        # the decoded pixels, as the PIL image the transforms expect
+        return Image.fromarray(np.asarray(self.images[row]))
+
+
+_shards = {}
+
+
+def load_image_shards(image_dir):
+    """The ImageShards of image_dir, or None if it has not been converted."""
+    shard_dir = get_shard_dir(image_dir)
+    if shard_dir not in _shards:
+        _shards[shard_dir] = ImageShards(shard_dir) if shards_exist(shard_dir) else None
+    return _shards[shard_dir]
+
+
+def convert_landmarks(data_dir, map_files, image_size, num_workers):
+    from .Landmarks.data_loader import get_mapping_per_user
+    # rows in the order of the user dicts, one client after another, so each client's images are contiguous
+    rows = {}
+    for map_file in map_files:
+        data_files, _, _ = get_mapping_per_user(map_file)
+        for row in data_files:
+            rows.setdefault(row['image_id'], int(row['class']))
+    keys = list(rows)
+    write_image_shards(get_shard_dir(data_dir), keys, [os.path.join(data_dir, str(key) + ".jpg") for key in keys],
+                       [rows[key] for key in keys], image_size, num_workers)
+
+
+def convert_imagenet(data_dir, image_size, num_workers):
+    from .ImageNet.datasets import find_classes, make_dataset, IMG_EXTENSIONS
+    for split in ['train', 'val']:
+        split_dir = os.path.join(data_dir, split)
+        _, class_to_idx = find_classes(split_dir)
+        all_data, _, _ = make_dataset(split_dir, class_to_idx, IMG_EXTENSIONS)
+        write_image_shards(get_shard_dir(split_dir), [os.path.relpath(path, split_dir) for path, _ in all_data],
+                           [path for path, _ in all_data], [target for _, target in all_data],
+                           image_size, num_workers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', type=str, default='landmarks')
+    parser.add_argument('--data_dir', type=str, default='./cache/images')
+    parser.add_argument('--map_file', type=str, action='append', default=[],
+                        help='Landmarks user dict csv files whose images are converted')
+    parser.add_argument('--image_size', type=int, default=DEFAULT_IMAGE_SIZE)
+    parser.add_argument('--num_workers', type=int, default=8)
+    args = parser.parse_args()
+    if args.dataset == 'landmarks':
+        convert_landmarks(args.data_dir, args.map_file, args.image_size, args.num_workers)
+    elif args.dataset == 'ILSVRC2012':
+        convert_imagenet(args.data_dir, args.image_size, args.num_workers)
+    else:
+        raise AttributeError('Invalid dataset. Possible options: "landmarks" or "ILSVRC2012"')
+    logging.info('decoded images written next to {}'.format(args.data_dir))
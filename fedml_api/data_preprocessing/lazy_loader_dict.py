@@ -0,0 +1,74 @@
+import numbers
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+import torch.utils.data as data
+
+
+class LazyDataLoaderDict(Mapping):
+    """Drop-in replacement for the {client_idx: DataLoader} dicts returned by the data loaders.
+
+    A client's DataLoader is only built by loader_fn(client_idx) when it is first accessed, and at most
+    cache_size of them are kept alive (least recently used evicted first), so memory and startup time scale
+    with the clients that get sampled rather than with the total number of clients.
+    loader_fn should be picklable (a module level function or a functools.partial of one) to keep the
+    dict picklable; the cached loaders themselves are never pickled.
+    """
+
+    def __init__(self, client_num, loader_fn, cache_size=128):
+        self.client_num = client_num
+        self.loader_fn = loader_fn
+        self.cache_size = cache_size
+        self._loaders = OrderedDict()
+
+    def __getitem__(self, client_idx):
+        if not 0 <= client_idx < self.client_num:
+            raise KeyError(client_idx)
+        if client_idx in self._loaders:
+            self._loaders.move_to_end(client_idx)
+            return self._loaders[client_idx]
+        loader = self.loader_fn(client_idx)
+        self._loaders[client_idx] = loader
+        if len(self._loaders) > self.cache_size:
+            self._loaders.popitem(last=False)
+        return loader
+
+    def __contains__(self, client_idx):
+        return isinstance(client_idx, numbers.Integral) and 0 <= client_idx < self.client_num
+
+    def __len__(self):
+        return self.client_num
+
+    def __iter__(self):
+        return iter(range(self.client_num))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_loaders'] = OrderedDict()
+        return state
+
+
+class LazyConcatDataset(data.Dataset):
+    """ConcatDataset of every client's dataset that only knows the clients' sample counts up front.
+
+    Global index i is mapped to its client with a binary search over the cumulative counts, and the client's
+    dataset is created by dataset_fn(client_idx) when one of its samples is read, so building the global
+    loaders costs one array instead of one dataset object per client. dataset_fn should be picklable.
+    """
+
+    def __init__(self, sample_nums, dataset_fn):
+        self.cumulative_sizes = np.cumsum(sample_nums, dtype=np.int64)
+        self.dataset_fn = dataset_fn
+
+    def __len__(self):
+        return int(self.cumulative_sizes[-1]) if len(self.cumulative_sizes) else 0
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        client_idx = int(np.searchsorted(self.cumulative_sizes, idx, side='right'))
+        start = self.cumulative_sizes[client_idx - 1] if client_idx > 0 else 0
+        return self.dataset_fn(client_idx)[int(idx - start)]
@@ -0,0 +1,161 @@
+"""On-disk cache of client partitions, computed once and memory-mapped by every process of a run.
+
+A partition is keyed by (dataset, partition method, alpha, client number) and the state of np.random
+when it is requested, which stands in for the seed: the same seed followed by the same draws gives the
+same key and therefore the same partition. The np.random state after partitioning is stored as well and
+restored on a cache hit, so a run continues exactly as if it had partitioned itself.
+
+A cache entry holds
+    flat_idx.npy      - the sample indexes of all clients, client i owns flat_idx[offsets[i]:offsets[i + 1]]
+    offsets.npy       - int64 [client_num + 1]
+    class_values.npy  - the labels present in the training set
+    class_counts.npy  - int64 [client_num, len(class_values)], samples of each label per client
+    rng_state.pkl     - np.random state right after partitioning
+    meta.json         - written last, an entry without it is incomplete
+
+The same cache holds whole training sets as plain .npy arrays (load_cached_arrays), so a process that
+only needs its own client's samples memory-maps them and reads just those rows.
+
+Entries live under $FEDML_PARTITION_CACHE_DIR if it is set, else under <data_dir>/partition_cache. When that
+directory cannot be written (e.g. a read-only data mount) new entries go to a directory under the system
+temp dir instead; entries already present in data_dir are still used.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = 'partition_cache'
+CACHE_DIR_ENV = 'FEDML_PARTITION_CACHE_DIR'
+META_FILE = 'meta.json'
+
+
+def get_cache_roots(data_dir):
+    """The directories searched for an entry of data_dir, in order; new entries go to the first writable one."""
+    # roots outside data_dir are shared by every data_dir, so they get a subdirectory per data_dir
+    data_dir_key = hashlib.sha1(os.path.abspath(data_dir).encode('utf8')).hexdigest()[:16]
+    if os.environ.get(CACHE_DIR_ENV):
+        return [os.path.join(os.environ[CACHE_DIR_ENV], data_dir_key)]
+    return [os.path.join(data_dir, DEFAULT_CACHE_DIR),
+            os.path.join(tempfile.gettempdir(), 'fedml_' + DEFAULT_CACHE_DIR, data_dir_key)]
+
+
+def _is_writable(cache_root):
+    try:
+        os.makedirs(cache_root, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(cache_root, os.W_OK)
+
+
+def load_cache_entry(data_dir, name, write_fn):
+    """The directory of cache entry name, written by write_fn(entry_dir) if no process has written it yet.
+
+    write_fn must write META_FILE last. It is only called by the first process asking for a missing entry,
+    the others wait for it on a file lock and then use its result.
+    """
+    cache_roots = get_cache_roots(data_dir)
+    for cache_root in cache_roots:
+        if os.path.exists(os.path.join(cache_root, name, META_FILE)):
+            return os.path.join(cache_root, name)
+    for cache_root in cache_roots:
+        if _is_writable(cache_root):
+            break
+    else:
+        raise OSError("none of the cache directories %s is writable, set %s" % (cache_roots, CACHE_DIR_ENV))
+    entry_dir = os.path.join(cache_root, name)
+    with open(os.path.join(cache_root, name + '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if not os.path.exists(os.path.join(entry_dir, META_FILE)):
+            logging.info("%s not cached, computing it" % name)
+            write_fn(entry_dir)
+    return entry_dir
+
+
+def get_partition_key(dataset, partition, alpha, client_num):
+    state = np.random.get_state()
+    key = hashlib.sha1()
+    key.update(json.dumps([dataset, partition, float(alpha), int(client_num)]).encode('utf8'))
+    key.update(state[1].tobytes())
+    key.update(json.dumps([int(state[2]), int(state[3]), float(state[4])]).encode('utf8'))
+    return key.hexdigest()
+
+
+def write_partition(cache_dir, net_dataidx_map, y_train):
+    os.makedirs(cache_dir, exist_ok=True)
+    client_num = len(net_dataidx_map)
+    sizes = [len(net_dataidx_map[i]) for i in range(client_num)]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    flat_idx = np.concatenate([np.asarray(net_dataidx_map[i], dtype=np.int64) for i in range(client_num)]) \
+        if offsets[-1] > 0 else np.zeros(0, dtype=np.int64)
+
+    y_train = np.asarray(y_train)
+    class_values, label_class = np.unique(y_train, return_inverse=True)
+    owner = np.repeat(np.arange(client_num), sizes)
+    class_counts = np.zeros((client_num, len(class_values)), dtype=np.int64)
+    np.add.at(class_counts, (owner, label_class.reshape(-1)[flat_idx]), 1)
+
+    np.save(os.path.join(cache_dir, 'flat_idx.npy'), flat_idx)
+    np.save(os.path.join(cache_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(cache_dir, 'class_values.npy'), class_values)
+    np.save(os.path.join(cache_dir, 'class_counts.npy'), class_counts)
+    with open(os.path.join(cache_dir, 'rng_state.pkl'), 'wb') as f:
+        pickle.dump(np.random.get_state(), f)
+    with open(os.path.join(cache_dir, META_FILE), 'w') as f:
+        json.dump({'client_num': client_num, 'train_data_num': int(offsets[-1])}, f)
+
+
+def read_partition(cache_dir):
+    """Returns net_dataidx_map (read-only memmapped index arrays), the per-client class counts and class_num."""
+    flat_idx = np.load(os.path.join(cache_dir, 'flat_idx.npy'), mmap_mode='r')
+    offsets = np.load(os.path.join(cache_dir, 'offsets.npy'))
+    class_values = np.load(os.path.join(cache_dir, 'class_values.npy'))
+    class_counts = np.load(os.path.join(cache_dir, 'class_counts.npy'))
+    with open(os.path.join(cache_dir, 'rng_state.pkl'), 'rb') as f:
+        np.random.set_state(pickle.load(f))
+
+    net_dataidx_map = {i: flat_idx[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)}
+    traindata_cls_counts = {i: {class_values[c]: class_counts[i, c] for c in np.nonzero(class_counts[i])[0]}
+                            for i in range(len(class_counts))}
+    return net_dataidx_map, traindata_cls_counts, len(class_values)
+
+
+def load_cached_partition(data_dir, dataset, partition, alpha, client_num, partition_fn):
+    """
+    partition_fn() -> (net_dataidx_map, y_train) is only called by the first process asking for a partition
+    that is not on disk yet; the others wait for it on a file lock and then read its result.
+    """
+    key = get_partition_key(dataset, partition, alpha, client_num)
+
+    def _write(cache_dir):
+        net_dataidx_map, y_train = partition_fn()
+        write_partition(cache_dir, net_dataidx_map, y_train)
+
+    cache_dir = load_cache_entry(data_dir, key, _write)
+    logging.info("loading partition %s from %s" % (key, cache_dir))
+    return read_partition(cache_dir)
+
+
+def write_arrays(cache_dir, arrays):
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(cache_dir, name + '.npy'), np.asarray(array))
+    with open(os.path.join(cache_dir, META_FILE), 'w') as f:
+        json.dump({'arrays': sorted(arrays.keys())}, f)
+
+
+def load_cached_arrays(data_dir, name, load_fn):
+    """
+    load_fn() -> {array_name: np.ndarray} is called once to fill the cache entry name; every process gets
+    the arrays as read-only memory maps, so indexing them reads only the rows it asks for.
+    """
+    cache_dir = load_cache_entry(data_dir, name, lambda entry_dir: write_arrays(entry_dir, load_fn()))
+    with open(os.path.join(cache_dir, META_FILE), 'r') as f:
+        array_names = json.load(f)['arrays']
+    return {array_name: np.load(os.path.join(cache_dir, array_name + '.npy'), mmap_mode='r')
+            for array_name in array_names}
@@ -0,0 +1,44 @@
+"""Per-client sample counts of the federated HDF5 datasets.
+
+Counting the samples of every client takes one HDF5 metadata read per client, which for the 342,477
+StackOverflow train clients is minutes of startup. The counts are read once and written next to the HDF5
+file as <file>_<field>_num.npy; when data_dir is read-only they are only kept for the current process.
+"""
+import logging
+import os
+
+import h5py
+import numpy as np
+
+_sample_nums = {}
+
+
+def get_index_path(h5_path, field):
+    return '%s_%s_num.npy' % (os.path.splitext(h5_path)[0], field)
+
+
+def read_client_sample_nums(h5_path, field):
+    with h5py.File(h5_path, 'r') as h5_file:
+        examples = h5_file['examples']
+        return np.array([examples[client_id][field].shape[0] for client_id in examples.keys()], dtype=np.int64)
+
+
+def load_client_sample_nums(h5_path, field):
+    """int64 [num_clients], the number of samples of every client in the order of h5_file['examples'].keys()."""
+    index_path = get_index_path(h5_path, field)
+    if index_path in _sample_nums:
+        return _sample_nums[index_path]
+    if os.path.exists(index_path):
+        sample_nums = np.load(index_path)
+    else:
+        logging.info("counting the samples of every client of %s" % h5_path)
+        sample_nums = read_client_sample_nums(h5_path, field)
+        try:
+            # written to a temporary name and renamed, a concurrent reader never sees a partial index
+            with open(index_path + '.tmp', 'wb') as f:
+                np.save(f, sample_nums)
+            os.replace(index_path + '.tmp', index_path)
+        except OSError as e:
+            logging.warning("could not save the sample counts to %s: %s" % (index_path, e))
+    _sample_nums[index_path] = sample_nums
+    return sample_nums
@@ -6,6 +6,7 @@ import torch
 
 from .language_utils import word_to_indices, VOCAB_SIZE, \
     letter_to_index
+from ..token_cache import cache_exists, get_cache_dir, load_token_cache
 
 
 def read_data(train_data_dir, test_data_dir):
@@ -87,7 +88,60 @@ def batch_data(data, batch_size):
     return batch_data
 
 
+def batch_rows(rows, batch_size):
+    '''
+    same batches as batch_data, from pre-tokenized rows of a token cache: the character indices followed by the label
+    '''
+    data_x = np.array(rows[:, :-1], dtype=np.int64)
+    data_y = np.array(rows[:, -1], dtype=np.int64)
+
+    np.random.seed(100)
+    rng_state = np.random.get_state()
+    np.random.shuffle(data_x)
+    np.random.set_state(rng_state)
+    np.random.shuffle(data_y)
+
+    batch_data = list()
+    for i in range(0, len(data_x), batch_size):
+        batch_data.append((torch.from_numpy(data_x[i:i + batch_size]), torch.from_numpy(data_y[i:i + batch_size])))
+    return batch_data
+
+
+def load_cached_partition_data_shakespeare(batch_size, train_cache, test_cache):
+    train_data_num = 0
+    test_data_num = 0
+    train_data_local_dict = dict()
+    test_data_local_dict = dict()
+    train_data_local_num_dict = dict()
+    train_data_global = list()
+    test_data_global = list()
+    for client_idx in range(len(train_cache)):
+        train_rows = train_cache.get_client(client_idx)
+        test_rows = test_cache.get_client(client_idx)
+        train_data_num += len(train_rows)
+        test_data_num += len(test_rows)
+        train_data_local_num_dict[client_idx] = len(train_rows)
+
+        train_batch = batch_rows(train_rows, batch_size)
+        test_batch = batch_rows(test_rows, batch_size)
+        train_data_local_dict[client_idx] = train_batch
+        test_data_local_dict[client_idx] = test_batch
+        train_data_global += train_batch
+        test_data_global += test_batch
+
+    return len(train_cache), train_data_num, test_data_num, train_data_global, test_data_global, \
+           train_data_local_num_dict, train_data_local_dict, test_data_local_dict, VOCAB_SIZE
+
+
 def load_partition_data_shakespeare(batch_size):
+    data_dir = "../../../data/shakespeare"
+    train_cache_dir = get_cache_dir(data_dir, 'shakespeare_train')
+    test_cache_dir = get_cache_dir(data_dir, 'shakespeare_test')
+    if cache_exists(train_cache_dir) and cache_exists(test_cache_dir):
+        # pre-tokenized cache built by token_cache.py
+        return load_cached_partition_data_shakespeare(batch_size, load_token_cache(train_cache_dir),
+                                                      load_token_cache(test_cache_dir))
+
     train_path = "../../../data/shakespeare/train"
     test_path = "../../../data/shakespeare/test"
     users, groups, train_data, test_data = read_data(train_path, test_path)
@@ -1,22 +1,44 @@
+import os
+from collections import OrderedDict
+
 import h5py
 
 import torch.utils.data as data
 
+_h5_files = {}
+
+
+def get_h5_file(h5_path):
+    """One read-only handle per file and process; forked workers open their own."""
+    key = (h5_path, os.getpid())
+    if key not in _h5_files:
+        _h5_files[key] = h5py.File(h5_path, 'r')
+    return _h5_files[key]
+
+
 class StackOverflowDataset(data.Dataset):
     """StackOverflow dataset"""
 
     __train_client_id_list = None
     __test_client_id_list = None
 
-    def __init__(self, h5_path, client_idx, datast, preprocess=None):
+    # preprocessed clients kept per process, least recently used evicted first
+    CLIENT_CACHE_SIZE = 64
+    _client_cache = OrderedDict()
+
+    def __init__(self, h5_path, client_idx, datast, preprocess=None, cache_client=True):
         """
         Args:
             h5_path (string) : path to the h5 file
             client_idx (idx) : index of train file
             datast (string) : "train" or "test" denoting on train set or test set
-            preprocess (dict of callable, optional) : Optional preprocessing, with key "input", "target"
+            preprocess (dict of callable, optional) : Optional preprocessing, with key "input", "target".
+                                                      Each maps the list of all samples of the client to
+                                                      an indexable of preprocessed samples
+            cache_client (bool) : preprocess and cache the whole client on the first read; without it every
+                                  read preprocesses only its own sample, which suits reads spread over all clients
         """
-        
+
         self._EXAMPLE = 'examples'
         self._TOKENS = 'tokens'
         self._TITLE = 'title'
@@ -30,38 +52,62 @@ class StackOverflowDataset(data.Dataset):
         if preprocess:
             self.input_fn = preprocess["input"]
             self.target_fn = preprocess["target"]
+        self.cache_client = cache_client
+        self._len = None
 
     def get_client_id_list(self):
         if self.datast == "train":
-            if StackOverflowDataset.__train_client_id_list is None:       
-                with h5py.File(self.h5_path, 'r') as h5_file:
-                    StackOverflowDataset.__train_client_id_list = list(h5_file[self._EXAMPLE].keys())
+            if StackOverflowDataset.__train_client_id_list is None:
+                h5_file = get_h5_file(self.h5_path)
+                StackOverflowDataset.__train_client_id_list = list(h5_file[self._EXAMPLE].keys())
             return StackOverflowDataset.__train_client_id_list
         elif self.datast == "test":
-            if StackOverflowDataset.__test_client_id_list is None:       
-                with h5py.File(self.h5_path, 'r') as h5_file:
-                    StackOverflowDataset.__test_client_id_list = list(h5_file[self._EXAMPLE].keys())
-            return StackOverflowDataset.__test_client_id_list 
+            if StackOverflowDataset.__test_client_id_list is None:
+                h5_file = get_h5_file(self.h5_path)
+                StackOverflowDataset.__test_client_id_list = list(h5_file[self._EXAMPLE].keys())
+            return StackOverflowDataset.__test_client_id_list
         else:
-            raise Exception ("Please specify either train or test set!") 
+            raise Exception ("Please specify either train or test set!")
 
+    def get_client_samples(self):
+        key = (self.h5_path, self.client_id)
+        cache = StackOverflowDataset._client_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        # one read per field for the whole client, preprocessed in a single call
+        client = get_h5_file(self.h5_path)[self._EXAMPLE][self.client_id]
+        samples = [' '.join([token.decode('utf8'), title.decode('utf8')])
+                   for token, title in zip(client[self._TOKENS][()], client[self._TITLE][()])]
+        tags = [tag.decode('utf8') for tag in client[self._TAGS][()]]
+        if self.input_fn:
+            samples = self.input_fn(samples)
+        if self.target_fn:
+            tags = self.target_fn(tags)
+        cache[key] = (samples, tags)
+        if len(cache) > StackOverflowDataset.CLIENT_CACHE_SIZE:
+            cache.popitem(last=False)
+        return samples, tags
 
     def __len__(self):
-        with h5py.File(self.h5_path, 'r') as h5_file:
-            return len(h5_file[self._EXAMPLE][self.client_id][self._TAGS][()])
+        if self._len is None:
+            self._len = get_h5_file(self.h5_path)[self._EXAMPLE][self.client_id][self._TAGS].shape[0]
+        return self._len
+
+    def get_sample(self, idx):
+        client = get_h5_file(self.h5_path)[self._EXAMPLE][self.client_id]
+        sample = ' '.join([client[self._TOKENS][idx].decode('utf8'), client[self._TITLE][idx].decode('utf8')])
+        tag = client[self._TAGS][idx].decode('utf8')
+        if self.input_fn:
+            sample = self.input_fn([sample])[0]
+        if self.target_fn:
+            tag = self.target_fn([tag])[0]
+        return (sample, tag)
 
     def __getitem__(self, idx):
-        with h5py.File(self.h5_path, 'r') as h5_file:
-            if idx > self.__len__():
-                return None
-            raw_token = h5_file[self._EXAMPLE][self.client_id][self._TOKENS][()][idx].decode('utf8')
-            raw_title = h5_file[self._EXAMPLE][self.client_id][self._TITLE][()][idx].decode('utf8')
-            sample = ' '.join([raw_token, raw_title])
-            tag = h5_file[self._EXAMPLE][self.client_id][self._TAGS][()][idx].decode('utf8')
-
-            if self.input_fn:
-                sample = self.input_fn(sample)
-            if self.target_fn:
-                tag = self.target_fn(tag)
-
-        return (sample, tag)
\ No newline at end of file
+        if idx > self.__len__():
+            return None
+        if not self.cache_client:
+            return self.get_sample(idx)
+        samples, tags = self.get_client_samples()
+        return (samples[idx], tags[idx])
@@ -1,6 +1,7 @@
 import numpy as np
 import os
 import json
+import itertools
 import collections
 
 DEFAULT_WORD_COUNT_FILE = 'stackoverflow.word_count'
@@ -146,6 +147,51 @@ def preprocess_target(tag, data_dir):
     return to_bag_of_words(tag)
 
 
+class BagOfWords(object):
+    """Token ids of many samples, expanded to a dense bag-of-words vector one sample at a time."""
+
+    def __init__(self, ids, offsets, size, normalize):
+        self.ids = ids
+        self.offsets = offsets
+        self.size = size
+        self.normalize = normalize
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        ids = self.ids[self.offsets[idx]:self.offsets[idx + 1]]
+        counts = np.bincount(ids, minlength=self.size + 1)[:self.size].astype(np.float32)
+        if self.normalize:
+            counts /= np.float32(len(ids))
+        return counts
+
+
+def _lookup(items, item_dict):
+    # look every distinct item up once, unknown items map to len(item_dict)
+    lengths = np.fromiter(map(len, items), dtype=np.int64, count=len(items))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    if offsets[-1] == 0:
+        return np.zeros(0, dtype=np.int64), offsets
+    unique, inverse = np.unique(np.array(list(itertools.chain.from_iterable(items))), return_inverse=True)
+    ids = np.array([item_dict.get(item, len(item_dict)) for item in unique], dtype=np.int64)[inverse.reshape(-1)]
+    return ids, offsets
+
+
+def tokenize_inputs(sentences, data_dir):
+    """Vectorized preprocess_input over many sentences."""
+    word_dict = get_word_dict(data_dir)
+    ids, offsets = _lookup([sentence.split(' ') for sentence in sentences], word_dict)
+    return BagOfWords(ids, offsets, len(word_dict), normalize=True)
+
+
+def tokenize_targets(tags, data_dir):
+    """Vectorized preprocess_target over many tag strings."""
+    tag_dict = get_tag_dict(data_dir)
+    ids, offsets = _lookup([tag.split('|') for tag in tags], tag_dict)
+    return BagOfWords(ids, offsets, len(tag_dict), normalize=False)
+
+
 if __name__ == "__main__":
     inputs = [
         'this will output :',
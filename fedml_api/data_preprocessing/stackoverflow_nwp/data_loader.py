@@ -1,14 +1,17 @@
 
+import functools
 import logging
 import os
 import pickle
 
-import tqdm
-
+import numpy as np
 import torch.utils.data as data
 
 from . import utils
 from .dataset import StackOverflowDataset
+from ..lazy_loader_dict import LazyConcatDataset, LazyDataLoaderDict
+from ..sample_index import load_client_sample_nums
+from ..token_cache import cache_exists, get_cache_dir, load_token_cache, TokenCacheDataset
 
 
 client_ids_train = None
@@ -22,46 +25,56 @@ DEFAULT_TEST_FILE = 'stackoverflow_test.h5'
 #cache
 DEFAULT_CACHE_FILE = 'stackoverflow_nwp.pkl'
 
-def get_dataloader(dataset, data_dir, train_bs, test_bs, client_idx=None):
+def get_local_dataset(data_dir, datast, client_idx, cache_client=True):
+    cache_dir = get_cache_dir(data_dir, 'stackoverflow_nwp_' + datast)
+    if cache_exists(cache_dir):
+        # pre-tokenized cache built by token_cache.py
+        return TokenCacheDataset(load_token_cache(cache_dir), client_idx)
+    h5_file = DEFAULT_TRAIN_FILE if datast == "train" else DEFAULT_TEST_FILE
+    return StackOverflowDataset(os.path.join(data_dir, h5_file), client_idx, datast,
+                                functools.partial(utils.tokenize_sentences, data_dir=data_dir), cache_client)
+
+
+def get_client_sample_nums(data_dir, datast):
+    cache_dir = get_cache_dir(data_dir, 'stackoverflow_nwp_' + datast)
+    if cache_exists(cache_dir):
+        return np.diff(load_token_cache(cache_dir).offsets)
+    h5_file = DEFAULT_TRAIN_FILE if datast == "train" else DEFAULT_TEST_FILE
+    return load_client_sample_nums(os.path.join(data_dir, h5_file), 'tokens')
+
+
+def get_global_dataset(data_dir, datast, client_num):
+    # the samples of the first client_num clients, their datasets are only created when read; shuffled reads
+    # jump between clients, so every sample is preprocessed on its own instead of through the client cache
+    return LazyConcatDataset(get_client_sample_nums(data_dir, datast)[:client_num],
+                             functools.partial(get_local_dataset, data_dir, datast, cache_client=False))
+
 
-    def _tokenizer(x):
-        return utils.tokenizer(x, data_dir)
+def get_local_dataloader(dataset, data_dir, batch_size, datast, client_idx):
+    if datast == "test" and client_idx >= DEFAULT_TEST_CLIENTS_NUM:
+        return None
+    return data.DataLoader(dataset=get_local_dataset(data_dir, datast, client_idx),
+                           batch_size=batch_size,
+                           shuffle=True,
+                           drop_last=False)
+
+
+def get_dataloader(dataset, data_dir, train_bs, test_bs, client_idx=None):
 
     if client_idx is None:
 
-        train_dl = data.DataLoader(data.ConcatDataset(
-            StackOverflowDataset(
-                os.path.join(data_dir, DEFAULT_TRAIN_FILE), client_idx, _tokenizer) 
-                for client_idx in range(DEFAULT_TRAIN_CLIENTS_NUM)),
+        train_dl = data.DataLoader(get_global_dataset(data_dir, "train", DEFAULT_TRAIN_CLIENTS_NUM),
                                    batch_size=train_bs,
                                    shuffle=True)
 
-        test_dl = data.DataLoader(data.ConcatDataset(
-            StackOverflowDataset(
-                os.path.join(data_dir, DEFAULT_TEST_FILE), client_idx, "test", _tokenizer)
-                for client_idx in range(DEFAULT_TEST_CLIENTS_NUM)),
+        test_dl = data.DataLoader(get_global_dataset(data_dir, "test", DEFAULT_TEST_CLIENTS_NUM),
                                   batch_size=test_bs,
                                   shuffle=True)
         return train_dl, test_dl
 
     else:
-        train_ds = StackOverflowDataset(
-            os.path.join(data_dir, DEFAULT_TRAIN_FILE), client_idx, "train", _tokenizer) 
-        train_dl = data.DataLoader(dataset=train_ds,
-                                   batch_size=train_bs,
-                                   shuffle=True,
-                                   drop_last=False)
-
-        if client_idx >= DEFAULT_TEST_CLIENTS_NUM:
-            test_dl = None
-        else:
-            test_ds = StackOverflowDataset(
-                os.path.join(data_dir, DEFAULT_TEST_FILE), client_idx, "test", _tokenizer) 
-            test_dl = data.DataLoader(dataset=test_ds,
-                                      batch_size=test_bs,
-                                      shuffle=True,
-                                      drop_last=False)
-
+        train_dl = get_local_dataloader(dataset, data_dir, train_bs, "train", client_idx)
+        test_dl = get_local_dataloader(dataset, data_dir, test_bs, "test", client_idx)
         return train_dl, test_dl
 
 
@@ -111,36 +124,24 @@ def load_partition_data_federated_stackoverflow_nwp(dataset, data_dir, batch_siz
             VOCAB_LEN = cache_data['VOCAB_LEN']
 
     else:
-        # get local dataset
-        data_local_num_dict = dict()
-        train_data_local_dict = dict()
-        test_data_local_dict = dict()
-        
-        for client_idx in tqdm.tqdm(range(DEFAULT_TRAIN_CLIENTS_NUM)):
-
-            train_data_local, test_data_local = get_dataloader(
-                dataset, data_dir, batch_size, batch_size, client_idx)
-            local_data_num = len(train_data_local.dataset)
-            data_local_num_dict[client_idx] = local_data_num
-            # logging.info("client_idx = %d, local_sample_number = %d" %
-            #              (client_idx, local_data_num))
-            # logging.info(
-            #     "client_idx = %d, batch_num_train_local = %d"
-            #     % (client_idx, len(train_data_local)))
-            train_data_local_dict[client_idx] = train_data_local
-            test_data_local_dict[client_idx] = test_data_local
+        # the sample counts come from an index read once per file, no client dataset is created up front:
+        # the per-client DataLoaders are built on first access and the global loaders read clients on demand
+        train_sample_nums = get_client_sample_nums(data_dir, "train")[:DEFAULT_TRAIN_CLIENTS_NUM]
+        data_local_num_dict = {client_idx: int(num) for client_idx, num in enumerate(train_sample_nums)}
+        train_data_local_dict = LazyDataLoaderDict(
+            DEFAULT_TRAIN_CLIENTS_NUM,
+            functools.partial(get_local_dataloader, dataset, data_dir, batch_size, "train"))
+        test_data_local_dict = LazyDataLoaderDict(
+            DEFAULT_TRAIN_CLIENTS_NUM,
+            functools.partial(get_local_dataloader, dataset, data_dir, batch_size, "test"))
 
         train_data_global = data.DataLoader(
-                    data.ConcatDataset(
-                        list(dl.dataset for dl in list(train_data_local_dict.values()))
-                    ),
+                    get_global_dataset(data_dir, "train", DEFAULT_TRAIN_CLIENTS_NUM),
                     batch_size=batch_size, shuffle=True)
         train_data_num = len(train_data_global.dataset)
         
         test_data_global = data.DataLoader(
-                data.ConcatDataset(
-                    list(dl.dataset for dl in list(test_data_local_dict.values()) if dl is not None)
-                ),
+                get_global_dataset(data_dir, "test", min(DEFAULT_TRAIN_CLIENTS_NUM, DEFAULT_TEST_CLIENTS_NUM)),
                 batch_size=batch_size, shuffle=True)
         test_data_num = len(test_data_global.dataset)
 
@@ -1,22 +1,43 @@
+import os
+from collections import OrderedDict
+
 import h5py
 import numpy as np
 import torch.utils.data as data
 
+_h5_files = {}
+
+
+def get_h5_file(h5_path):
+    """One read-only handle per file and process; forked workers open their own."""
+    key = (h5_path, os.getpid())
+    if key not in _h5_files:
+        _h5_files[key] = h5py.File(h5_path, 'r')
+    return _h5_files[key]
+
+
 class StackOverflowDataset(data.Dataset):
     """StackOverflow dataset"""
 
     __train_client_id_list = None
     __test_client_id_list = None
 
-    def __init__(self, h5_path, client_idx, datast, preprocess):
+    # tokenized clients kept per process, least recently used evicted first
+    CLIENT_CACHE_SIZE = 64
+    _client_cache = OrderedDict()
+
+    def __init__(self, h5_path, client_idx, datast, preprocess, cache_client=True):
         """
         Args:
             h5_path (string) : path to the h5 file
             client_idx (idx) : index of train file
             datast (string) : "train" or "test" denoting on train set or test set
-            preprocess (callable, optional) : Optional preprocessing
+            preprocess (callable) : maps the list of all sentences of the client to an int array of
+                                    shape [num_samples, max_seq_len + 1]
+            cache_client (bool) : tokenize and cache the whole client on the first read; without it every
+                                  read tokenizes only its own sample, which suits reads spread over all clients
         """
-        
+
         self._EXAMPLE = 'examples'
         self._TOKENS = 'tokens'
 
@@ -24,28 +45,46 @@ class StackOverflowDataset(data.Dataset):
         self.datast = datast
         self.client_id = self.get_client_id_list()[client_idx]
         self.preprocess = preprocess
+        self.cache_client = cache_client
+        self._len = None
 
     def get_client_id_list(self):
         if self.datast == "train":
-            if StackOverflowDataset.__train_client_id_list is None:       
-                with h5py.File(self.h5_path, 'r') as h5_file:
-                    StackOverflowDataset.__train_client_id_list = list(h5_file[self._EXAMPLE].keys())
+            if StackOverflowDataset.__train_client_id_list is None:
+                h5_file = get_h5_file(self.h5_path)
+                StackOverflowDataset.__train_client_id_list = list(h5_file[self._EXAMPLE].keys())
             return StackOverflowDataset.__train_client_id_list
         elif self.datast == "test":
-            if StackOverflowDataset.__test_client_id_list is None:       
-                with h5py.File(self.h5_path, 'r') as h5_file:
-                    StackOverflowDataset.__test_client_id_list = list(h5_file[self._EXAMPLE].keys())
-            return StackOverflowDataset.__test_client_id_list 
+            if StackOverflowDataset.__test_client_id_list is None:
+                h5_file = get_h5_file(self.h5_path)
+                StackOverflowDataset.__test_client_id_list = list(h5_file[self._EXAMPLE].keys())
+            return StackOverflowDataset.__test_client_id_list
         else:
-            raise Exception ("Please specify either train or test set!") 
+            raise Exception ("Please specify either train or test set!")
 
+    def get_client_samples(self):
+        key = (self.h5_path, self.client_id)
+        cache = StackOverflowDataset._client_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        # one read for the whole client, tokenized in a single call
+        raw = get_h5_file(self.h5_path)[self._EXAMPLE][self.client_id][self._TOKENS][()]
+        samples = self.preprocess([s.decode('utf8') for s in raw])
+        cache[key] = samples
+        if len(cache) > StackOverflowDataset.CLIENT_CACHE_SIZE:
+            cache.popitem(last=False)
+        return samples
 
     def __len__(self):
-        with h5py.File(self.h5_path, 'r') as h5_file:
-            return len(h5_file[self._EXAMPLE][self.client_id][self._TOKENS][()])
+        if self._len is None:
+            self._len = get_h5_file(self.h5_path)[self._EXAMPLE][self.client_id][self._TOKENS].shape[0]
+        return self._len
+
+    def get_sample(self, idx):
+        raw = get_h5_file(self.h5_path)[self._EXAMPLE][self.client_id][self._TOKENS][idx]
+        return self.preprocess([raw.decode('utf8')])[0]
 
     def __getitem__(self, idx):
-        with h5py.File(self.h5_path, 'r') as h5_file:
-            sample = h5_file[self._EXAMPLE][self.client_id][self._TOKENS][()][idx].decode('utf8')
-            sample = self.preprocess(sample)
-        return np.asarray(sample[:-1]), np.asarray(sample[1:])
\ No newline at end of file
+        sample = self.get_client_samples()[idx] if self.cache_client else self.get_sample(idx)
+        return sample[:-1], sample[1:]
@@ -1,5 +1,6 @@
 import numpy as np
 import collections
+import itertools
 import os
 
 DEFAULT_WORD_COUNT_FILE = 'stackoverflow.word_count'
@@ -82,6 +83,29 @@ def tokenizer(sentence, data_dir, max_seq_len=20):
     return to_ids(truncated_sentences)
 
 
+def tokenize_sentences(sentences, data_dir, max_seq_len=20):
+    """Vectorized tokenizer over many sentences; row i equals tokenizer(sentences[i], data_dir, max_seq_len)."""
+    word_dict = get_word_dict(data_dir)
+    words = [sentence.split(' ')[:max_seq_len] for sentence in sentences]
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+
+    tokens = np.full((len(words), max_seq_len + 1), word_dict[_pad], dtype=np.int64)
+    if len(words) == 0:
+        return tokens
+    tokens[:, 0] = word_dict[_bos]
+
+    # look every distinct word up once, out of vocabulary words share the single oov bucket
+    unique, inverse = np.unique(np.array(list(itertools.chain.from_iterable(words))), return_inverse=True)
+    ids = np.array([word_dict.get(w, len(word_dict)) for w in unique], dtype=np.int64)[inverse.reshape(-1)]
+
+    rows = np.repeat(np.arange(len(words)), lengths)
+    cols = np.arange(len(ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+    tokens[rows, cols] = ids
+    short = np.nonzero(lengths < max_seq_len)[0]
+    tokens[short, lengths[short] + 1] = word_dict[_eos]
+    return tokens
+
+
 def split(dataset):
     ds = np.array(dataset)
     x = ds[:, :-1]
@@ -0,0 +1,166 @@
+"""Pre-tokenized, memory-mappable cache for the federated text datasets.
+
+A cache directory holds
+    tokens.bin   - every tokenized sample of every client, int32 rows of a fixed length
+    offsets.npy  - int64 [num_clients + 1], client i owns rows offsets[i]:offsets[i + 1]
+    meta.json    - row length and the client ids in their original order
+
+Build it once, e.g.
+    python -m fedml_api.data_preprocessing.token_cache --dataset stackoverflow_nwp --data_dir ./data/stack_overflow
+after which the data loaders pick it up automatically and a client is a zero-copy slice of the memmap.
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import torch.utils.data as data
+
+TOKENS_FILE = 'tokens.bin'
+OFFSETS_FILE = 'offsets.npy'
+META_FILE = 'meta.json'
+
+
+def get_cache_dir(data_dir, name):
+    return os.path.join(data_dir, name + '_cache')
+
+
+def cache_exists(cache_dir):
+    return os.path.exists(os.path.join(cache_dir, META_FILE))
+
+
+def write_token_cache(cache_dir, clients):
+    """clients: iterable of (client_id, int array [num_samples, row_len])."""
+    os.makedirs(cache_dir, exist_ok=True)
+    client_ids = []
+    offsets = [0]
+    row_len = None
+    # meta.json is written last, so an interrupted conversion is never picked up
+    with open(os.path.join(cache_dir, TOKENS_FILE), 'wb') as f:
+        for client_id, rows in clients:
+            rows = np.asarray(rows, dtype=np.int32)
+            if row_len is None and len(rows) > 0:
+                row_len = rows.shape[1]
+            if len(rows) > 0 and rows.shape[1] != row_len:
+                raise ValueError('client {} has rows of length {}, expected {}'.format(client_id, rows.shape[1], row_len))
+            rows.tofile(f)
+            client_ids.append(client_id)
+            offsets.append(offsets[-1] + len(rows))
+    np.save(os.path.join(cache_dir, OFFSETS_FILE), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(cache_dir, META_FILE), 'w') as f:
+        json.dump({'row_len': row_len or 0, 'client_ids': client_ids}, f)
+
+
+class TokenCache(object):
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, META_FILE), 'r') as f:
+            meta = json.load(f)
+        self.client_ids = meta['client_ids']
+        self.offsets = np.load(os.path.join(cache_dir, OFFSETS_FILE))
+        self.row_len = meta['row_len']
+        num_rows = int(self.offsets[-1])
+        if num_rows == 0:
+            self.tokens = np.zeros((0, self.row_len), dtype=np.int32)
+        else:
+            self.tokens = np.memmap(os.path.join(cache_dir, TOKENS_FILE), dtype=np.int32, mode='r',
+                                    shape=(num_rows, self.row_len))
+
+    def __reduce__(self):
+        # reopen the memmap instead of pickling the token data
+        return TokenCache, (self.cache_dir,)
+
+    def __len__(self):
+        return len(self.client_ids)
+
+    def get_client(self, client_idx):
+        return self.tokens[self.offsets[client_idx]:self.offsets[client_idx + 1]]
+
+    def get_client_num(self, client_idx):
+        return int(self.offsets[client_idx + 1] - self.offsets[client_idx])
+
+
+class TokenCacheDataset(data.Dataset):
+    """One client of a TokenCache, samples split into (input, next-token target) like the HDF5 datasets."""
+
+    def __init__(self, cache, client_idx):
+        self.cache = cache
+        self.client_idx = client_idx
+
+    def __len__(self):
+        return self.cache.get_client_num(self.client_idx)
+
+    def __getitem__(self, idx):
+        row = self.cache.get_client(self.client_idx)[idx].astype(np.int64)
+        return row[:-1], row[1:]
+
+
+_caches = {}
+
+
+def load_token_cache(cache_dir):
+    if cache_dir not in _caches:
+        _caches[cache_dir] = TokenCache(cache_dir)
+    return _caches[cache_dir]
+
+
+def _stackoverflow_nwp_clients(h5_path, data_dir):
+    import h5py
+    from .stackoverflow_nwp import utils
+    with h5py.File(h5_path, 'r') as h5_file:
+        examples = h5_file['examples']
+        for client_id in examples.keys():
+            raw = examples[client_id]['tokens'][()]
+            yield client_id, utils.tokenize_sentences([s.decode('utf8') for s in raw], data_dir)
+
+
+def _fed_shakespeare_clients(h5_path):
+    import h5py
+    from .fed_shakespeare import utils
+    with h5py.File(h5_path, 'r') as h5_file:
+        examples = h5_file['examples']
+        for client_id in examples.keys():
+            raw = examples[client_id]['snippets'][()]
+            sequences = utils.preprocess([s.decode('utf8') for s in raw])
+            yield client_id, np.array(sequences, dtype=np.int32).reshape(-1, utils.SEQUENCE_LENGTH + 1)
+
+
+def _shakespeare_clients(users, user_data):
+    from .shakespeare.language_utils import word_to_indices, letter_to_index
+    for u in users:
+        x = [word_to_indices(word) for word in user_data[u]['x']]
+        y = [[letter_to_index(c)] for c in user_data[u]['y']]
+        yield u, np.concatenate([np.array(x, dtype=np.int32).reshape(len(x), -1),
+                                 np.array(y, dtype=np.int32).reshape(len(y), 1)], axis=1)
+
+
+def convert(dataset, data_dir):
+    if dataset == 'stackoverflow_nwp':
+        from .stackoverflow_nwp.data_loader import DEFAULT_TRAIN_FILE, DEFAULT_TEST_FILE
+        for split, file_name in [('train', DEFAULT_TRAIN_FILE), ('test', DEFAULT_TEST_FILE)]:
+            write_token_cache(get_cache_dir(data_dir, 'stackoverflow_nwp_' + split),
+                              _stackoverflow_nwp_clients(os.path.join(data_dir, file_name), data_dir))
+    elif dataset == 'fed_shakespeare':
+        from .fed_shakespeare.data_loader import DEFAULT_TRAIN_FILE, DEFAULT_TEST_FILE
+        for split, file_name in [('train', DEFAULT_TRAIN_FILE), ('test', DEFAULT_TEST_FILE)]:
+            write_token_cache(get_cache_dir(data_dir, 'fed_shakespeare_' + split),
+                              _fed_shakespeare_clients(os.path.join(data_dir, file_name)))
+    elif dataset == 'shakespeare':
+        from .shakespeare.data_loader import read_data
+        users, _, train_data, test_data = read_data(os.path.join(data_dir, 'train'), os.path.join(data_dir, 'test'))
+        write_token_cache(get_cache_dir(data_dir, 'shakespeare_train'), _shakespeare_clients(users, train_data))
+        write_token_cache(get_cache_dir(data_dir, 'shakespeare_test'), _shakespeare_clients(users, test_data))
+    else:
+        raise AttributeError('Invalid dataset. Possible options: "stackoverflow_nwp" or "fed_shakespeare" or "shakespeare"')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', type=str, default='stackoverflow_nwp')
+    parser.add_argument('--data_dir', type=str, default='./../../data/stack_overflow')
+    args = parser.parse_args()
+    convert(args.dataset, args.data_dir)
+    logging.info('token cache written to {}'.format(args.data_dir))
@@ -7,6 +7,7 @@ import numpy as np
 import torch
 import wandb
 
+from fedml_core.aggregation.weighted_aggregation import weighted_average
 from .utils import transform_list_to_tensor
 
 
@@ -70,15 +71,7 @@ class FedAVGAggregator(object):
         logging.info("len of self.model_dict[idx] = " + str(len(self.model_dict)))
 
         # logging.info("################aggregate: %d" % len(model_list))
-        (num0, averaged_params) = model_list[0]
-        for k in averaged_params.keys():
-            for i in range(0, len(model_list)):
-                local_sample_number, local_model_params = model_list[i]
-                w = local_sample_number / training_num
-                if i == 0:
-                    averaged_params[k] = local_model_params[k] * w
-                else:
-                    averaged_params[k] += local_model_params[k] * w
+        averaged_params = weighted_average(model_list)
 
         # update the global model which is cached at the server side
         self.set_global_model_params(averaged_params)
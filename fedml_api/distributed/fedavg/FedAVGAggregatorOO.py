@@ -15,7 +15,7 @@ import torch.utils.data as data
 from fedml_core.availability.aggregator import BaseAggregator
 from fedml_core.availability.base_selector import TimeMode
 from .client_selector import RandomSelector, FedCs, Oort, MdaSelector, TiFL
-from .utils import transform_list_to_tensor, transform_tensor_to_list
+from .utils import transform_tensor_to_list
 
 import pydevd_pycharm
 
@@ -66,27 +66,8 @@ class FedAVGAggregator(BaseAggregator):
 
     def aggregate(self):
         start_time = time.time()
-        model_list = []
-        training_num = 0
-
-        for idx in range(len(self.client_selector.selected_clients)):
-            if self.args.is_mobile == 1:
-                self.model_dict[idx] = transform_list_to_tensor(self.model_dict[idx])
-            model_list.append((self.sample_num_dict[idx], self.model_dict[idx]))
-            training_num += self.sample_num_dict[idx]
-
-        logging.info("len of self.model_dict[idx] = " + str(len(self.model_dict)))
-
-        # logging.info("################aggregate: %d" % len(model_list))
-        (num0, averaged_params) = model_list[0]
-        for k in averaged_params.keys():
-            for i in range(0, len(model_list)):
-                local_sample_number, local_model_params = model_list[i]
-                w = local_sample_number / training_num
-                if i == 0:
-                    averaged_params[k] = local_model_params[k] * w
-                else:
-                    averaged_params[k] += local_model_params[k] * w
+        logging.info("len of self.flat_aggregator.sample_num_dict = " + str(len(self.flat_aggregator.sample_num_dict)))
+        averaged_params = self.flat_aggregator.aggregate()
 
         # update the global model which is cached at the server side
         self.set_global_model_params(averaged_params)
@@ -180,6 +161,15 @@ class FedAVGAggregator(BaseAggregator):
             stats = {'test_acc': test_acc, 'test_loss': test_loss}
             logging.info(stats)
 
+    def get_state(self):
+        state = super().get_state()
+        state['accuracies'] = list(self.accuracies)
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.accuracies = state['accuracies']
+
     def handle_resume(self, round_index):
         base = self.args.resume_dir
         raw = ''
@@ -1,8 +1,12 @@
 import logging
 import os, signal
+import pickle
+import random
 import sys
 import re
 
+import numpy as np
+
 import pydevd_pycharm
 import torch
 
@@ -42,6 +46,7 @@ class FedAVGServerManager(ServerManager):
             global_model_params = transform_tensor_to_list(global_model_params)
         for process_id in range(len(client_indexes)):
             self.send_message_init_config(process_id, global_model_params, client_indexes[process_id])
+        self.flush()
 
     def handle_resume(self):
         if self.args.resume_dir and self.args.resume_dir != 'none':
@@ -59,7 +64,12 @@ class FedAVGServerManager(ServerManager):
                 self.round_idx = latest[0]
                 self.aggregator.set_global_model_params(torch.load(os.path.join(base, latest[1])))
                 self.args.output_dir = base
-                self.aggregator.handle_resume(self.round_idx)
+                state_path = os.path.join(base, 'state-{}.pkl'.format(self.round_idx))
+                if os.path.exists(state_path):
+                    self.load_state(state_path)
+                else:
+                    # checkpoints without a state file: replay the past rounds
+                    self.aggregator.handle_resume(self.round_idx)
 
     def sample_clients(self):
         # sampling clients
@@ -115,6 +125,7 @@ class FedAVGServerManager(ServerManager):
             for receiver_id in range(len(client_indexes)):
                 self.send_message_sync_model_to_client(receiver_id, global_model_params,
                                                        client_indexes[receiver_id])
+            self.flush()
 
     def send_message_init_config(self, receive_id, global_model_params, client_index):
         message = Message(MyMessage.MSG_TYPE_S2C_INIT_CONFIG, self.get_sender_id(), receive_id)
@@ -140,6 +151,21 @@ class FedAVGServerManager(ServerManager):
         with open(path + 'args.txt', 'w') as f:
             f.write(args)
 
+        state = {
+            'aggregator': self.aggregator.get_state(),
+            'rng': {'numpy': np.random.get_state(), 'random': random.getstate(), 'torch': torch.get_rng_state()},
+        }
+        with open(path + 'state-{}.pkl'.format(self.round_idx), 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_state(self, state_path):
+        with open(state_path, 'rb') as f:
+            state = pickle.load(f)
+        self.aggregator.set_state(state['aggregator'])
+        np.random.set_state(state['rng']['numpy'])
+        random.setstate(state['rng']['random'])
+        torch.set_rng_state(state['rng']['torch'])
+
     def finish(self):
         self.aggregator.finish()
         super().finish()
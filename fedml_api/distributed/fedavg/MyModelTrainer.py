@@ -5,8 +5,10 @@ from torch import nn
 
 try:
     from fedml_core.trainer.model_trainer import ModelTrainer
+    from fedml_core.trainer.tensor_batcher import get_batch_iterator
 except ImportError:
     from FedML.fedml_core.trainer.model_trainer import ModelTrainer
+    from FedML.fedml_core.trainer.tensor_batcher import get_batch_iterator
 
 
 class MyModelTrainer(ModelTrainer):
@@ -29,10 +31,11 @@ class MyModelTrainer(ModelTrainer):
             optimizer = torch.optim.Adam(filter(lambda p: p.requires_grad, model.parameters()),
                                          lr=args.lr,
                                          weight_decay=args.wd, amsgrad=True)
+        train_batches = get_batch_iterator(train_data, device)
         epoch_loss = []
         for epoch in range(args.epochs):
             batch_loss = []
-            for batch_idx, (x, labels) in enumerate(train_data):
+            for batch_idx, (x, labels) in enumerate(train_batches):
                 # logging.info(images.shape)
                 x, labels = x.to(device), labels.to(device)
                 optimizer.zero_grad()
@@ -44,18 +44,38 @@ class MdaSelector(BaseSelector):
     # 1. failure history
     # 2. expected continues availability
 
+    # only the last AVAILABILITY_WINDOW rounds of availability are scored
+    AVAILABILITY_WINDOW = 10
+
     def __init__(self, aggregator_args, model_size, train_num_dict) -> None:
         super().__init__(aggregator_args, model_size, train_num_dict)
         self.failure_history = defaultdict(list)
-        self.availability_history = [[] for _ in range(self.args.client_num_in_total)]
-        self.init_round_time = []
+        # ring buffers over the last rounds: availability per client and the start time of each round
+        self.availability_history = np.zeros((self.args.client_num_in_total, self.AVAILABILITY_WINDOW), dtype=bool)
+        self.init_round_time = np.zeros(self.AVAILABILITY_WINDOW, dtype=np.float64)
+        self.history_len = 0
+
+    def get_state(self):
+        state = super().get_state()
+        state['failure_history'] = dict(self.failure_history)
+        state['availability_history'] = self.availability_history.copy()
+        state['init_round_time'] = self.init_round_time.copy()
+        state['history_len'] = self.history_len
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.failure_history = defaultdict(list, state['failure_history'])
+        self.availability_history = state['availability_history']
+        self.init_round_time = state['init_round_time']
+        self.history_len = state['history_len']
 
     def update_history(self, round_idx, candidates):
-        self.init_round_time.append(self.cur_time)
-        available = set(candidates)
-
-        for i in range(self.args.client_num_in_total):
-            self.availability_history[i].append(i in available)
+        slot = self.history_len % self.AVAILABILITY_WINDOW
+        self.init_round_time[slot] = self.cur_time
+        self.availability_history[:, slot] = False
+        self.availability_history[np.asarray(candidates, dtype=np.int64), slot] = True
+        self.history_len += 1
 
         if round_idx > 0:
             for client in self.failed_clients:
@@ -73,54 +93,50 @@ class MdaSelector(BaseSelector):
         max_pen = 1
         if round_idx > 0:
             max_pen = sum(1 / i for i in range(1, round_idx + 1))
-        weights = []
-        for client in candidates:
-            init_weight = .5
-            avail_weight = self.calc_avail_weight(client, init_weight, round_idx, max_pen)
-            hw_weight = self.calc_hw_weight(client, init_weight, round_idx)
-            weight = avail_weight
-            if self.args.mda_method == 'mix':
-                if self.args.score_method == 'add':
-                    weight = (avail_weight + hw_weight) / 2
-                if self.args.score_method == 'mul':
-                    weight = np.sqrt(avail_weight * hw_weight)
-            weights.append(weight)
-
-        weights = np.array(weights)
+        candidates = np.asarray(candidates, dtype=np.int64)
+        init_weight = np.full(len(candidates), .5)
+        avail_weight = self.calc_avail_weight(candidates, init_weight, round_idx, max_pen)
+        hw_weight = self.calc_hw_weight(candidates, init_weight, round_idx)
+        weights = avail_weight
+        if self.args.mda_method == 'mix':
+            if self.args.score_method == 'add':
+                weights = (avail_weight + hw_weight) / 2
+            if self.args.score_method == 'mul':
+                weights = np.sqrt(avail_weight * hw_weight)
+
         weights = weights / np.sum(weights)
         return weights
 
-    def calc_avail_weight(self, client, init_weight, round_idx, max_pen):
-        failure_history = np.array(self.failure_history[client])
-        availability_history = list(zip(self.init_round_time, self.availability_history[client]))
-        if len(availability_history) > 10:
-            availability_history = availability_history[-10:]
-            last_time, last_available = 0, False
-            total_active = 0
-            start_time = -1
-            for time, is_available in availability_history:
-                if start_time == -1:
-                    start_time = time
-                if is_available and last_available:
-                    total_active += (time - last_time)
-                last_available = is_available
-                last_time = time
-
-            active_percentage = total_active / (self.cur_time - start_time)
+    def calc_avail_weight(self, clients, init_weight, round_idx, max_pen):
+        init_weight = init_weight.copy()
+        if self.history_len > self.AVAILABILITY_WINDOW:
+            # oldest to newest round of the window
+            order = (self.history_len + np.arange(self.AVAILABILITY_WINDOW)) % self.AVAILABILITY_WINDOW
+            times = self.init_round_time[order]
+            available = self.availability_history[clients][:, order]
+            total_active = np.zeros(len(clients))
+            for i in range(1, self.AVAILABILITY_WINDOW):
+                total_active += np.where(available[:, i] & available[:, i - 1], times[i] - times[i - 1], 0)
+
+            active_percentage = total_active / (self.cur_time - times[0])
             init_weight += (active_percentage - 0.5) * 2 * init_weight
 
-        if len(failure_history) > 0:
-            penalty = (1 / (round_idx - failure_history)).sum()
+        if len(self.failure_history) > 0:
+            penalty = np.zeros(self.args.client_num_in_total)
+            failed = np.zeros(self.args.client_num_in_total, dtype=bool)
+            for client, failure_rounds in self.failure_history.items():
+                penalty[client] = (1 / (round_idx - np.array(failure_rounds))).sum()
+                failed[client] = True
+            penalty, failed = penalty[clients], failed[clients]
             if self.args.score_method == 'add':
-                init_weight = ((1 - penalty / max_pen) + init_weight) / 2
+                init_weight = np.where(failed, ((1 - penalty / max_pen) + init_weight) / 2, init_weight)
             else:
-                init_weight *= (1 - penalty / max_pen)
+                init_weight = np.where(failed, init_weight * (1 - penalty / max_pen), init_weight)
         return init_weight
 
-    def calc_hw_weight(self, client, init_weight, round_idx):
-        if self.client_times[client] == 0:
-            return init_weight
-        return 1 - self.client_times[client] / self.args.round_timeout
+    def calc_hw_weight(self, clients, init_weight, round_idx):
+        client_times = self.client_times[clients]
+        return np.where(client_times == 0, init_weight, 1 - client_times / self.args.round_timeout)
 
 
 class TiFL(MdaSelector):
@@ -144,6 +160,17 @@ class TiFL(MdaSelector):
         self.test_for_selected_clients = test_for_selected_clients
         self.extended = self.args.selector == 'tiflx'
 
+    def get_state(self):
+        state = super().get_state()
+        for key in ['selected_tier', 'tiers', 'credits', 'probabilities', 'old_tiers_acc', 'tiers_acc']:
+            state[key] = getattr(self, key)
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        for key in ['selected_tier', 'tiers', 'credits', 'probabilities', 'old_tiers_acc', 'tiers_acc']:
+            setattr(self, key, state[key])
+
     def create_credits(self):
         logging.debug('START: create credits')
         step = 1.5
@@ -238,6 +265,15 @@ class Oort(BaseSelector):
                          'duration': self.get_client_completion_time(client_id)}
             self.helper.register_client(client_id, feedbacks)
 
+    def get_state(self):
+        state = super().get_state()
+        state['helper'] = {k: v for k, v in vars(self.helper).items() if k != 'args'}
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        vars(self.helper).update(state['helper'])
+
     def sample(self, round_idx, candidates, client_num_per_round):
         if round_idx != 0:
             self.update_oort_helper(round_idx)
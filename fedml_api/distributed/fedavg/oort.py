@@ -11,7 +11,13 @@ class OortHelper:
 
     def __init__(self, args):
 
-        self.totalArms = OrderedDict()
+        # arm table as a struct of arrays indexed by client id
+        self.reward = np.zeros(0, dtype=np.float64)
+        self.duration = np.zeros(0, dtype=np.float64)
+        self.time_stamp = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.status = np.zeros(0, dtype=bool)
+        self.registered = np.zeros(0, dtype=bool)
         self.training_round = 0
 
         self.exploration = args.exploration_factor
@@ -33,25 +39,39 @@ class OortHelper:
         self.successfulClients = set()
         self.blacklist = None
 
+    def _grow(self, size):
+        capacity = max(size, 2 * len(self.reward))
+        for name in ['reward', 'duration', 'time_stamp', 'count', 'status', 'registered']:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
     def register_client(self, clientId, feedbacks):
         # Initiate the score for arms. [score, time_stamp, # of trials, size of client, auxi, duration]
-        if clientId not in self.totalArms:
-            self.totalArms[clientId] = {}
-            self.totalArms[clientId]['reward'] = feedbacks['reward']
-            self.totalArms[clientId]['duration'] = feedbacks['duration']
-            self.totalArms[clientId]['time_stamp'] = self.training_round
-            self.totalArms[clientId]['count'] = 0
-            self.totalArms[clientId]['status'] = True
+        if clientId >= len(self.registered):
+            self._grow(clientId + 1)
+        if not self.registered[clientId]:
+            self.registered[clientId] = True
+            self.reward[clientId] = feedbacks['reward']
+            self.duration[clientId] = feedbacks['duration']
+            self.time_stamp[clientId] = self.training_round
+            self.count[clientId] = 0
+            self.status[clientId] = True
 
             self.unexplored.add(clientId)
 
+    @property
+    def totalArms(self):
+        return OrderedDict((clientId, self.get_client_reward(clientId)) for clientId in np.nonzero(self.registered)[0])
+
     def calculateSumUtil(self, clientList):
         cnt, cntUtil = 1e-4, 0
 
         for client in clientList:
             if client in self.successfulClients:
                 cnt += 1
-                cntUtil += self.totalArms[client]['reward']
+                cntUtil += self.reward[client]
 
         return cntUtil / cnt
 
@@ -97,11 +117,11 @@ class OortHelper:
         @ feedbacks['duration']: system utility
         @ feedbacks['count']: times of involved
         """
-        self.totalArms[clientId]['reward'] = feedbacks['reward']
-        self.totalArms[clientId]['duration'] = feedbacks['duration']
-        self.totalArms[clientId]['time_stamp'] = feedbacks['time_stamp']
-        self.totalArms[clientId]['count'] += 1
-        self.totalArms[clientId]['status'] = feedbacks['status']
+        self.reward[clientId] = feedbacks['reward']
+        self.duration[clientId] = feedbacks['duration']
+        self.time_stamp[clientId] = feedbacks['time_stamp']
+        self.count[clientId] += 1
+        self.status[clientId] = feedbacks['status']
 
         self.unexplored.discard(clientId)
         self.successfulClients.add(clientId)
@@ -110,21 +130,17 @@ class OortHelper:
         blacklist = []
 
         if self.args.blacklist_rounds != -1:
-            sorted_client_ids = sorted(list(self.totalArms), reverse=True,
-                                       key=lambda k: self.totalArms[k]['count'])
-
-            for clientId in sorted_client_ids:
-                if self.totalArms[clientId]['count'] > self.args.blacklist_rounds:
-                    blacklist.append(clientId)
-                else:
-                    break
+            blacklisted = np.nonzero(self.registered & (self.count > self.args.blacklist_rounds))[0]
 
             # we need to back up if we have blacklisted all clients
-            predefined_max_len = self.args.blacklist_max_len * len(self.totalArms)
+            predefined_max_len = int(self.args.blacklist_max_len * self.registered.sum())
 
-            if len(blacklist) > predefined_max_len:
+            if len(blacklisted) > predefined_max_len:
                 logging.warning("Training Selector: exceeds the blacklist threshold")
-                blacklist = blacklist[:predefined_max_len]
+                # most played arms first, ties in arm order
+                order = np.argsort(-self.count[blacklisted], kind='stable')
+                blacklisted = blacklisted[order[:predefined_max_len]]
+            blacklist = blacklisted.tolist()
 
         return set(blacklist)
 
@@ -132,13 +148,28 @@ class OortHelper:
         '''
         @ num_of_clients: # of clients selected
         '''
-        viable_clients = feasible_clients if feasible_clients is not None else set(
-            [x for x in self.totalArms.keys() if self.totalArms[x]['status']])
+        viable_clients = feasible_clients if feasible_clients is not None else np.nonzero(
+            self.registered & self.status)[0]
         return self.getTopK(num_of_clients, self.training_round + 1, viable_clients)
 
     def update_duration(self, clientId, duration):
-        if clientId in self.totalArms:
-            self.totalArms[clientId]['duration'] = duration
+        if clientId < len(self.registered) and self.registered[clientId]:
+            self.duration[clientId] = duration
+
+    def _penalize_duration(self, values, durations):
+        slow = durations > self.round_prefer_duration
+        values[slow] *= (float(self.round_prefer_duration) / np.maximum(1e-4, durations[slow])) ** self.args.round_penalty
+        return values
+
+    def _sorted_top(self, values, k):
+        """Indexes of the k largest values in descending order, ties in index order (a stable sort prefix)."""
+        if k >= len(values):
+            return np.argsort(-values, kind='stable')
+        kth = -np.partition(-values, k - 1)[k - 1]
+        above = np.nonzero(values > kth)[0]
+        ties = np.nonzero(values == kth)[0][:k - len(above)]
+        top = np.sort(np.concatenate([above, ties]))
+        return top[np.argsort(-values[top], kind='stable')]
 
     def getTopK(self, numOfSamples, cur_time, feasible_clients):
         self.training_round = cur_time
@@ -148,107 +179,80 @@ class OortHelper:
         self.pacer()
 
         # normalize the score of all arms: Avg + Confidence
-        scores = {}
         numOfExploited = 0
         exploreLen = 0
 
-        client_list = list(self.totalArms.keys())
-        orderedKeys = [x for x in client_list if int(x) in feasible_clients and int(x) not in self.blacklist]
+        feasible = np.zeros(len(self.registered), dtype=bool)
+        feasible[np.asarray(list(feasible_clients), dtype=np.int64)] = True
+        allowed = feasible & self.registered
+        if self.blacklist:
+            allowed[list(self.blacklist)] = False
+        orderedKeys = np.nonzero(allowed)[0]
 
         if self.round_threshold < 100.:
-            sortedDuration = sorted([self.totalArms[key]['duration'] for key in client_list])
+            sortedDuration = np.sort(self.duration[self.registered])
             self.round_prefer_duration = sortedDuration[
                 min(int(len(sortedDuration) * self.round_threshold / 100.), len(sortedDuration) - 1)]
         else:
             self.round_prefer_duration = float('inf')
 
-        moving_reward, staleness, allloss = [], [], {}
-
-        for clientId in orderedKeys:
-            if self.totalArms[clientId]['reward'] > 0:
-                creward = self.totalArms[clientId]['reward']
-                moving_reward.append(creward)
-                staleness.append(cur_time - self.totalArms[clientId]['time_stamp'])
+        rewarded = orderedKeys[self.reward[orderedKeys] > 0]
+        moving_reward = self.reward[rewarded]
+        staleness = cur_time - self.time_stamp[rewarded]
 
         max_reward, min_reward, range_reward, avg_reward, clip_value = self.get_norm(moving_reward,
                                                                                      self.args.clip_bound)
         max_staleness, min_staleness, range_staleness, avg_staleness, _ = self.get_norm(staleness, thres=1)
 
-        for key in orderedKeys:
-            # we have played this arm before
-            if self.totalArms[key]['count'] > 0:
-                creward = min(self.totalArms[key]['reward'], clip_value)
-                numOfExploited += 1
-
-                sc = (creward - min_reward) / float(range_reward) \
-                     + math.sqrt(0.1 * math.log(cur_time) / self.totalArms[key]['time_stamp'])  # temporal uncertainty
-
-                # sc = (creward - min_reward)/float(range_reward) \
-                #     + self.alpha*((cur_time-self.totalArms[key]['time_stamp']) - min_staleness)/float(range_staleness)
-
-                clientDuration = self.totalArms[key]['duration']
-                if clientDuration > self.round_prefer_duration:
-                    sc *= ((float(self.round_prefer_duration) / max(1e-4, clientDuration)) ** self.args.round_penalty)
-
-                if self.totalArms[key]['time_stamp'] == cur_time:
-                    allloss[key] = sc
-
-                scores[key] = abs(sc)
+        # we have played these arms before
+        clientLakes = orderedKeys[self.count[orderedKeys] > 0]
+        numOfExploited = len(clientLakes)
+        if numOfExploited > 0:
+            creward = np.minimum(self.reward[clientLakes], clip_value)
+            sc = (creward - min_reward) / float(range_reward) \
+                 + np.sqrt(0.1 * math.log(cur_time) / self.time_stamp[clientLakes])  # temporal uncertainty
+            sc = self._penalize_duration(sc, self.duration[clientLakes])
+            scores = np.abs(sc)
+        else:
+            scores = np.zeros(0, dtype=np.float64)
 
-        clientLakes = list(scores.keys())
         self.exploration = max(self.exploration * self.decay_factor, self.exploration_min)
         explorationLen = int(numOfSamples * self.exploration)
 
         # exploitation
         exploitLen = min(numOfSamples - explorationLen, len(clientLakes))
 
-        # take the top-k, and then sample by probability, take 95% of the cut-off loss
-        sortedClientUtil = sorted(scores, key=scores.get, reverse=True)
-
         augment_factor = 0
         self.exploitClients = []
         if exploitLen > 0:
             # take cut-off utility
-            cut_off_util = scores[sortedClientUtil[exploitLen - 1]] * self.args.cut_off_util
-
-            tempPickedClients = []
-            for clientId in sortedClientUtil:
-                # we want at least 10 times of clients for augmentation
-                if scores[clientId] < cut_off_util and len(tempPickedClients) > 10. * exploitLen:
-                    break
-                tempPickedClients.append(clientId)
+            cut_off_util = -np.partition(-scores, exploitLen - 1)[exploitLen - 1] * self.args.cut_off_util
 
-            augment_factor = len(tempPickedClients)
+            # take the top-k, and then sample by probability; we want at least 10 times of clients for augmentation
+            augment_factor = min(len(scores), max(int((scores >= cut_off_util).sum()), 10 * exploitLen + 1))
+            tempPicked = self._sorted_top(scores, augment_factor)
 
-            totalSc = max(1e-4, float(sum([scores[key] for key in tempPickedClients])))
+            totalSc = max(1e-4, float(sum(scores[tempPicked].tolist())))
             self.exploitClients = list(
-                np.random.choice(tempPickedClients, exploitLen, p=[scores[key] / totalSc for key in tempPickedClients],
-                                 replace=False))
+                np.random.choice(clientLakes[tempPicked], exploitLen, p=scores[tempPicked] / totalSc, replace=False))
 
-        # exploration
-        _unexplored = [x for x in list(self.unexplored) if int(x) in feasible_clients]
+        # exploration, in the iteration order of the unexplored set
+        _unexplored = np.fromiter(self.unexplored, dtype=np.int64, count=len(self.unexplored))
+        _unexplored = _unexplored[feasible[_unexplored]]
         self.exploreClients = []
         if len(_unexplored) > 0:
-            init_reward = {}
-            for cl in _unexplored:
-                init_reward[cl] = self.totalArms[cl]['reward']
-                clientDuration = self.totalArms[cl]['duration']
-
-                if clientDuration > self.round_prefer_duration:
-                    init_reward[cl] *= ((float(self.round_prefer_duration) / max(1e-4,
-                                                                                 clientDuration)) ** self.args.round_penalty)
+            init_reward = self._penalize_duration(self.reward[_unexplored].copy(), self.duration[_unexplored])
 
             # prioritize w/ some rewards (i.e., size)
             exploreLen = min(len(_unexplored), numOfSamples - len(self.exploitClients))
             if exploreLen > 0:
-                pickedUnexploredClients = sorted(init_reward, key=init_reward.get, reverse=True)[
-                                          :min(int(self.sample_window * exploreLen), len(init_reward))]
+                picked = self._sorted_top(init_reward, min(int(self.sample_window * exploreLen), len(init_reward)))
 
-                unexploredSc = float(sum([init_reward[key] for key in pickedUnexploredClients]))
+                unexploredSc = float(sum(init_reward[picked].tolist()))
 
-                pickedUnexplored = list(np.random.choice(pickedUnexploredClients, exploreLen,
-                                                         p=[init_reward[key] / max(1e-4, unexploredSc) for key in
-                                                            pickedUnexploredClients], replace=False))
+                pickedUnexplored = list(np.random.choice(_unexplored[picked], exploreLen,
+                                                         p=init_reward[picked] / max(1e-4, unexploredSc),
+                                                         replace=False))
 
                 self.exploreClients = pickedUnexplored
 
@@ -256,43 +260,45 @@ class OortHelper:
         top_k_score = []
         for i in range(len(pickedClients)):
             clientId = pickedClients[i]
-            _score = (self.totalArms[clientId]['reward'] - min_reward) / range_reward
-            _staleness = self.alpha * ((cur_time - self.totalArms[clientId]['time_stamp']) - min_staleness) / float(
-                range_staleness)  # math.sqrt(0.1*math.log(cur_time)/max(1e-4, self.totalArms[clientId]['time_stamp']))
-            top_k_score.append((self.totalArms[clientId], [_score, _staleness]))
+            _score = (self.reward[clientId] - min_reward) / range_reward
+            _staleness = self.alpha * ((cur_time - self.time_stamp[clientId]) - min_staleness) / float(
+                range_staleness)  # math.sqrt(0.1*math.log(cur_time)/max(1e-4, self.time_stamp[clientId]))
+            top_k_score.append((self.get_client_reward(clientId), [_score, _staleness]))
 
         logging.info(
             "At round {}, UCB exploited {}, augment_factor {}, exploreLen {}, un-explored {}, exploration {}, round_threshold {}, sampled score is {}"
                 .format(cur_time, numOfExploited, augment_factor / max(1e-4, exploitLen), exploreLen,
                         len(self.unexplored),
                         self.exploration, self.round_threshold, top_k_score))
-        # logging.info("At time {}, all rewards are {}".format(cur_time, allloss))
 
         return pickedClients
 
     def get_median_reward(self):
-        feasible_rewards = [self.totalArms[x]['reward'] for x in list(self.totalArms.keys()) if
-                            int(x) not in self.blacklist]
+        feasible = self.registered.copy()
+        if self.blacklist:
+            feasible[list(self.blacklist)] = False
+        feasible_rewards = self.reward[feasible]
 
         # we report mean instead of median
         if len(feasible_rewards) > 0:
-            return sum(feasible_rewards) / float(len(feasible_rewards))
+            return feasible_rewards.sum() / float(len(feasible_rewards))
 
         return 0
 
     def get_client_reward(self, armId):
-        return self.totalArms[armId]
+        return {'reward': self.reward[armId], 'duration': self.duration[armId], 'time_stamp': self.time_stamp[armId],
+                'count': self.count[armId], 'status': self.status[armId]}
 
     def getAllMetrics(self):
         return self.totalArms
 
     def get_norm(self, aList, clip_bound=0.95, thres=1e-4):
-        aList.sort()
+        aList = np.sort(aList)
         clip_value = aList[min(int(len(aList) * clip_bound), len(aList) - 1)]
 
         _max = aList[-1]
         _min = aList[0] * 0.999
         _range = max(_max - _min, thres)
-        _avg = sum(aList) / max(1e-4, float(len(aList)))
+        _avg = aList.sum() / max(1e-4, float(len(aList)))
 
         return float(_max), float(_min), float(_range), float(_avg), float(clip_value)
@@ -39,11 +39,11 @@ class GKTClientMananger(ClientManager):
     def send_model_to_server(self, receive_id, extracted_feature_dict, logits_dict, labels_dict,
                              extracted_feature_dict_test, labels_dict_test):
         message = Message(MyMessage.MSG_TYPE_C2S_SEND_FEATURE_AND_LOGITS, self.get_sender_id(), receive_id)
-        message.add_params(MyMessage.MSG_ARG_KEY_FEATURE, extracted_feature_dict)
-        message.add_params(MyMessage.MSG_ARG_KEY_LOGITS, logits_dict)
-        message.add_params(MyMessage.MSG_ARG_KEY_LABELS, labels_dict)
-        message.add_params(MyMessage.MSG_ARG_KEY_FEATURE_TEST, extracted_feature_dict_test)
-        message.add_params(MyMessage.MSG_ARG_KEY_LABELS_TEST, labels_dict_test)
+        message.add_params(MyMessage.MSG_ARG_KEY_FEATURE, extracted_feature_dict.to_params())
+        message.add_params(MyMessage.MSG_ARG_KEY_LOGITS, logits_dict.to_params())
+        message.add_params(MyMessage.MSG_ARG_KEY_LABELS, labels_dict.to_params())
+        message.add_params(MyMessage.MSG_ARG_KEY_FEATURE_TEST, extracted_feature_dict_test.to_params())
+        message.add_params(MyMessage.MSG_ARG_KEY_LABELS_TEST, labels_dict_test.to_params())
         self.send_message(message)
 
     def __train(self):
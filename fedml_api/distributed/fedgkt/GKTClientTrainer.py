@@ -4,6 +4,7 @@ import torch
 from torch import nn, optim
 
 from fedml_api.distributed.fedgkt import utils
+from fedml_api.distributed.fedgkt.feature_store import PackedBatchesWriter
 
 
 class GKTClientTrainer(object):
@@ -47,19 +48,6 @@ class GKTClientTrainer(object):
         self.server_logits_dict = logits
 
     def train(self):
-        # key: batch_index; value: extracted_feature_map
-        extracted_feature_dict = dict()
-
-        # key: batch_index; value: logits
-        logits_dict = dict()
-
-        # key: batch_index; value: label
-        labels_dict = dict()
-
-        # for test - key: batch_index; value: extracted_feature_map
-        extracted_feature_dict_test = dict()
-        labels_dict_test = dict()
-
         if self.args.whether_training_on_client == 1:
             self.client_model.train()
             # train and update
@@ -105,6 +93,16 @@ class GKTClientTrainer(object):
             So it is better to run this program in a 256G CPU host memory. 
             If deploying our algorithm in real world system, please optimize the memory usage by compression.
         """
+        # every batch is written, compressed, into one contiguous array per kind preallocated for the whole dataset
+        compression = self.args.feature_compression
+        num_train = len(self.local_training_data.dataset)
+        num_test = len(self.local_test_data.dataset)
+        extracted_features_writer = PackedBatchesWriter(num_train, compression)
+        logits_writer = PackedBatchesWriter(num_train)
+        labels_writer = PackedBatchesWriter(num_train)
+        extracted_features_test_writer = PackedBatchesWriter(num_test, compression)
+        labels_test_writer = PackedBatchesWriter(num_test)
+
         for batch_idx, (images, labels) in enumerate(self.local_training_data):
             images, labels = images.to(self.device), labels.to(self.device)
 
@@ -115,15 +113,15 @@ class GKTClientTrainer(object):
             # logging.info("element size = " + str(extracted_features.element_size()))
             # logging.info("nelement = " + str(extracted_features.nelement()))
             # logging.info("GPU memory1 = " + str(extracted_features.nelement() * extracted_features.element_size()))
-            extracted_feature_dict[batch_idx] = extracted_features.cpu().detach().numpy()
-            log_probs = log_probs.cpu().detach().numpy()
-            logits_dict[batch_idx] = log_probs
-            labels_dict[batch_idx] = labels.cpu().detach().numpy()
+            extracted_features_writer.add(extracted_features.cpu().detach().numpy())
+            logits_writer.add(log_probs.cpu().detach().numpy())
+            labels_writer.add(labels.cpu().detach().numpy())
 
         for batch_idx, (images, labels) in enumerate(self.local_test_data):
             test_images, test_labels = images.to(self.device), labels.to(self.device)
             _, extracted_features_test = self.client_model(test_images)
-            extracted_feature_dict_test[batch_idx] = extracted_features_test.cpu().detach().numpy()
-            labels_dict_test[batch_idx] = test_labels.cpu().detach().numpy()
+            extracted_features_test_writer.add(extracted_features_test.cpu().detach().numpy())
+            labels_test_writer.add(test_labels.cpu().detach().numpy())
 
-        return extracted_feature_dict, logits_dict, labels_dict, extracted_feature_dict_test, labels_dict_test
+        return extracted_features_writer.finish(), logits_writer.finish(), labels_writer.finish(), \
+            extracted_features_test_writer.finish(), labels_test_writer.finish()
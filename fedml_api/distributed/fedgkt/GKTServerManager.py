@@ -1,5 +1,6 @@
 import logging
 
+from fedml_api.distributed.fedgkt.feature_store import PackedBatches
 from fedml_api.distributed.fedgkt.message_def import MyMessage
 from fedml_core.distributed.communication.message import Message
 from fedml_core.distributed.server.server_manager import ServerManager
@@ -28,11 +29,11 @@ class GKTServerMananger(ServerManager):
     def handle_message_receive_feature_and_logits_from_client(self, msg_params):
         logging.info("handle_message_receive_feature_and_logits_from_client")
         sender_id = msg_params.get(MyMessage.MSG_ARG_KEY_SENDER)
-        extracted_feature_dict = msg_params.get(MyMessage.MSG_ARG_KEY_FEATURE)
-        logits_dict = msg_params.get(MyMessage.MSG_ARG_KEY_LOGITS)
-        labels_dict = msg_params.get(MyMessage.MSG_ARG_KEY_LABELS)
-        extracted_feature_dict_test = msg_params.get(MyMessage.MSG_ARG_KEY_FEATURE_TEST)
-        labels_dict_test = msg_params.get(MyMessage.MSG_ARG_KEY_LABELS_TEST)
+        extracted_feature_dict = PackedBatches.from_params(msg_params.get(MyMessage.MSG_ARG_KEY_FEATURE))
+        logits_dict = PackedBatches.from_params(msg_params.get(MyMessage.MSG_ARG_KEY_LOGITS))
+        labels_dict = PackedBatches.from_params(msg_params.get(MyMessage.MSG_ARG_KEY_LABELS))
+        extracted_feature_dict_test = PackedBatches.from_params(msg_params.get(MyMessage.MSG_ARG_KEY_FEATURE_TEST))
+        labels_dict_test = PackedBatches.from_params(msg_params.get(MyMessage.MSG_ARG_KEY_LABELS_TEST))
 
         self.server_trainer.add_local_trained_result(sender_id - 1, extracted_feature_dict, logits_dict, labels_dict,
                                                  extracted_feature_dict_test, labels_dict_test)
@@ -2,12 +2,14 @@ import logging
 import os
 import shutil
 
+import numpy as np
 import torch
 import wandb
 from torch import nn, optim
 from torch.optim.lr_scheduler import ReduceLROnPlateau
 
 from fedml_api.distributed.fedgkt import utils
+from fedml_api.distributed.fedgkt.feature_store import FeatureStore
 
 
 class GKTServerTrainer(object):
@@ -65,6 +67,11 @@ class GKTServerTrainer(object):
         self.client_extracted_feauture_dict_test = dict()
         self.client_labels_dict_test = dict()
 
+        # the packed features behind the dicts above, memory-mapped from disk if server_feature_store_dir is set
+        store_dir = self.args.server_feature_store_dir
+        self.feature_store = FeatureStore(os.path.join(store_dir, 'train') if store_dir else None)
+        self.feature_store_test = FeatureStore(os.path.join(store_dir, 'test') if store_dir else None)
+
         self.model_dict = dict()
         self.sample_num_dict = dict()
         self.train_acc_dict = dict()
@@ -79,6 +86,10 @@ class GKTServerTrainer(object):
     def add_local_trained_result(self, index, extracted_feature_dict, logits_dict, labels_dict,
                                  extracted_feature_dict_test, labels_dict_test):
         logging.info("add_model. index = %d" % index)
+        extracted_feature_dict, logits_dict, labels_dict = self.feature_store.add(index, extracted_feature_dict,
+                                                                                  logits_dict, labels_dict)
+        extracted_feature_dict_test, _, labels_dict_test = self.feature_store_test.add(
+            index, extracted_feature_dict_test, None, labels_dict_test)
         self.client_extracted_feauture_dict[index] = extracted_feature_dict
         self.client_logits_dict[index] = logits_dict
         self.client_labels_dict[index] = labels_dict
@@ -242,43 +253,29 @@ class GKTServerTrainer(object):
         accTop1_avg = utils.RunningAverage()
         accTop5_avg = utils.RunningAverage()
 
-        for client_index in self.client_extracted_feauture_dict.keys():
-            extracted_feature_dict = self.client_extracted_feauture_dict[client_index]
-            logits_dict = self.client_logits_dict[client_index]
-            labels_dict = self.client_labels_dict[client_index]
-
-            s_logits_dict = dict()
-            self.server_logits_dict[client_index] = s_logits_dict
-            for batch_index in extracted_feature_dict.keys():
-                batch_feature_map_x = torch.from_numpy(extracted_feature_dict[batch_index]).to(self.device)
-                batch_logits = torch.from_numpy(logits_dict[batch_index]).float().to(self.device)
-                batch_labels = torch.from_numpy(labels_dict[batch_index]).long().to(self.device)
-
-                # logging.info("running: batch_index = %d, client_index = %d" % (batch_index, client_index))
-                output_batch = self.model_global(batch_feature_map_x)
-
-                if self.args.whether_distill_on_the_server == 1:
-                    loss_kd = self.criterion_KL(output_batch, batch_logits).to(self.device)
-                    loss_true = self.criterion_CE(output_batch, batch_labels).to(self.device)
-                    loss = loss_kd + self.args.alpha * loss_true
-                else:
-                    loss_true = self.criterion_CE(output_batch, batch_labels).to(self.device)
-                    loss = loss_true
-
-                self.optimizer.zero_grad()
-                loss.backward()
-                self.optimizer.step()
-
-                # Update average loss and accuracy
-                metrics = utils.accuracy(output_batch, batch_labels, topk=(1, 5))
-                accTop1_avg.update(metrics[0].item())
-                accTop5_avg.update(metrics[1].item())
-                loss_avg.update(loss.item())
-
-                # update the logits for each client
-                # Note that this must be running in the model.train() model,
-                # since the client will continue the iteration based on the server logits.
-                s_logits_dict[batch_index] = output_batch.cpu().detach().numpy()
+        if self.args.server_batch_size > 0:
+            self.train_on_shuffled_batches(loss_avg, accTop1_avg, accTop5_avg)
+        else:
+            for client_index in self.client_extracted_feauture_dict.keys():
+                extracted_feature_dict = self.client_extracted_feauture_dict[client_index]
+                logits_dict = self.client_logits_dict[client_index]
+                labels_dict = self.client_labels_dict[client_index]
+
+                s_logits_dict = dict()
+                self.server_logits_dict[client_index] = s_logits_dict
+                for batch_index in extracted_feature_dict.keys():
+                    batch_feature_map_x = torch.from_numpy(extracted_feature_dict[batch_index]).to(self.device)
+                    batch_logits = torch.from_numpy(logits_dict[batch_index]).float().to(self.device)
+                    batch_labels = torch.from_numpy(labels_dict[batch_index]).long().to(self.device)
+
+                    # logging.info("running: batch_index = %d, client_index = %d" % (batch_index, client_index))
+                    output_batch = self.train_step(batch_feature_map_x, batch_logits, batch_labels,
+                                                   loss_avg, accTop1_avg, accTop5_avg)
+
+                    # update the logits for each client
+                    # Note that this must be running in the model.train() model,
+                    # since the client will continue the iteration based on the server logits.
+                    s_logits_dict[batch_index] = output_batch.cpu().detach().numpy()
 
         # compute mean of all metrics in summary
         train_metrics = {'train_loss': loss_avg.value(),
@@ -289,6 +286,49 @@ class GKTServerTrainer(object):
         logging.info("- Train metrics: " + metrics_string)
         return train_metrics
 
+    def train_step(self, batch_feature_map_x, batch_logits, batch_labels, loss_avg, accTop1_avg, accTop5_avg):
+        output_batch = self.model_global(batch_feature_map_x)
+
+        if self.args.whether_distill_on_the_server == 1:
+            loss_kd = self.criterion_KL(output_batch, batch_logits).to(self.device)
+            loss_true = self.criterion_CE(output_batch, batch_labels).to(self.device)
+            loss = loss_kd + self.args.alpha * loss_true
+        else:
+            loss_true = self.criterion_CE(output_batch, batch_labels).to(self.device)
+            loss = loss_true
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
+        # Update average loss and accuracy
+        metrics = utils.accuracy(output_batch, batch_labels, topk=(1, 5))
+        accTop1_avg.update(metrics[0].item())
+        accTop5_avg.update(metrics[1].item())
+        loss_avg.update(loss.item())
+        return output_batch
+
+    def train_on_shuffled_batches(self, loss_avg, accTop1_avg, accTop5_avg):
+        # the server logits of every sample, cut back into each client's own batches once the epoch is done
+        client_rows_logits = dict()
+        for client_rows, features, logits, labels in self.feature_store.shuffled_batches(self.args.server_batch_size):
+            output_batch = self.train_step(torch.from_numpy(features).to(self.device),
+                                           torch.from_numpy(logits).float().to(self.device),
+                                           torch.from_numpy(labels).long().to(self.device),
+                                           loss_avg, accTop1_avg, accTop5_avg)
+            output = output_batch.cpu().detach().numpy()
+            for client_index, (pos, local_rows) in client_rows.items():
+                if client_index not in client_rows_logits:
+                    num_rows = self.feature_store.clients[client_index][0].num_rows
+                    client_rows_logits[client_index] = np.empty((num_rows,) + output.shape[1:], dtype=output.dtype)
+                client_rows_logits[client_index][local_rows] = output[pos]
+
+        for client_index, (features, _, _) in self.feature_store.clients.items():
+            rows_logits = client_rows_logits.get(client_index)
+            self.server_logits_dict[client_index] = {
+                batch_index: rows_logits[features.offsets[batch_index]:features.offsets[batch_index + 1]]
+                for batch_index in range(len(features))} if rows_logits is not None else dict()
+
     def eval_large_model_on_the_server(self):
 
         # set model to evaluation mode
@@ -0,0 +1,184 @@
+import os
+from collections.abc import Mapping
+
+import numpy as np
+import torch
+
+COMPRESSIONS = ['none', 'fp16', 'int8']
+
+
+class PackedBatches(Mapping):
+    """A client's {batch_index: np.ndarray} dict stored as one contiguous array with a batch offset index.
+
+    Batch b is rows offsets[b]:offsets[b + 1] of data. With fp16 compression data is float16, with int8 every
+    row is quantized symmetrically with its own scale (scales[row]); indexing returns the batch dequantized to
+    float32, so the packed batches read like the dict they replace. It is sent as the three arrays of
+    to_params() instead of one array per batch.
+    """
+
+    def __init__(self, data, offsets, compression='none', scales=None):
+        self.data = data
+        self.offsets = offsets
+        self.compression = compression
+        self.scales = scales
+
+    @classmethod
+    def pack(cls, batch_dict, compression='none'):
+        batches = [np.asarray(batch_dict[b]) for b in sorted(batch_dict.keys())]
+        writer = PackedBatchesWriter(sum(len(batch) for batch in batches), compression)
+        for batch in batches:
+            writer.add(batch)
+        return writer.finish()
+
+    def __getitem__(self, batch_index):
+        if not 0 <= batch_index < len(self):
+            raise KeyError(batch_index)
+        return self.rows(slice(self.offsets[batch_index], self.offsets[batch_index + 1]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    @property
+    def num_rows(self):
+        return int(self.offsets[-1])
+
+    def rows(self, index):
+        """Rows index (a slice or sorted row numbers) across batches, dequantized."""
+        data = np.asarray(self.data[index])
+        if self.compression == 'int8':
+            scales = self.scales[index].reshape((-1,) + (1,) * (data.ndim - 1))
+            return data.astype(np.float32) * scales
+        if self.compression == 'fp16':
+            return data.astype(np.float32)
+        # a slice of a memory-mapped file is read-only
+        return data if data.flags.writeable else data.copy()
+
+    def to_params(self):
+        # plain arrays in a dict, which every message codec can carry
+        return {'data': self.data, 'offsets': self.offsets, 'compression': self.compression, 'scales': self.scales}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(params['data'], params['offsets'], params['compression'], params['scales'])
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def save(self, path):
+        # every array is written to a temporary name and renamed, a memmap of the previous round's file stays valid
+        arrays = {'data': self.data, 'offsets': self.offsets}
+        if self.scales is not None:
+            arrays['scales'] = self.scales
+        for name, array in arrays.items():
+            with open('%s_%s.tmp.npy' % (path, name), 'wb') as f:
+                np.save(f, array)
+            os.replace('%s_%s.tmp.npy' % (path, name), '%s_%s.npy' % (path, name))
+        return self.load(path, self.compression)
+
+    @classmethod
+    def load(cls, path, compression):
+        data = np.load(path + '_data.npy', mmap_mode='r')
+        offsets = np.load(path + '_offsets.npy')
+        scales = np.load(path + '_scales.npy') if compression == 'int8' else None
+        return cls(data, offsets, compression, scales)
+
+
+class PackedBatchesWriter(object):
+    """Builds a PackedBatches batch by batch, for batches that are produced one at a time.
+
+    The data array is allocated for num_rows rows in the compressed dtype when the first batch shows the row
+    shape, and every batch is compressed straight into its rows, so no per-batch arrays or float32 copy of
+    all batches are kept. Fewer rows than num_rows may be added (e.g. a loader that drops the last batch).
+    """
+
+    def __init__(self, num_rows, compression='none'):
+        if compression not in COMPRESSIONS:
+            raise ValueError("unknown feature compression %s, possible options: %s" % (compression, COMPRESSIONS))
+        self.num_rows = num_rows
+        self.compression = compression
+        self.data = None
+        self.scales = np.empty(num_rows, dtype=np.float32) if compression == 'int8' else None
+        self.offsets = [0]
+
+    def add(self, batch):
+        batch = np.asarray(batch)
+        start, end = self.offsets[-1], self.offsets[-1] + len(batch)
+        if end > self.num_rows:
+            raise ValueError("batch ends at row %d, past the %d rows of the writer" % (end, self.num_rows))
+        if self.data is None:
+            dtype = {'fp16': np.float16, 'int8': np.int8}.get(self.compression, batch.dtype)
+            self.data = np.empty((self.num_rows,) + batch.shape[1:], dtype=dtype)
+        if self.compression == 'int8':
+            flat = batch.reshape(len(batch), -1).astype(np.float32, copy=False)
+            scales = np.abs(flat).max(axis=1) / 127. if flat.size else np.zeros(len(batch), dtype=np.float32)
+            scales[scales == 0] = 1.
+            self.data[start:end] = np.round(flat / scales[:, None]).astype(np.int8).reshape(batch.shape)
+            self.scales[start:end] = scales
+        else:
+            # a cast to float16 for fp16
+            self.data[start:end] = batch
+        self.offsets.append(end)
+
+    def finish(self):
+        num_rows = self.offsets[-1]
+        if self.data is None:
+            self.data = np.zeros(0, dtype={'fp16': np.float16, 'int8': np.int8}.get(self.compression, np.float32))
+        scales = self.scales[:num_rows] if self.scales is not None else None
+        return PackedBatches(self.data[:num_rows], np.array(self.offsets, dtype=np.int64), self.compression, scales)
+
+
+class FeatureStore(object):
+    """The packed training features, logits and labels the clients uploaded in the current round.
+
+    With a store_dir every client's arrays are written to disk as they arrive and kept only as read-only
+    memory maps, so the server holds no client's features in memory. shuffled_batches() draws batches of
+    rows across all clients instead of replaying the clients' own batches one client at a time.
+    """
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        # key: client_index; value: (features, logits, labels)
+        self.clients = dict()
+
+    def add(self, client_index, features, logits, labels):
+        """logits can be None (the test features come without)."""
+        packed_list = [features, logits, labels]
+        if self.store_dir:
+            packed_list = [packed.save(os.path.join(self.store_dir, 'client_%d_%s' % (client_index, name)))
+                           if packed is not None else None
+                           for packed, name in zip(packed_list, ['features', 'logits', 'labels'])]
+        self.clients[client_index] = packed_list
+        return packed_list
+
+    def shuffled_batches(self, batch_size):
+        """Yields (client_rows, features, logits, labels), client_rows maps a client to the rows of the batch that
+        belong to it and their positions in the client's own arrays."""
+        client_indexes = sorted(self.clients.keys())
+        starts = np.cumsum([0] + [self.clients[c][0].num_rows for c in client_indexes])
+        perm = torch.randperm(int(starts[-1])).numpy()
+        for start in range(0, len(perm), batch_size):
+            global_rows = perm[start:start + batch_size]
+            owners = np.searchsorted(starts, global_rows, side='right') - 1
+            client_rows = dict()
+            parts = [[], [], []]
+            batch_pos = []
+            for owner in np.unique(owners):
+                pos = np.nonzero(owners == owner)[0]
+                local_rows = global_rows[pos] - starts[owner]
+                order = np.argsort(local_rows)
+                pos, local_rows = pos[order], local_rows[order]
+                client_rows[client_indexes[owner]] = (pos, local_rows)
+                for part, packed in zip(parts, self.clients[client_indexes[owner]]):
+                    if packed is not None:
+                        part.append(packed.rows(local_rows))
+                batch_pos.append(pos)
+            # back from client order to the shuffled order of the batch
+            inverse = np.argsort(np.concatenate(batch_pos))
+            features, logits, labels = [np.concatenate(part)[inverse] if part else None for part in parts]
+            yield client_rows, features, logits, labels
@@ -7,6 +7,7 @@ import numpy as np
 import torch
 import wandb
 
+from fedml_core.aggregation.weighted_aggregation import weighted_average
 from .optrepo import OptRepo
 from .utils import transform_list_to_tensor
 
@@ -34,6 +35,11 @@ class FedOptAggregator(object):
         self.sample_num_dict = dict()
         self.flag_client_model_uploaded_dict = dict()
         self.opt = self._instantiate_opt()
+        # persistent .grad buffers of the server optimizer, views of one flat tensor
+        self.trainable_params = [(name, param) for name, param in self.trainer.model.named_parameters()
+                                 if param.requires_grad]
+        self.server_grads = None
+        self.server_grad_views = None
         for idx in range(self.worker_num):
             self.flag_client_model_uploaded_dict[idx] = False
 
@@ -81,46 +87,41 @@ class FedOptAggregator(object):
         logging.info("len of self.model_dict[idx] = " + str(len(self.model_dict)))
 
         # logging.info("################aggregate: %d" % len(model_list))
-        (num0, averaged_params) = model_list[0]
-        for k in averaged_params.keys():
-            for i in range(0, len(model_list)):
-                local_sample_number, local_model_params = model_list[i]
-                w = local_sample_number / training_num
-                if i == 0:
-                    averaged_params[k] = local_model_params[k] * w
-                else:
-                    averaged_params[k] += local_model_params[k] * w
-
-        # server optimizer
-        # save optimizer state
-        self.opt.zero_grad()
-        opt_state = self.opt.state_dict()
-        # set new aggregated grad
+        averaged_params = weighted_average(model_list)
+
+        # server optimizer: one long-lived optimizer stepped on the pseudo-gradient w_global - w_avg
         self.set_model_global_grads(averaged_params)
-        self.opt = self._instantiate_opt()
-        # load optimizer state
-        self.opt.load_state_dict(opt_state)
         self.opt.step()
 
         end_time = time.time()
         logging.info("aggregate time cost: %d" % (end_time - start_time))
         return self.get_global_model_params()
 
+    def _init_server_grads(self, device):
+        self.server_grads = torch.zeros(sum(param.numel() for _, param in self.trainable_params), device=device)
+        self.server_grad_views = []
+        offset = 0
+        for _, param in self.trainable_params:
+            self.server_grad_views.append(
+                self.server_grads[offset:offset + param.numel()].view(param.shape).to(param.dtype))
+            offset += param.numel()
+        # the optimizer state follows the parameters when the model has been moved to another device
+        self.opt.load_state_dict(self.opt.state_dict())
+
     def set_model_global_grads(self, new_state):
-        new_model = copy.deepcopy(self.trainer.model)
-        new_model.load_state_dict(new_state)
+        model = self.trainer.model
+        device = self.trainable_params[0][1].device
+        if self.server_grads is None or self.server_grads.device != device:
+            self._init_server_grads(device)
         with torch.no_grad():
-            for parameter, new_parameter in zip(
-                    self.trainer.model.parameters(), new_model.parameters()
-            ):
-                parameter.grad = parameter.data - new_parameter.data
+            for (name, parameter), grad in zip(self.trainable_params, self.server_grad_views):
                 # because we go to the opposite direction of the gradient
-        model_state_dict = self.trainer.model.state_dict()
-        new_model_state_dict = new_model.state_dict()
-        for k in dict(self.trainer.model.named_parameters()).keys():
-            new_model_state_dict[k] = model_state_dict[k]
-        # self.trainer.model.load_state_dict(new_model_state_dict)
-        self.set_global_model_params(new_model_state_dict)
+                parameter.grad = grad
+                torch.sub(parameter, new_state[name].to(device=device, dtype=parameter.dtype), out=grad)
+            # the parameters are left to the optimizer, everything else (e.g. BatchNorm statistics) is averaged
+            for name, buffer in model.named_buffers():
+                if name in new_state:
+                    buffer.copy_(new_state[name])
 
     def client_sampling(self, round_idx, client_num_in_total, client_num_per_round):
         if client_num_in_total == client_num_per_round:
@@ -1,3 +1,6 @@
+from collections import OrderedDict
+
+import torch
 import torch.optim as optim
 
 
@@ -21,17 +24,59 @@ class SplitNN_client():
         self.trainloader = args["trainloader"]
         self.device = args["device"]
 
+        # pipelining: up to micro_batches batches are in flight (sent, gradient not applied yet), and the
+        # optimizer steps every step_every gradients so that no gradient is applied more than
+        # max_staleness steps after the forward pass that produced it. 1 micro-batch is the lock-step protocol.
+        self.micro_batches = getattr(args["args"], "pipeline_micro_batches", 1)
+        self.max_staleness = getattr(args["args"], "pipeline_staleness", 0)
+        if self.max_staleness <= 0:
+            self.step_every = self.micro_batches
+        else:
+            self.step_every = max(1, -(-(self.micro_batches - 1) // self.max_staleness))
+        # key: batch_idx; value: (activations, optimizer steps taken before the forward pass)
+        self.in_flight = OrderedDict()
+        self.accumulated = 0
+        self.version = 0
+        self.staleness_seen = 0
+        self.param_ptrs = set(p.data_ptr() for p in self.model.parameters())
+
     def forward_pass(self):
         inputs, labels = next(self.dataloader)
         inputs, labels = inputs.to(self.device), labels.to(self.device)
-        self.optimizer.zero_grad()
 
-        self.acts = self.model(inputs)
+        if self.model.training and self.max_staleness > 0:
+            # the optimizer updates the weights in place before this batch's gradient comes back, so the
+            # weights autograd saves for the backward pass are stashed copies
+            with torch.autograd.graph.saved_tensors_hooks(self.stash_weights, lambda t: t):
+                self.acts = self.model(inputs)
+        else:
+            self.acts = self.model(inputs)
+        if self.model.training:
+            self.in_flight[self.batch_idx] = (self.acts, self.version)
         return self.acts, labels
 
-    def backward_pass(self, grads):
-        self.acts.backward(grads)
-        self.optimizer.step()
+    def stash_weights(self, t):
+        return t.clone() if t.data_ptr() in self.param_ptrs else t
+
+    def backward_pass(self, grads, batch_idx=None):
+        if batch_idx is None:
+            batch_idx = next(iter(self.in_flight))
+        acts, version = self.in_flight.pop(batch_idx)
+        self.staleness_seen = max(self.staleness_seen, self.version - version)
+        acts.backward(grads / self.step_every if self.step_every > 1 else grads)
+        self.accumulated += 1
+        # the last batches of the epoch are applied without waiting for a full accumulation
+        if self.accumulated == self.step_every or (not self.in_flight and self.batch_idx == len(self.trainloader)):
+            self.optimizer.step()
+            self.optimizer.zero_grad()
+            self.accumulated = 0
+            self.version += 1
+
+    def can_forward(self):
+        if self.batch_idx >= len(self.trainloader) or len(self.in_flight) >= self.micro_batches:
+            return False
+        # without staleness the window is only refilled once the gradients of the last one are applied
+        return self.max_staleness > 0 or self.accumulated == 0
 
     def eval_mode(self):
         self.dataloader = iter(self.testloader)
@@ -40,3 +85,5 @@ class SplitNN_client():
     def train_mode(self):
         self.dataloader = iter(self.trainloader)
         self.model.train()
+        self.optimizer.zero_grad()
+        self.batch_idx = 0
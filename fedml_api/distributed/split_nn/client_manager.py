@@ -17,7 +17,7 @@ class SplitNNClientManager(ClientManager):
     def run(self):
         if self.trainer.rank == 1:
             logging.info("Starting protocol from rank 1 process")
-            self.run_forward_pass()
+            self.fill_pipeline()
         super().run()
 
     def register_message_receive_handlers(self):
@@ -30,13 +30,18 @@ class SplitNNClientManager(ClientManager):
         # no point in checking the semaphore message
         logging.info("Starting training at node {}".format(self.trainer.rank))
         self.trainer.train_mode()
-        self.run_forward_pass()
+        self.fill_pipeline()
 
     def run_forward_pass(self):
         acts, labels = self.trainer.forward_pass()
-        self.send_activations_and_labels_to_server(acts, labels, self.trainer.SERVER_RANK)
+        self.send_activations_and_labels_to_server(acts, labels, self.trainer.batch_idx, self.trainer.SERVER_RANK)
         self.trainer.batch_idx += 1
 
+    def fill_pipeline(self):
+        # the forward passes of the next batches run while the server works on the ones already sent
+        while self.trainer.can_forward():
+            self.run_forward_pass()
+
     def run_eval(self):
         self.send_validation_signal_to_server(self.trainer.SERVER_RANK)
         self.trainer.eval_mode()
@@ -56,17 +61,19 @@ class SplitNNClientManager(ClientManager):
 
     def handle_message_gradients(self, msg_params):
         grads = msg_params.get(MyMessage.MSG_ARG_KEY_GRADS)
-        self.trainer.backward_pass(grads)
-        if self.trainer.batch_idx == len(self.trainer.trainloader):
-            logging.info("Epoch over at node {}".format(self.rank))
+        self.trainer.backward_pass(grads, msg_params.get(MyMessage.MSG_ARG_KEY_BATCH_IDX))
+        if self.trainer.batch_idx == len(self.trainer.trainloader) and not self.trainer.in_flight:
+            logging.info("Epoch over at node {}, max gradient staleness {}".format(self.rank,
+                                                                                self.trainer.staleness_seen))
             self.round_idx += 1
             self.run_eval()
         else:
-            self.run_forward_pass()
+            self.fill_pipeline()
 
-    def send_activations_and_labels_to_server(self, acts, labels, receive_id):
+    def send_activations_and_labels_to_server(self, acts, labels, batch_idx, receive_id):
         message = Message(MyMessage.MSG_TYPE_C2S_SEND_ACTS, self.get_sender_id(), receive_id)
         message.add_params(MyMessage.MSG_ARG_KEY_ACTS, (acts, labels))
+        message.add_params(MyMessage.MSG_ARG_KEY_BATCH_IDX, batch_idx)
         self.send_message(message)
 
     def send_semaphore_to_client(self, receive_id):
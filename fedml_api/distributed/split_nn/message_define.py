@@ -23,3 +23,4 @@ class MyMessage(object):
     """
     MSG_ARG_KEY_ACTS = "activations"
     MSG_ARG_KEY_GRADS = "activation_grads"
+    MSG_ARG_KEY_BATCH_IDX = "batch_idx"
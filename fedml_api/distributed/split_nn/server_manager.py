@@ -23,9 +23,10 @@ class SplitNNServerManager(ServerManager):
         self.register_message_receive_handler(MyMessage.MSG_TYPE_C2S_PROTOCOL_FINISHED,
                                               self.handle_message_finish_protocol)
 
-    def send_grads_to_client(self, receive_id, grads):
+    def send_grads_to_client(self, receive_id, grads, batch_idx):
         message = Message(MyMessage.MSG_TYPE_S2C_GRADS, self.get_sender_id(), receive_id)
         message.add_params(MyMessage.MSG_ARG_KEY_GRADS, grads)
+        message.add_params(MyMessage.MSG_ARG_KEY_BATCH_IDX, batch_idx)
         self.send_message(message)
 
     def handle_message_acts(self, msg_params):
@@ -33,7 +34,8 @@ class SplitNNServerManager(ServerManager):
         self.trainer.forward_pass(acts, labels)
         if self.trainer.phase == "train":
             grads = self.trainer.backward_pass()
-            self.send_grads_to_client(self.trainer.active_node, grads)
+            # tagged with the client's batch index, with micro-batches in flight the client matches it to its acts
+            self.send_grads_to_client(self.trainer.active_node, grads, msg_params.get(MyMessage.MSG_ARG_KEY_BATCH_IDX))
 
     def handle_message_validation_mode(self, msg_params):
         self.trainer.eval_mode()
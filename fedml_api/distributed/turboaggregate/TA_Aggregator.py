@@ -7,6 +7,7 @@ import wandb
 import numpy as np
 from torch import nn
 
+from fedml_core.aggregation.weighted_aggregation import weighted_average
 from fedml_api.distributed.turboaggregate.utils import transform_list_to_tensor
 
 
@@ -67,15 +68,7 @@ class TA_Aggregator(object):
         logging.info("len of self.model_dict[idx] = " + str(len(self.model_dict)))
 
         # logging.info("################aggregate: %d" % len(model_list))
-        (num0, averaged_params) = model_list[0]
-        for k in averaged_params.keys():
-            for i in range(0, len(model_list)):
-                local_sample_number, local_model_params = model_list[i]
-                w = local_sample_number / training_num
-                if i == 0:
-                    averaged_params[k] = local_model_params[k] * w
-                else:
-                    averaged_params[k] += local_model_params[k] * w
+        averaged_params = weighted_average(model_list)
 
         # update the global model which is cached at the server side
         self.model.load_state_dict(averaged_params)
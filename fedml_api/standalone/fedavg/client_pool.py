@@ -0,0 +1,122 @@
+import logging
+import queue
+import random
+import traceback
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from fedml_api.standalone.fedavg.client import Client
+from fedml_core.aggregation.weighted_aggregation import ParamLayout
+
+
+def train_client(client, w_global, seed):
+    """Trains client from w_global with every RNG seeded by seed, leaving the caller's RNG streams untouched.
+
+    Seeding per client instead of sharing one stream across the round is what makes a client's update
+    independent of the clients trained before it, and therefore of the process it is trained in.
+    """
+    with torch.random.fork_rng(devices=[]):
+        np_state, py_state = np.random.get_state(), random.getstate()
+        torch.manual_seed(seed)
+        np.random.seed(seed)
+        random.seed(seed)
+        try:
+            return client.train(w_global)
+        finally:
+            np.random.set_state(np_state)
+            random.setstate(py_state)
+
+
+def _worker_loop(layout, global_params, local_params, task_queue, result_queue,
+                 train_data_local_dict, test_data_local_dict, train_data_local_num_dict, args, device, model_trainer):
+    # the OpenMP thread pool of the parent does not survive the fork, a worker that enters a parallel region
+    # with more than one thread hangs in it: workers run single-threaded, parallelism comes from the workers
+    torch.set_num_threads(1)
+    # the model_trainer (and its model) was copied by fork, it is this worker's own replica
+    client = Client(0, None, None, None, args, device, model_trainer)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        slot, client_idx, seed = task
+        try:
+            client.update_local_dataset(client_idx, train_data_local_dict[client_idx],
+                                        test_data_local_dict[client_idx], train_data_local_num_dict[client_idx])
+            w = train_client(client, layout.unflatten(global_params), seed)
+            layout.flatten(w, out=local_params[slot])
+            result_queue.put((slot, client.get_sample_number(), None))
+        except Exception:
+            result_queue.put((slot, None, traceback.format_exc()))
+
+
+class ClientProcessPool(object):
+    """Persistent worker processes that train the clients of a round in parallel.
+
+    Weights never go through the queues: the global model is written once per round into a flat shared
+    memory tensor that every worker loads from, and each worker writes the trained model into the row of
+    a shared [client_num_per_round, numel] tensor that belongs to its task. Workers are forked, so they
+    inherit the datasets and a replica of the model instead of receiving them pickled; CPU training only.
+    Every worker uses a single intra-op thread, so worker_num is the number of cores the pool uses.
+    """
+
+    def __init__(self, worker_num, client_num_per_round, model_trainer, train_data_local_dict, test_data_local_dict,
+                 train_data_local_num_dict, args, device):
+        if worker_num > 0 and torch.device(device).type != 'cpu':
+            # a CUDA context does not survive fork, the workers would fail on their first tensor op
+            raise ValueError("client_parallel_workers > 0 trains clients in forked CPU processes, but the device "
+                             "is %s; run on cpu or set client_parallel_workers to 0" % device)
+        self.layout = ParamLayout(model_trainer.get_model_params())
+        self.global_params = torch.zeros(self.layout.numel, dtype=self.layout.dtype).share_memory_()
+        self.local_params = torch.zeros((client_num_per_round, self.layout.numel),
+                                        dtype=self.layout.dtype).share_memory_()
+
+        ctx = mp.get_context('fork')
+        self.task_queue = ctx.SimpleQueue()
+        self.result_queue = ctx.Queue()
+        self.workers = []
+        for _ in range(worker_num):
+            worker = ctx.Process(target=_worker_loop, daemon=True,
+                                 args=(self.layout, self.global_params, self.local_params, self.task_queue,
+                                       self.result_queue, train_data_local_dict, test_data_local_dict,
+                                       train_data_local_num_dict, args, device, model_trainer))
+            worker.start()
+            self.workers.append(worker)
+        logging.info("started %d client training processes" % worker_num)
+
+    def train(self, client_indexes, w_global, seeds):
+        """Returns w_locals, [(sample_num, state_dict)] in the order of client_indexes."""
+        self.layout.flatten(w_global, out=self.global_params)
+        for slot, (client_idx, seed) in enumerate(zip(client_indexes, seeds)):
+            self.task_queue.put((slot, int(client_idx), int(seed)))
+
+        sample_nums = dict()
+        errors = []
+        for _ in range(len(client_indexes)):
+            slot, sample_num, error = self._get_result()
+            if error is not None:
+                errors.append(error)
+            sample_nums[slot] = sample_num
+        if errors:
+            raise RuntimeError("client training failed in a worker process:\n" + errors[0])
+        return [(sample_nums[slot], self.layout.unflatten(self.local_params[slot]))
+                for slot in range(len(client_indexes))]
+
+    def _get_result(self):
+        # a worker killed by a signal or the OOM killer never answers, fail instead of waiting forever
+        while True:
+            try:
+                return self.result_queue.get(timeout=1.0)
+            except queue.Empty:
+                for worker in self.workers:
+                    if not worker.is_alive():
+                        raise RuntimeError("client training process %d exited with code %s" %
+                                           (worker.pid, worker.exitcode))
+
+    def close(self):
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
@@ -7,6 +7,8 @@ import torch
 import wandb
 
 from fedml_api.standalone.fedavg.client import Client
+from fedml_api.standalone.fedavg.client_pool import ClientProcessPool, train_client
+from fedml_core.aggregation.weighted_aggregation import weighted_average
 
 
 class FedAvgAPI(object):
@@ -29,6 +31,12 @@ class FedAvgAPI(object):
         self.model_trainer = model_trainer
         self._setup_clients(train_data_local_num_dict, train_data_local_dict, test_data_local_dict, model_trainer)
 
+        self.client_pool = None
+        if args.client_parallel_workers > 0:
+            self.client_pool = ClientProcessPool(args.client_parallel_workers, args.client_num_per_round,
+                                                 model_trainer, train_data_local_dict, test_data_local_dict,
+                                                 train_data_local_num_dict, args, device)
+
     def _setup_clients(self, train_data_local_num_dict, train_data_local_dict, test_data_local_dict, model_trainer):
         logging.info("############setup_clients (START)#############")
         for client_idx in range(self.args.client_num_per_round):
@@ -38,7 +46,8 @@ class FedAvgAPI(object):
         logging.info("############setup_clients (END)#############")
 
     def train(self):
-        w_global = self.model_trainer.get_model_params()
+        # a copy, get_model_params returns the live tensors of the model the clients are trained on
+        w_global = copy.deepcopy(self.model_trainer.get_model_params())
         for round_idx in range(self.args.comm_round):
 
             logging.info("################Communication round : {}".format(round_idx))
@@ -53,17 +62,23 @@ class FedAvgAPI(object):
                                                    self.args.client_num_per_round)
             logging.info("client_indexes = " + str(client_indexes))
 
-            for idx, client in enumerate(self.client_list):
-                # update dataset
-                client_idx = client_indexes[idx]
-                client.update_local_dataset(client_idx, self.train_data_local_dict[client_idx],
-                                            self.test_data_local_dict[client_idx],
-                                            self.train_data_local_num_dict[client_idx])
+            # one seed per client, so the updates do not depend on whether clients are trained in parallel
+            seeds = torch.randint(0, 2 ** 31 - 1, (len(client_indexes),)).tolist()
+
+            if self.client_pool is not None:
+                w_locals = self.client_pool.train(client_indexes, w_global, seeds)
+            else:
+                for idx, client in enumerate(self.client_list):
+                    # update dataset
+                    client_idx = client_indexes[idx]
+                    client.update_local_dataset(client_idx, self.train_data_local_dict[client_idx],
+                                                self.test_data_local_dict[client_idx],
+                                                self.train_data_local_num_dict[client_idx])
 
-                # train on new dataset
-                w = client.train(copy.deepcopy(w_global))
-                # self.logger.info("local weights = " + str(w))
-                w_locals.append((client.get_sample_number(), copy.deepcopy(w)))
+                    # train on new dataset
+                    w = train_client(client, copy.deepcopy(w_global), seeds[idx])
+                    # self.logger.info("local weights = " + str(w))
+                    w_locals.append((client.get_sample_number(), copy.deepcopy(w)))
 
             # update global weights
             w_global = self._aggregate(w_locals)
@@ -80,6 +95,9 @@ class FedAvgAPI(object):
                 else:
                     self._local_test_on_all_clients(round_idx)
 
+        if self.client_pool is not None:
+            self.client_pool.close()
+
     def _client_sampling(self, round_idx, client_num_in_total, client_num_per_round):
         if client_num_in_total == client_num_per_round:
             client_indexes = [client_index for client_index in range(client_num_in_total)]
@@ -98,21 +116,7 @@ class FedAvgAPI(object):
         self.val_global = sample_testset
 
     def _aggregate(self, w_locals):
-        training_num = 0
-        for idx in range(len(w_locals)):
-            (sample_num, averaged_params) = w_locals[idx]
-            training_num += sample_num
-
-        (sample_num, averaged_params) = w_locals[0]
-        for k in averaged_params.keys():
-            for i in range(0, len(w_locals)):
-                local_sample_number, local_model_params = w_locals[i]
-                w = local_sample_number / training_num
-                if i == 0:
-                    averaged_params[k] = local_model_params[k] * w
-                else:
-                    averaged_params[k] += local_model_params[k] * w
-        return averaged_params
+        return weighted_average(w_locals)
 
     def _local_test_on_all_clients(self, round_idx):
 
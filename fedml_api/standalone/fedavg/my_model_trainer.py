@@ -3,8 +3,10 @@ from torch import nn
 
 try:
     from fedml_core.trainer.model_trainer import ModelTrainer
+    from fedml_core.trainer.tensor_batcher import get_batch_iterator
 except ImportError:
     from FedML.fedml_core.trainer.model_trainer import ModelTrainer
+    from FedML.fedml_core.trainer.tensor_batcher import get_batch_iterator
 
 
 class MyModelTrainer(ModelTrainer):
@@ -28,10 +30,11 @@ class MyModelTrainer(ModelTrainer):
             optimizer = torch.optim.Adam(filter(lambda p: p.requires_grad, self.model.parameters()), lr=args.lr,
                                          weight_decay=args.wd, amsgrad=True)
 
+        train_batches = get_batch_iterator(train_data, device)
         epoch_loss = []
         for epoch in range(args.epochs):
             batch_loss = []
-            for batch_idx, (x, labels) in enumerate(train_data):
+            for batch_idx, (x, labels) in enumerate(train_batches):
                 x, labels = x.to(device), labels.to(device)
                 # logging.info("x.size = " + str(x.size()))
                 # logging.info("labels.size = " + str(labels.size()))
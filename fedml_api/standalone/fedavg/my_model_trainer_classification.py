@@ -6,8 +6,10 @@ import numpy as np
 
 try:
     from fedml_core.trainer.model_trainer import ModelTrainer
+    from fedml_core.trainer.tensor_batcher import get_batch_iterator
 except ImportError:
     from FedML.fedml_core.trainer.model_trainer import ModelTrainer
+    from FedML.fedml_core.trainer.tensor_batcher import get_batch_iterator
 
 
 class MyModelTrainer(ModelTrainer):
@@ -31,10 +33,11 @@ class MyModelTrainer(ModelTrainer):
             optimizer = torch.optim.Adam(filter(lambda p: p.requires_grad, self.model.parameters()), lr=args.lr,
                                          weight_decay=args.wd, amsgrad=True)
 
+        train_batches = get_batch_iterator(train_data, device)
         epoch_loss = []
         for epoch in range(args.epochs):
             batch_loss = []
-            for batch_idx, (x, labels) in enumerate(train_data):
+            for batch_idx, (x, labels) in enumerate(train_batches):
                 x, labels = x.to(device), labels.to(device)
                 model.zero_grad()
                 log_probs = model(x)
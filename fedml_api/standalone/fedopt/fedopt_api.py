@@ -7,6 +7,7 @@ import wandb
 import torch
 
 from fedml_api.standalone.fedopt.client import Client
+from fedml_core.aggregation.weighted_aggregation import weighted_average
 from fedml_api.standalone.fedopt.optrepo import OptRepo
 
 
@@ -120,21 +121,7 @@ class FedOptAPI(object):
                     self._local_test_on_all_clients(round_idx)
 
     def _aggregate(self, w_locals):
-        training_num = 0
-        for idx in range(len(w_locals)):
-            (sample_num, averaged_params) = w_locals[idx]
-            training_num += sample_num
-
-        (sample_num, averaged_params) = w_locals[0]
-        for k in averaged_params.keys():
-            for i in range(0, len(w_locals)):
-                local_sample_number, local_model_params = w_locals[i]
-                w = local_sample_number / training_num
-                if i == 0:
-                    averaged_params[k] = local_model_params[k] * w
-                else:
-                    averaged_params[k] += local_model_params[k] * w
-        return averaged_params
+        return weighted_average(w_locals)
 
     def _set_model_global_grads(self, new_state):
         new_model = copy.deepcopy(self.model_trainer.model)
@@ -0,0 +1,147 @@
+import logging
+import time
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from fedml_api.standalone.turboaggregate.mpc_function import LCC_encoding, LCC_decoding_with_points
+from fedml_core.aggregation.weighted_aggregation import ParamLayout
+
+
+class TurboAggregateSecureAggregator(object):
+    """Sample-weighted model averaging computed on LCC shares in the prime field, as in Turbo-Aggregate.
+
+    The N users are split into groups of ceil(log N) users that form a chain. Every user quantizes its flattened
+    model to the field (fixed point, negative values wrapped around p), multiplies it by its integer sample
+    count in the field and LCC-encodes it with K data pieces and T random pieces into one share per user of the
+    next group. The shares are added to the partial aggregate the group passes along the chain, and the final
+    aggregate sum_i sample_num_i * w_i is decoded from K + T shares, dequantized and only then divided by the
+    total sample count, so a user with few samples keeps the full precision of its weights.
+    Every parameter tensor gets its own scale of at most quant_bits fractional bits, the largest one for which
+    the sample-weighted sum of that tensor cannot leave the field.
+    The parameter vector is processed in chunks of chunk_size entries, so only the shares of one chunk are
+    ever in memory; the time spent in every stage is accumulated in self.timings.
+    """
+
+    def __init__(self, client_num, p=2 ** 31 - 1, quant_bits=16, T=1, chunk_size=2 ** 20):
+        self.p = p
+        self.quant_bits = quant_bits
+        self.chunk_size = chunk_size
+
+        n_users_layer = max(int(np.ceil(np.log(client_num))), 1)
+        self.groups = [list(range(start, min(start + n_users_layer, client_num)))
+                       for start in range(0, client_num, n_users_layer)]
+        self.n_shares = n_users_layer
+        self.T = min(T, self.n_shares - 1)
+        self.K = self.n_shares - self.T
+
+        # evaluation points used by LCC_encoding
+        stt_b, stt_a = -int(np.floor((self.K + self.T) / 2)), -int(np.floor(self.n_shares / 2))
+        self.beta_s = np.mod(np.arange(stt_b, stt_b + self.K + self.T), p).astype('int64')
+        self.alpha_s = np.mod(np.arange(stt_a, stt_a + self.n_shares), p).astype('int64')
+        logging.info("Turbo-Aggregate: %d groups of %d users, K = %d, T = %d" % (len(self.groups), n_users_layer,
+                                                                                 self.K, self.T))
+        self.timings = OrderedDict((stage, 0.) for stage in ['quantize', 'encode', 'aggregate', 'decode',
+                                                             'dequantize'])
+
+    def quantize(self, x, scale):
+        return np.mod(np.round(x * scale).astype('int64'), self.p)
+
+    def dequantize(self, q, scale):
+        q = np.where(q > self.p // 2, q - self.p, q)
+        return q / scale
+
+    def get_scales(self, layout, w_locals):
+        """The fixed point scale of every tensor of the layout.
+
+        The field holds values in (-p/2, p/2), so sum_i sample_num_i * (max|w_i| * scale + 1/2) must stay below
+        p/2 for every tensor; e.g. num_batches_tracked gets a coarser scale than the weights instead of
+        limiting them.
+        """
+        weight_sum = sum(int(sample_num) for sample_num, _ in w_locals)
+        bound = (self.p // 2) / weight_sum - 0.5
+        if bound <= 0:
+            raise ValueError("%d samples in total do not fit the field p = %d" % (weight_sum, self.p))
+        scales = np.empty(len(layout.keys))
+        for t, k in enumerate(layout.keys):
+            values = [torch.as_tensor(w[k]).detach() for _, w in w_locals]
+            max_abs = max(float(v.abs().max()) if v.numel() else 0. for v in values)
+            bits = self.quant_bits
+            if max_abs > 0:
+                bits = min(bits, int(np.floor(np.log2(bound / max_abs))))
+            scales[t] = 2. ** bits
+        return scales
+
+    def aggregate(self, w_locals, total_sample_num):
+        """w_locals: [(sample_num, state_dict)] of every user, returns sum_i sample_num_i / total * w_i."""
+        for stage in self.timings:
+            self.timings[stage] = 0.
+        layout = ParamLayout(w_locals[0][1])
+        sample_nums = [int(sample_num) for sample_num, _ in w_locals]
+        t = time.time()
+        scales = self.get_scales(layout, w_locals)
+        self.timings['quantize'] += time.time() - t
+        flat = torch.empty(layout.numel, dtype=torch.float64)
+        for start in range(0, layout.numel, self.chunk_size):
+            end = min(start + self.chunk_size, layout.numel)
+            scale = _chunk_scale(layout, scales, start, end)
+            flat[start:end] = torch.from_numpy(self._aggregate_chunk(layout, w_locals, sample_nums, scale,
+                                                                     start, end))
+        flat.div_(total_sample_num)
+        w_glob = layout.unflatten(flat)
+        logging.info("Turbo-Aggregate timings: " + ", ".join("%s %.3fs" % kv for kv in self.timings.items()))
+        return w_glob
+
+    def _aggregate_chunk(self, layout, w_locals, sample_nums, scale, start, end):
+        piece_len = (end - start + self.K - 1) // self.K
+        share_sum = np.zeros((self.n_shares, piece_len), dtype='int64')
+        for group in self.groups:
+            for i in group:
+                t = time.time()
+                q = np.zeros(piece_len * self.K, dtype='int64')
+                q[:end - start] = self.quantize(_flat_slice(layout, w_locals[i][1], start, end), scale)
+                # the sample count weights the quantized model in the field, the division happens after decoding
+                q = np.mod(q * sample_nums[i], self.p)
+                self.timings['quantize'] += time.time() - t
+
+                t = time.time()
+                shares = LCC_encoding(q.reshape(-1, 1), self.n_shares, self.K, self.T, self.p)
+                self.timings['encode'] += time.time() - t
+
+                # the users of the next group add the shares to the partial aggregate they received
+                t = time.time()
+                share_sum += shares.reshape(self.n_shares, piece_len)
+                np.mod(share_sum, self.p, out=share_sum)
+                self.timings['aggregate'] += time.time() - t
+
+        t = time.time()
+        idx = list(range(self.K + self.T))
+        q_sum = LCC_decoding_with_points(share_sum[idx], self.alpha_s[idx], self.beta_s[:self.K], self.p)
+        self.timings['decode'] += time.time() - t
+
+        t = time.time()
+        x_sum = self.dequantize(q_sum.reshape(-1)[:end - start], scale)
+        self.timings['dequantize'] += time.time() - t
+        return x_sum
+
+
+def _chunk_scale(layout, scales, start, end):
+    # the scale of every entry [start, end) of the flattened model, from the tensor it belongs to
+    out = np.empty(end - start, dtype='float64')
+    for scale, shape, offset in zip(scales, layout.shapes, layout.offsets):
+        lo, hi = max(start, offset), min(end, offset + shape.numel())
+        if lo < hi:
+            out[lo - start:hi - start] = scale
+    return out
+
+
+def _flat_slice(layout, state_dict, start, end):
+    # entries [start, end) of layout.flatten(state_dict) without flattening the whole model
+    out = np.empty(end - start, dtype='float64')
+    for k, shape, offset in zip(layout.keys, layout.shapes, layout.offsets):
+        lo, hi = max(start, offset), min(end, offset + shape.numel())
+        if lo < hi:
+            v = torch.as_tensor(state_dict[k]).detach().reshape(-1)[lo - offset:hi - offset]
+            out[lo - start:hi - start] = v.cpu().double().numpy()
+    return out
@@ -6,6 +6,7 @@ import wandb
 from torch import nn
 
 from fedml_api.standalone.turboaggregate.TA_client import TA_Client
+from fedml_api.standalone.turboaggregate.TA_secure_aggregation import TurboAggregateSecureAggregator
 
 
 class TurboAggregateTrainer(object):
@@ -27,6 +28,10 @@ class TurboAggregateTrainer(object):
         self.client_list = []
         self.setup_clients(data_local_num_dict, train_data_local_dict, test_data_local_dict)
 
+        self.secure_aggregator = TurboAggregateSecureAggregator(
+            self.args.client_number, quant_bits=getattr(self.args, 'ta_quant_bits', 16),
+            T=getattr(self.args, 'ta_privacy_T', 1), chunk_size=getattr(self.args, 'ta_chunk_size', 2 ** 20))
+
     def setup_clients(self, data_local_num_dict, train_data_local_dict, test_data_local_dict):
         logging.info("############setup_clients (START)#############")
         for client_idx in range(self.args.client_number):
@@ -51,15 +56,14 @@ class TurboAggregateTrainer(object):
             # Turbo-Aggregate Protocol Starts HERE. #
             #########################################
 
-            # create the network topology
-            self.TA_topology_vanilla()
+            # quantize, LCC-encode along the group topology, aggregate the shares, decode and dequantize
+            w_glob = self.secure_aggregator.aggregate(w_locals, self.train_data_num)
+            for stage, seconds in self.secure_aggregator.timings.items():
+                wandb.log({"TA/Time-" + stage: seconds, "round": round_idx})
 
             #######################################
             # Turbo-Aggregate Protocol Ends HERE. #
             #######################################
-
-            # update global weights
-            w_glob = self.aggregate(w_locals)
             # logging.info("global weights = " + str(w_glob))
 
             # copy weight to net_glob
@@ -71,31 +75,6 @@ class TurboAggregateTrainer(object):
 
             self.local_test(self.model_global, round_idx)
 
-    def aggregate(self, w_locals):
-        logging.info("################aggregate: %d" % len(w_locals))
-        (num0, averaged_params) = w_locals[0]
-        for k in averaged_params.keys():
-            for i in range(0, len(w_locals)):
-                local_sample_number, local_model_params = w_locals[i]
-                w = local_sample_number / self.train_data_num
-                if i == 0:
-                    averaged_params[k] = local_model_params[k] * w
-                else:
-                    averaged_params[k] += local_model_params[k] * w
-        return averaged_params
-
-    def TA_topology_vanilla(self):
-        # logging.info("################aggregate: %d" % len(w_locals))
-
-        # N = self.args.client_number
-        # n_users_layer = np.ceil(np.log(N)).astype(int)
-        # n_layer = np.ceil(float(N) / float(n_users_layer)).astype(int)
-
-        # Set List of send_to, send_from
-
-        # Initialize the buffer of clients
-        pass
-
     def local_test(self, model_global, round_idx):
         self.local_test_on_training_data(model_global, round_idx)
         self.local_test_on_test_data(model_global, round_idx)
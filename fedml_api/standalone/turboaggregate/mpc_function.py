@@ -36,26 +36,70 @@ def PI(vals, p):  # upper-case PI -- product of inputs
     return accum
 
 
+def modular_inv_batch(a, p):
+    # Montgomery's trick: the inverses of all entries of a from prefix products and a single modular_inv
+    a = np.mod(np.asarray(a, dtype='int64').reshape(-1), p)
+    n = len(a)
+    inv = np.zeros(n, dtype='int64')
+    if n == 0:
+        return inv
+    prefix = [int(a[0])]
+    for v in a[1:]:
+        prefix.append(prefix[-1] * int(v) % p)
+    acc = int(modular_inv(prefix[-1], p))
+    for i in range(n - 1, 0, -1):
+        inv[i] = acc * prefix[i - 1] % p
+        acc = acc * int(a[i]) % p
+    inv[0] = acc
+    return inv
+
+
+def mod_matmul(A, B, p):
+    # A.dot(B) modulo p in int64 without overflow: B is split into two half-width limbs and the inner
+    # dimension into chunks small enough that no partial sum can exceed 2^63
+    A = np.mod(np.asarray(A, dtype='int64'), p)
+    B = np.mod(np.asarray(B, dtype='int64'), p)
+    n = A.shape[-1]
+    if n * (p - 1) ** 2 < 2 ** 63:
+        return np.mod(A.dot(B), p)
+    shift = (int(p - 1).bit_length() + 1) // 2
+    mask = (1 << shift) - 1
+    B_lo, B_hi = B & mask, B >> shift
+    chunk = max(1, (2 ** 63 - 1) // ((p - 1) * mask))
+    out = None
+    for k in range(0, n, chunk):
+        A_k = A[..., k:k + chunk]
+        lo = np.mod(A_k.dot(B_lo[k:k + chunk]), p)
+        hi = np.mod(A_k.dot(B_hi[k:k + chunk]), p)
+        part = np.mod(lo + np.mod(hi << shift, p), p)
+        out = part if out is None else np.mod(out + part, p)
+    return out
+
+
 def gen_Lagrange_coeffs(alpha_s, beta_s, p, is_K1=0):
+    # U[i][j] = prod_{k != j} (alpha_i - beta_k) / prod_{k != j} (beta_j - beta_k) mod p
+    alpha_s = np.mod(np.asarray(alpha_s, dtype='int64').reshape(-1), p)
+    beta_s = np.mod(np.asarray(beta_s, dtype='int64').reshape(-1), p)
     if is_K1 == 1:
-        num_alpha = 1
-    else:
-        num_alpha = len(alpha_s)
-    U = np.zeros((num_alpha, len(beta_s)), dtype='int64')
-    #         U = [[0 for col in range(len(beta_s))] for row in range(len(alpha_s))]
-    # print(alpha_s)
-    # print(beta_s)
-    for i in range(num_alpha):
-        for j in range(len(beta_s)):
-            cur_beta = beta_s[j]
-
-            den = PI([cur_beta - o for o in beta_s if cur_beta != o], p)
-            num = PI([alpha_s[i] - o for o in beta_s if cur_beta != o], p)
-            U[i][j] = divmod(num, den, p)
-            # for debugging
-            # print(i,j,cur_beta,alpha_s[i])
-            # print(test)
-            # print(den,num) 
+        alpha_s = alpha_s[:1]
+    n_beta = len(beta_s)
+
+    # numerators from prefix and suffix products over the beta_s, one column at a time
+    diff = np.mod(alpha_s[:, None] - beta_s[None, :], p)
+    prefix = np.ones((len(alpha_s), n_beta + 1), dtype='int64')
+    suffix = np.ones((len(alpha_s), n_beta + 1), dtype='int64')
+    for k in range(n_beta):
+        prefix[:, k + 1] = np.mod(prefix[:, k] * diff[:, k], p)
+        suffix[:, n_beta - k - 1] = np.mod(suffix[:, n_beta - k] * diff[:, n_beta - k - 1], p)
+    num = np.mod(prefix[:, :n_beta] * suffix[:, 1:], p)
+
+    beta_diff = np.mod(beta_s[:, None] - beta_s[None, :], p)
+    np.fill_diagonal(beta_diff, 1)
+    den = np.ones(n_beta, dtype='int64')
+    for k in range(n_beta):
+        den = np.mod(den * beta_diff[:, k], p)
+
+    U = np.mod(num * modular_inv_batch(den, p)[None, :], p)
     return U.astype('int64')
 
 
@@ -65,25 +109,20 @@ def BGW_encoding(X, N, T, p):
 
     alpha_s = range(1, N + 1)
     alpha_s = np.int64(np.mod(alpha_s, p))
-    X_BGW = np.zeros((N, m, d), dtype='int64')
     R = np.random.randint(p, size=(T + 1, m, d))
     R[0, :, :] = np.mod(X, p)
 
-    for i in range(N):
-        for t in range(T + 1):
-            X_BGW[i, :, :] = np.mod(X_BGW[i, :, :] + R[t, :, :] * (alpha_s[i] ** t), p)
+    # Vandermonde matrix alpha_i^t mod p
+    V = np.ones((N, T + 1), dtype='int64')
+    for t in range(1, T + 1):
+        V[:, t] = np.mod(V[:, t - 1] * alpha_s, p)
+    X_BGW = mod_matmul(V, R.reshape(T + 1, m * d), p).reshape(N, m, d)
     return X_BGW
 
 
 def gen_BGW_lambda_s(alpha_s, p):
-    lambda_s = np.zeros((1, len(alpha_s)), dtype='int64')
-
-    for i in range(len(alpha_s)):
-        cur_alpha = alpha_s[i]
-
-        den = PI([cur_alpha - o for o in alpha_s if cur_alpha != o], p)
-        num = PI([0 - o for o in alpha_s if cur_alpha != o], p)
-        lambda_s[0][i] = divmod(num, den, p)
+    # Lagrange coefficients of the evaluation points at 0
+    lambda_s = gen_Lagrange_coeffs([0], alpha_s, p)
     return lambda_s.astype('int64')
 
 
@@ -102,7 +141,7 @@ def BGW_decoding(f_eval, worker_idx, p):  # decode the output from T+1 evaluatio
     lambda_s = gen_BGW_lambda_s(alpha_s_eval, p).astype('int64')
     # t2 = time.time()
     # print(lambda_s.shape)
-    f_recon = np.mod(np.dot(lambda_s, f_eval), p)
+    f_recon = mod_matmul(lambda_s, f_eval, p)
     # t3 = time.time()
     # print 'time info for BGW_dec', t1-t0, t2-t1, t3-t2
     return f_recon
@@ -127,10 +166,7 @@ def LCC_encoding(X, N, K, T, p):
     U = gen_Lagrange_coeffs(alpha_s, beta_s, p)
     # print U
 
-    X_LCC = np.zeros((N, m // K, d), dtype='int64')
-    for i in range(N):
-        for j in range(K + T):
-            X_LCC[i, :, :] = np.mod(X_LCC[i, :, :] + np.mod(U[i][j] * X_sub[j, :, :], p), p)
+    X_LCC = mod_matmul(U, X_sub.reshape(K + T, -1), p).reshape(N, m // K, d)
     return X_LCC
 
 
@@ -157,10 +193,7 @@ def LCC_encoding_w_Random(X, R_, N, K, T, p):
     U = gen_Lagrange_coeffs(alpha_s, beta_s, p)
     # print U
 
-    X_LCC = np.zeros((N, m // K, d), dtype='int64')
-    for i in range(N):
-        for j in range(K + T):
-            X_LCC[i, :, :] = np.mod(X_LCC[i, :, :] + np.mod(U[i][j] * X_sub[j, :, :], p), p)
+    X_LCC = mod_matmul(U, X_sub.reshape(K + T, -1), p).reshape(N, m // K, d)
     return X_LCC
 
 
@@ -185,10 +218,7 @@ def LCC_encoding_w_Random_partial(X, R_, N, K, T, p, worker_idx):
     # print U
 
     N_out = U.shape[0]
-    X_LCC = np.zeros((N_out, m // K, d), dtype='int64')
-    for i in range(N_out):
-        for j in range(K + T):
-            X_LCC[i, :, :] = np.mod(X_LCC[i, :, :] + np.mod(U[i][j] * X_sub[j, :, :], p), p)
+    X_LCC = mod_matmul(U, X_sub.reshape(K + T, -1), p).reshape(N_out, m // K, d)
     return X_LCC
 
 
@@ -206,7 +236,7 @@ def LCC_decoding(f_eval, f_deg, N, K, T, worker_idx, p):
 
     # print U_dec 
 
-    f_recon = np.mod((U_dec).dot(f_eval), p)
+    f_recon = mod_matmul(U_dec, f_eval, p)
 
     return f_recon.astype('int64')
 
@@ -237,13 +267,11 @@ def LCC_encoding_with_points(X, alpha_s, beta_s, p):
     U = gen_Lagrange_coeffs(beta_s, alpha_s, p).astype('int')
     # print U
 
-    X_LCC = np.zeros((len(beta_s), d), dtype='int')
-    for i in range(len(beta_s)):
-        X_LCC[i, :] = np.dot(np.reshape(U[i, :], (1, len(alpha_s))), X)
+    X_LCC = mod_matmul(U, X, p)
     # print X
     # print np.mod(X_LCC, p)
 
-    return np.mod(X_LCC, p)
+    return X_LCC
 
 
 def LCC_decoding_with_points(f_eval, eval_points, target_points, p):
@@ -254,7 +282,7 @@ def LCC_decoding_with_points(f_eval, eval_points, target_points, p):
 
     # print U_dec 
 
-    f_recon = np.mod((U_dec).dot(f_eval), p)
+    f_recon = mod_matmul(U_dec, f_eval, p)
     # print f_recon
 
     return f_recon
@@ -0,0 +1,151 @@
+import logging
+from collections import OrderedDict
+
+import torch
+
+
+class ParamLayout(object):
+    """Maps a state_dict onto a single contiguous 1-D buffer.
+
+    The layout is fixed by the first state_dict it sees; every tensor is packed
+    at a precomputed offset so that flattening is a sequence of slice copies and
+    unflattening returns reshaped views of the buffer.
+    """
+
+    def __init__(self, state_dict):
+        self.keys = list(state_dict.keys())
+        self.shapes = []
+        self.dtypes = []
+        self.offsets = []
+        offset = 0
+        buffer_dtype = torch.float32
+        for k in self.keys:
+            v = torch.as_tensor(state_dict[k])
+            self.shapes.append(v.shape)
+            self.dtypes.append(v.dtype)
+            self.offsets.append(offset)
+            offset += v.numel()
+            if v.dtype == torch.float64:
+                buffer_dtype = torch.float64
+        self.numel = offset
+        self.dtype = buffer_dtype
+
+    def flatten(self, state_dict, out=None):
+        if out is None:
+            out = torch.empty(self.numel, dtype=self.dtype)
+        for k, shape, offset in zip(self.keys, self.shapes, self.offsets):
+            size = shape.numel()
+            out[offset:offset + size].copy_(torch.as_tensor(state_dict[k]).reshape(-1))
+        return out
+
+    def accumulate(self, out, state_dict, alpha=1):
+        """out += alpha * flatten(state_dict), one fused add per tensor and no flattened copy."""
+        for k, shape, offset in zip(self.keys, self.shapes, self.offsets):
+            size = shape.numel()
+            out[offset:offset + size].add_(torch.as_tensor(state_dict[k]).reshape(-1).to(self.dtype), alpha=alpha)
+        return out
+
+    def unflatten(self, flat):
+        state_dict = OrderedDict()
+        for k, shape, dtype, offset in zip(self.keys, self.shapes, self.dtypes, self.offsets):
+            size = shape.numel()
+            state_dict[k] = flat[offset:offset + size].view(shape).to(dtype)
+        return state_dict
+
+
+class FlatWeightedAggregator(object):
+    """Sample-weighted model averaging over flattened client updates.
+
+    Each update is packed into a row of a preallocated [capacity, numel] matrix
+    as soon as it is added, and aggregate() reduces all rows with a single
+    matrix-vector product instead of a per-key, per-client Python loop.
+    """
+
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.layout = None
+        self.rows = None
+        self.sample_num_dict = dict()
+
+    def add(self, index, model_params, sample_num):
+        if self.layout is None:
+            self.layout = ParamLayout(model_params)
+        if self.rows is None or index >= self.rows.shape[0]:
+            self._grow(max(index + 1, self.capacity))
+        self.layout.flatten(model_params, out=self.rows[index])
+        self.sample_num_dict[index] = sample_num
+
+    def aggregate(self):
+        indexes = sorted(self.sample_num_dict.keys())
+        training_num = sum(self.sample_num_dict[idx] for idx in indexes)
+        weights = torch.tensor([self.sample_num_dict[idx] / training_num for idx in indexes],
+                               dtype=self.layout.dtype)
+        if indexes == list(range(len(indexes))):
+            rows = self.rows[:len(indexes)]
+        else:
+            rows = self.rows.index_select(0, torch.tensor(indexes))
+        averaged = torch.mv(rows.t(), weights)
+        self.reset()
+        return self.layout.unflatten(averaged)
+
+    def reset(self):
+        self.sample_num_dict = dict()
+
+    def _grow(self, capacity):
+        rows = torch.empty((capacity, self.layout.numel), dtype=self.layout.dtype)
+        if self.rows is not None:
+            rows[:self.rows.shape[0]].copy_(self.rows)
+        self.rows = rows
+        self.capacity = capacity
+
+
+class IncrementalWeightedAggregator(object):
+    """Streaming variant of FlatWeightedAggregator.
+
+    Each update is folded into a running sample-weighted sum as soon as it is
+    added and then dropped, so peak memory is the running sum plus the update in
+    flight, and aggregate() only has to divide by the total sample count. An
+    update cannot be taken back out of the sum, so a second update of the same
+    index in a round is ignored with a warning.
+    """
+
+    def __init__(self):
+        self.layout = None
+        self.running_sum = None
+        self.sample_num_dict = dict()
+
+    def add(self, index, model_params, sample_num):
+        if index in self.sample_num_dict:
+            logging.warning("ignoring a second update of worker %d in this round" % index)
+            return
+        if self.layout is None:
+            self.layout = ParamLayout(model_params)
+        if self.running_sum is None:
+            self.running_sum = self.layout.flatten(model_params).mul_(sample_num)
+        else:
+            self.layout.accumulate(self.running_sum, model_params, alpha=sample_num)
+        self.sample_num_dict[index] = sample_num
+
+    def aggregate(self):
+        training_num = sum(self.sample_num_dict.values())
+        averaged = self.running_sum.div_(training_num)
+        self.reset()
+        return self.layout.unflatten(averaged)
+
+    def reset(self):
+        self.running_sum = None
+        self.sample_num_dict = dict()
+
+
+def weighted_average(w_locals):
+    """w_locals: list of (sample_num, state_dict) tuples.
+
+    The state_dicts are already in memory, so they are added into a single flat buffer with their sample
+    weights instead of being copied into the [N, numel] matrix of FlatWeightedAggregator first.
+    """
+    training_num = sum(sample_num for sample_num, _ in w_locals)
+    layout = ParamLayout(w_locals[0][1])
+    averaged = torch.zeros(layout.numel, dtype=layout.dtype)
+    for sample_num, model_params in w_locals:
+        layout.accumulate(averaged, model_params, alpha=sample_num / training_num)
+    return layout.unflatten(averaged)
@@ -4,6 +4,7 @@ import sys
 from abc import ABC
 from enum import Enum
 
+from fedml_core.aggregation.weighted_aggregation import FlatWeightedAggregator, IncrementalWeightedAggregator
 from fedml_core.availability.base_selector import BaseSelector
 
 
@@ -15,7 +16,10 @@ class BaseAggregator(ABC):
         self.client_selector = client_selector
         self.worker_num = worker_num
 
-        self.model_dict = dict()
+        if getattr(self.args, 'aggregation_mode', 'buffered') == 'incremental':
+            self.flat_aggregator = IncrementalWeightedAggregator()
+        else:
+            self.flat_aggregator = FlatWeightedAggregator(self.worker_num)
         self.sample_num_dict = dict()
         self.flag_client_model_uploaded_dict = dict()
         for idx in range(self.worker_num):
@@ -29,7 +33,7 @@ class BaseAggregator(ABC):
 
     def add_local_trained_result(self, worker_index, model_params, sample_num):
         logging.info('add_model. index = %d' % worker_index)
-        self.model_dict[worker_index] = model_params
+        self.flat_aggregator.add(worker_index, model_params, sample_num)
         self.sample_num_dict[worker_index] = sample_num
         self.flag_client_model_uploaded_dict[worker_index] = True
 
@@ -46,5 +50,11 @@ class BaseAggregator(ABC):
             self.flag_client_model_uploaded_dict[idx] = False
         return True
 
+    def get_state(self):
+        return {'selector': self.client_selector.get_state()}
+
+    def set_state(self, state):
+        self.client_selector.set_state(state['selector'])
+
     def finish(self):
         pass
@@ -2,11 +2,10 @@ import ast
 import os
 import re
 from enum import Enum
-from typing import List
 
 import numpy as np
 import logging
-from fedml_core.availability.simulation import BaseSim, load_sim_data
+from fedml_core.availability.simulation import load_trace_store
 
 
 class TimeMode(Enum):
@@ -24,7 +23,7 @@ class BaseSelector:
         self.time_mode = TimeMode.NONE
         if self.args.time_mode != 'none':
             self.time_mode = TimeMode.SIMULATED
-        self.client_sim_data: List[BaseSim] = []
+        self.client_sim_data = None
         self.selected_clients = []
         self.failed_clients = []
         self.clients_training_metrics = {}
@@ -35,23 +34,35 @@ class BaseSelector:
         self.times = []
 
         if self.time_mode == TimeMode.SIMULATED:
-            self.client_sim_data = load_sim_data(self.args)
+            self.client_sim_data = load_trace_store(self.args)
 
     def is_client_active(self, client_id, time):
         if self.time_mode != TimeMode.SIMULATED:
             return True
-        return self.client_sim_data[client_id].is_active(time)
+        return bool(self.client_sim_data.is_active(time, [client_id])[0])
 
     def is_client_active_till_the_end(self, client_id, time):
         if self.time_mode != TimeMode.SIMULATED:
             return True
-        return self.client_sim_data[client_id].active_till_the_end(time, self.model_size)
+        return bool(self.client_sim_data.active_till_the_end(time, self.model_size, [client_id])[0])
 
     def get_client_completion_time(self, client_id):
         if self.time_mode == TimeMode.NONE:
             return 0
 
-        return self.client_sim_data[client_id].get_completion_time(self.model_size)
+        return float(self.client_sim_data.get_completion_time(self.model_size, [client_id])[0])
+
+    def get_active_clients(self, time, client_num_in_total):
+        if self.time_mode != TimeMode.SIMULATED:
+            return list(range(client_num_in_total))
+        return np.nonzero(self.client_sim_data.is_active(time)[:client_num_in_total])[0].tolist()
+
+    def get_finishing_clients(self, client_ids, time):
+        """Mask of the clients that stay active and finish within the round timeout."""
+        if self.time_mode != TimeMode.SIMULATED or len(client_ids) == 0:
+            return np.ones(len(client_ids), dtype=bool)
+        return self.client_sim_data.active_till_the_end(time, self.model_size, client_ids) & \
+            (self.client_sim_data.get_completion_time(self.model_size, client_ids) <= self.round_timeout)
 
     def client_sampling(self, round_idx, client_num_in_total, client_num_per_round):
         if self.cur_time == -1:
@@ -64,13 +75,12 @@ class BaseSelector:
             else:
                 self.cur_time += np.max(self.client_times[self.selected_clients])
             self.times.append(self.cur_time)
-        candidates = [i for i in range(client_num_in_total) if self.is_client_active(i, self.cur_time)]
+        candidates = self.get_active_clients(self.cur_time, client_num_in_total)
         self.selected_clients = self.sample(round_idx, candidates, client_num_per_round)
 
         if self.args.allow_failed_clients == 'no':
-            new_clients = list(filter(lambda client: self.is_client_active_till_the_end(client, self.cur_time) and
-                                                     self.get_client_completion_time(client) <= self.round_timeout,
-                                      self.selected_clients))
+            finishing = self.get_finishing_clients(self.selected_clients, self.cur_time)
+            new_clients = [client for client, keep in zip(self.selected_clients, finishing) if keep]
             self.failed_clients = list(set(self.selected_clients).difference(new_clients))
             self.selected_clients = new_clients
 
@@ -112,6 +122,29 @@ class BaseSelector:
         logging.error('failed rounds: {}'.format(failed))
         logging.error('{}: {}'.format(self.args.comm_round, self.cur_time))
 
+    def get_state(self):
+        state = {
+            'cur_time': self.cur_time,
+            'client_times': self.client_times.copy(),
+            'selected_clients': list(self.selected_clients),
+            'failed_clients': list(self.failed_clients),
+            'clients_training_metrics': self.clients_training_metrics,
+            'times': list(self.times),
+        }
+        if self.client_sim_data is not None:
+            state['behavior_index'] = self.client_sim_data.behavior_index.copy()
+        return state
+
+    def set_state(self, state):
+        self.cur_time = state['cur_time']
+        self.client_times = state['client_times']
+        self.selected_clients = state['selected_clients']
+        self.failed_clients = state['failed_clients']
+        self.clients_training_metrics = state['clients_training_metrics']
+        self.times = state['times']
+        if self.client_sim_data is not None:
+            self.client_sim_data.behavior_index = state['behavior_index']
+
     def handle_resume(self, round_index):
         for i in range(round_index):
             self.client_sampling(i, self.args.client_num_in_total, self.args.client_num_per_round)
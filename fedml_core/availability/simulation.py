@@ -57,7 +57,75 @@ class ClientSim(BaseSim):
                + 2 * model_size / float(self.bandwidth)
 
 
-def load_sim_data(aggregator_args):
+class TraceStore(object):
+    """Availability traces and device speeds of all clients in padded numpy arrays.
+
+    Answers the ClientSim queries for every client (or a subset of client ids)
+    in one vectorized call. behavior_index advances exactly like
+    ClientSim.is_active, so the selections match the per-client simulator.
+    """
+
+    def __init__(self, traces, speeds, args):
+        client_num = len(traces)
+        self.lengths = np.array([len(trace['active']) for trace in traces], dtype=np.int64)
+        self.width = int(self.lengths.max())
+        self.finish_time = np.array([trace['finish_time'] for trace in traces], dtype=np.float64)
+
+        # padding sorts after every boundary and normalized time of its row
+        pad = max(self.finish_time.max(), max(max(trace['inactive']) for trace in traces)) + 1
+        self.active = np.full((client_num, self.width), pad, dtype=np.float64)
+        self.inactive = np.full((client_num, self.width), pad, dtype=np.float64)
+        for i, trace in enumerate(traces):
+            self.active[i, :self.lengths[i]] = trace['active']
+            self.inactive[i, :self.lengths[i]] = trace['inactive']
+
+        # rows shifted by row * stride are globally sorted, so a single searchsorted searches every row
+        self.stride = pad + 1
+        self.row_keys = (self.inactive + np.arange(client_num)[:, None] * self.stride).ravel()
+
+        compute_speed = np.array([float(speed['computation']) for speed in speeds])
+        self.bandwidth = np.array([float(speed['communication']) for speed in speeds])
+        self.compute_time = 3 * args.batch_size * args.epochs * compute_speed / 1000
+        self.behavior_index = np.zeros(client_num, dtype=np.int64)
+        self.client_ids = np.arange(client_num)
+
+    def __len__(self):
+        return len(self.client_ids)
+
+    def is_active(self, cur_time, client_ids=None):
+        ids = self.client_ids if client_ids is None else np.asarray(client_ids, dtype=np.int64)
+        norm_time = cur_time % self.finish_time[ids]
+        index = self.behavior_index[ids]
+
+        advance = norm_time > self.inactive[ids, index]
+        if advance.any():
+            rows = ids[advance]
+            found = np.searchsorted(self.row_keys, rows * self.stride + norm_time[advance], side='left')
+            found -= rows * self.width
+            # the row shift can round a boundary just below norm_time onto it, step past such ties
+            found += self.inactive[rows, np.minimum(found, self.width - 1)] < norm_time[advance]
+            # past the last inactive boundary: wrap around to the first behavior
+            found[found >= self.lengths[rows]] = 0
+            index[advance] = found
+            self.behavior_index[rows] = found
+
+        return (self.active[ids, index] <= norm_time) & (norm_time <= self.inactive[ids, index])
+
+    def active_till_the_end(self, cur_time, model_size, client_ids=None):
+        ids = self.client_ids if client_ids is None else np.asarray(client_ids, dtype=np.int64)
+        active = self.is_active(cur_time, ids)
+        finish_time = self.finish_time[ids]
+        norm_time = cur_time % finish_time
+        end_norm = (cur_time + self.get_completion_time(model_size, ids)) % finish_time
+        end_norm = np.where(end_norm < norm_time, end_norm + finish_time, end_norm)
+        return active & (end_norm <= self.inactive[ids, self.behavior_index[ids]])
+
+    def get_completion_time(self, model_size, client_ids=None):
+        ids = self.client_ids if client_ids is None else np.asarray(client_ids, dtype=np.int64)
+        return self.compute_time[ids] + 2 * model_size / self.bandwidth[ids]
+
+
+def load_client_traces(aggregator_args):
     script_dir = os.path.dirname(__file__)
     with open(os.path.join(script_dir, 'client_behave_trace'), 'rb') as tr:
         trace_data = list(pickle.load(tr).values())
@@ -66,7 +134,6 @@ def load_sim_data(aggregator_args):
         capacity_data = list(pickle.load(cp).values())
 
     worst_to_best = list(np.load(os.path.join(script_dir, 'avail_worst_to_best.npy')))
-    client_sim_data = []
 
     if aggregator_args.trace_distro == 'random':
         indices = range(aggregator_args.client_num_in_total)
@@ -80,14 +147,19 @@ def load_sim_data(aggregator_args):
         raise AttributeError(
             'Invalid trace_distro. Possible options: {}'.format('"random" or "high_avail" or "low_avail" or "average"'))
 
-    for client_id in indices:
-        client_sim = ClientSim(
-            trace_data[client_id % len(trace_data)],
-            capacity_data[client_id % len(capacity_data)],
-            aggregator_args
-        )
-        client_sim_data.append(client_sim)
-    return client_sim_data
+    traces = [trace_data[client_id % len(trace_data)] for client_id in indices]
+    speeds = [capacity_data[client_id % len(capacity_data)] for client_id in indices]
+    return traces, speeds
+
+
+def load_sim_data(aggregator_args):
+    traces, speeds = load_client_traces(aggregator_args)
+    return [ClientSim(trace, speed, aggregator_args) for trace, speed in zip(traces, speeds)]
+
+
+def load_trace_store(aggregator_args):
+    traces, speeds = load_client_traces(aggregator_args)
+    return TraceStore(traces, speeds, aggregator_args)
 
 
 def distribute(high, low, args, worst_to_best):
@@ -23,7 +23,8 @@ class ClientManager(Observer):
             HOST = "0.0.0.0"
             # HOST = "broker.emqx.io"
             PORT = 1883
-            self.com_manager = MqttCommManager(HOST, PORT, client_id=rank, client_num=size - 1)
+            self.com_manager = MqttCommManager(HOST, PORT, client_id=rank, client_num=size - 1,
+                                               is_mobile=getattr(args, "is_mobile", 0) == 1)
         elif backend == "GRPC":
             HOST = "0.0.0.0"
             PORT = 50000 + rank
@@ -18,6 +18,10 @@ class BaseCommunicationManager(object):
     def remove_observer(self, observer: Observer):
         pass
 
+    def flush(self):
+        """Blocks until every message passed to send_message has been sent; a no-op for synchronous backends."""
+        pass
+
     @abstractmethod
     def handle_receive_message(self):
         pass
@@ -1,6 +1,8 @@
 import logging
 import os
+import queue
 import threading
+from collections import deque
 from concurrent import futures
 from typing import List
 
@@ -20,6 +22,13 @@ import csv
 
 
 class GRPCCommManager(BaseCommunicationManager):
+    MAX_SEND_WORKERS = 32
+    # upper bound on how long the receive loop takes to notice is_running was cleared
+    POLL_TIMEOUT = 1.0
+    # payloads larger than this are sent over the client-streaming RPC in chunks of this size
+    CHUNK_SIZE = 4 * 1024 * 1024
+    MAX_MESSAGE_LENGTH = 1000 * 1024 * 1024
+
     def __init__(self, host, port, ip_config_path, topic="fedml", client_id=0, client_num=0):
         # host is the ip address of server
         self.host = host
@@ -34,12 +43,22 @@ class GRPCCommManager(BaseCommunicationManager):
         else:
             self.node_type = "client"
         self.opts = [
-            ("grpc.max_send_message_length", 1000 * 1024 * 1024),
-            ("grpc.max_receive_message_length", 1000 * 1024 * 1024),
+            ("grpc.max_send_message_length", self.MAX_MESSAGE_LENGTH),
+            ("grpc.max_receive_message_length", self.MAX_MESSAGE_LENGTH),
             ("grpc.enable_http_proxy", 0),
+            # channels are pooled for the whole run, so keep idle connections alive
+            ("grpc.keepalive_time_ms", 10000),
+            ("grpc.keepalive_timeout_ms", 5000),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0),
+            ("grpc.http2.min_ping_interval_without_data_ms", 5000),
+            # server side: accept the peers' idle pings every keepalive_time_ms, the default minimum of 300s
+            # would answer them with GOAWAY too_many_pings
+            ("grpc.http2.min_recv_ping_interval_without_data_ms", 5000),
+            ("grpc.http2.max_ping_strikes", 0),
         ]
         self.grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=client_num), options=self.opts)
-        self.grpc_servicer = GRPCCOMMServicer(host, port, client_num, client_id)
+        self.grpc_servicer = GRPCCOMMServicer(host, port, client_num, client_id, self.MAX_MESSAGE_LENGTH)
         grpc_comm_manager_pb2_grpc.add_gRPCCommManagerServicer_to_server(self.grpc_servicer, self.grpc_server)
         logging.info(os.getcwd())
         self.ip_config = self._build_ip_table(ip_config_path)
@@ -51,28 +70,94 @@ class GRPCCommManager(BaseCommunicationManager):
         self.is_running = True
         print("server started. Listening on port " + str(port))
 
-    def send_message(self, msg: Message):
-        payload = msg.to_json()
+        # receiver_id -> (channel, stub), created on first send
+        self._stubs = dict()
+        self._stubs_lock = threading.Lock()
+        # sends to different receivers overlap; sends to the same receiver keep their order
+        self._send_executor = futures.ThreadPoolExecutor(max_workers=max(1, min(client_num, self.MAX_SEND_WORKERS)))
+        self._send_queues = dict()
+        self._send_queues_lock = threading.Lock()
+        self._send_queues_empty = threading.Condition(self._send_queues_lock)
+        # receiver_id -> the error of a failed background send, raised by flush()
+        self._send_errors = dict()
 
+    def send_message(self, msg: Message):
+        # encoded here, so later changes to the message's tensors are not sent
+        payload = msg.to_chunks(self.CHUNK_SIZE)
         receiver_id = msg.get_receiver_id()
-        PORT_BASE = 8888
-        # lookup ip of receiver from self.ip_config table
-        receiver_ip = self.ip_config[str(receiver_id)]
-        channel_url = "{}:{}".format(receiver_ip, str(PORT_BASE + receiver_id))
-
-        channel = grpc.insecure_channel(channel_url, options=self.opts)
-        stub = grpc_comm_manager_pb2_grpc.gRPCCommManagerStub(channel)
-
-        request = grpc_comm_manager_pb2.CommRequest()
-        logging.info("sending message to {}".format(channel_url))
 
-        request.client_id = self.client_id
-
-        request.message = payload
-
-        stub.sendMessage(request)
+        with self._send_queues_lock:
+            if receiver_id in self._send_queues:
+                # a drain task for this receiver is already running and will pick it up
+                self._send_queues[receiver_id].append(payload)
+                return
+            self._send_queues[receiver_id] = deque([payload])
+        self._send_executor.submit(self._drain_send_queue, receiver_id)
+
+    def _drain_send_queue(self, receiver_id):
+        while True:
+            with self._send_queues_lock:
+                pending = self._send_queues[receiver_id]
+                if len(pending) == 0:
+                    del self._send_queues[receiver_id]
+                    if len(self._send_queues) == 0:
+                        self._send_queues_empty.notify_all()
+                    return
+                payload = pending.popleft()
+            try:
+                self._send_payload(receiver_id, payload)
+            except Exception as e:
+                logging.exception("failed to send message to {}".format(receiver_id))
+                with self._send_queues_lock:
+                    self._send_errors.setdefault(receiver_id, e)
+
+    def _send_payload(self, receiver_id, payload):
+        # payload: the message's chunks of at most CHUNK_SIZE bytes
+        stub = self._get_stub(receiver_id)
+        logging.info("sending message to {}".format(receiver_id))
+
+        if len(payload) > 1:
+            stub.sendMessageStream(self._iter_chunks(payload))
+        else:
+            request = grpc_comm_manager_pb2.CommRequest()
+            request.client_id = self.client_id
+            request.message = payload[0]
+            stub.sendMessage(request)
         logging.debug("sent successfully")
-        channel.close()
+
+    def _iter_chunks(self, payload):
+        total_size = sum(len(data) for data in payload)
+        offset = 0
+        for data in payload:
+            chunk = grpc_comm_manager_pb2.CommChunk()
+            chunk.client_id = self.client_id
+            chunk.total_size = total_size
+            chunk.offset = offset
+            chunk.data = data
+            offset += len(data)
+            yield chunk
+
+    def _get_stub(self, receiver_id):
+        with self._stubs_lock:
+            if receiver_id not in self._stubs:
+                PORT_BASE = 8888
+                # lookup ip of receiver from self.ip_config table
+                receiver_ip = self.ip_config[str(receiver_id)]
+                channel_url = "{}:{}".format(receiver_ip, str(PORT_BASE + receiver_id))
+
+                channel = grpc.insecure_channel(channel_url, options=self.opts)
+                stub = grpc_comm_manager_pb2_grpc.gRPCCommManagerStub(channel)
+                self._stubs[receiver_id] = (channel, stub)
+            return self._stubs[receiver_id][1]
+
+    def flush(self):
+        """Blocks until every queued message has been sent, raises the error of a send that failed."""
+        with self._send_queues_lock:
+            while len(self._send_queues) > 0:
+                self._send_queues_empty.wait()
+            if len(self._send_errors) > 0:
+                receiver_id = next(iter(self._send_errors))
+                raise self._send_errors.pop(receiver_id)
 
     def add_observer(self, observer: Observer):
         self._observers.append(observer)
@@ -86,20 +171,41 @@ class GRPCCommManager(BaseCommunicationManager):
 
     def message_handling_subroutine(self):
         while self.is_running:
-            if self.grpc_servicer.message_q.qsize() > 0:
-                lock.acquire()
-                msg_params_string = self.grpc_servicer.message_q.get()
+            try:
+                msg_params_bytes = self.grpc_servicer.message_q.get(timeout=self.POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            if msg_params_bytes is None:
+                # sentinel put by stop_receive_message()
+                break
+            lock.acquire()
+            try:
                 msg_params = Message()
-                msg_params.init_from_json_string(msg_params_string)
+                if isinstance(msg_params_bytes, dict):
+                    # streamed messages are decoded by the servicer while they arrive
+                    msg_params.init_from_params(msg_params_bytes)
+                else:
+                    msg_params.init_from_bytes(msg_params_bytes)
                 msg_type = msg_params.get_type()
                 for observer in self._observers:
                     observer.receive_message(msg_type, msg_params)
+            finally:
                 lock.release()
         return
 
     def stop_receive_message(self):
-        self.grpc_server.stop(None)
-        self.is_running = False
+        try:
+            # the last messages are sent before shutting down, and a failed one is reported
+            self.flush()
+        finally:
+            self._send_executor.shutdown(wait=True)
+            with self._stubs_lock:
+                for channel, _ in self._stubs.values():
+                    channel.close()
+                self._stubs.clear()
+            self.grpc_server.stop(None)
+            self.is_running = False
+            self.grpc_servicer.message_q.put(None)
 
     def notify(self, message: Message):
         msg_type = message.get_type()
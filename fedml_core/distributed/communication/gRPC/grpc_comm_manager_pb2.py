@@ -19,7 +19,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   syntax='proto3',
   serialized_options=None,
   create_key=_descriptor._internal_create_key,
-  serialized_pb=b'\n\x17grpc_comm_manager.proto\"1\n\x0b\x43ommRequest\x12\x11\n\tclient_id\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\"2\n\x0c\x43ommResponse\x12\x11\n\tclient_id\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t2r\n\x0fgRPCCommManager\x12*\n\x0bsendMessage\x12\x0c.CommRequest\x1a\r.CommResponse\x12\x33\n\x14handleReceiveMessage\x12\x0c.CommRequest\x1a\r.CommResponseb\x06proto3'
+  serialized_pb=b'\n\x17grpc_comm_manager.proto\"1\n\x0b\x43ommRequest\x12\x11\n\tclient_id\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\x0c\"2\n\x0c\x43ommResponse\x12\x11\n\tclient_id\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\"P\n\tCommChunk\x12\x11\n\tclient_id\x18\x01 \x01(\x05\x12\x12\n\ntotal_size\x18\x02 \x01(\x03\x12\x0e\n\x06offset\x18\x03 \x01(\x03\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\x32\xa4\x01\n\x0fgRPCCommManager\x12*\n\x0bsendMessage\x12\x0c.CommRequest\x1a\r.CommResponse\x12\x33\n\x14handleReceiveMessage\x12\x0c.CommRequest\x1a\r.CommResponse\x12\x30\n\x11sendMessageStream\x12\n.CommChunk\x1a\r.CommResponse(\x01\x62\x06proto3'
 )
 
 
@@ -42,8 +42,8 @@ _COMMREQUEST = _descriptor.Descriptor(
       serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
     _descriptor.FieldDescriptor(
       name='message', full_name='CommRequest.message', index=1,
-      number=2, type=9, cpp_type=9, label=1,
-      has_default_value=False, default_value=b"".decode('utf-8'),
+      number=2, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
@@ -102,8 +102,62 @@ _COMMRESPONSE = _descriptor.Descriptor(
   serialized_end=128,
 )
 
+
+_COMMCHUNK = _descriptor.Descriptor(
+  name='CommChunk',
+  full_name='CommChunk',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='client_id', full_name='CommChunk.client_id', index=0,
+      number=1, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='total_size', full_name='CommChunk.total_size', index=1,
+      number=2, type=3, cpp_type=2, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='offset', full_name='CommChunk.offset', index=2,
+      number=3, type=3, cpp_type=2, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='data', full_name='CommChunk.data', index=3,
+      number=4, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=130,
+  serialized_end=210,
+)
+
 DESCRIPTOR.message_types_by_name['CommRequest'] = _COMMREQUEST
 DESCRIPTOR.message_types_by_name['CommResponse'] = _COMMRESPONSE
+DESCRIPTOR.message_types_by_name['CommChunk'] = _COMMCHUNK
 _sym_db.RegisterFileDescriptor(DESCRIPTOR)
 
 CommRequest = _reflection.GeneratedProtocolMessageType('CommRequest', (_message.Message,), {
@@ -120,6 +174,13 @@ CommResponse = _reflection.GeneratedProtocolMessageType('CommResponse', (_messag
   })
 _sym_db.RegisterMessage(CommResponse)
 
+CommChunk = _reflection.GeneratedProtocolMessageType('CommChunk', (_message.Message,), {
+  'DESCRIPTOR' : _COMMCHUNK,
+  '__module__' : 'grpc_comm_manager_pb2'
+  # @@protoc_insertion_point(class_scope:CommChunk)
+  })
+_sym_db.RegisterMessage(CommChunk)
+
 
 
 _GRPCCOMMMANAGER = _descriptor.ServiceDescriptor(
@@ -129,8 +190,8 @@ _GRPCCOMMMANAGER = _descriptor.ServiceDescriptor(
   index=0,
   serialized_options=None,
   create_key=_descriptor._internal_create_key,
-  serialized_start=130,
-  serialized_end=244,
+  serialized_start=213,
+  serialized_end=377,
   methods=[
   _descriptor.MethodDescriptor(
     name='sendMessage',
@@ -152,6 +213,16 @@ _GRPCCOMMMANAGER = _descriptor.ServiceDescriptor(
     serialized_options=None,
     create_key=_descriptor._internal_create_key,
   ),
+  _descriptor.MethodDescriptor(
+    name='sendMessageStream',
+    full_name='gRPCCommManager.sendMessageStream',
+    index=2,
+    containing_service=None,
+    input_type=_COMMCHUNK,
+    output_type=_COMMRESPONSE,
+    serialized_options=None,
+    create_key=_descriptor._internal_create_key,
+  ),
 ])
 _sym_db.RegisterServiceDescriptor(_GRPCCOMMMANAGER)
 
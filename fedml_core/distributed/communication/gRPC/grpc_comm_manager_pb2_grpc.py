@@ -24,6 +24,11 @@ class gRPCCommManagerStub(object):
                 request_serializer=grpc__comm__manager__pb2.CommRequest.SerializeToString,
                 response_deserializer=grpc__comm__manager__pb2.CommResponse.FromString,
                 )
+        self.sendMessageStream = channel.stream_unary(
+                '/gRPCCommManager/sendMessageStream',
+                request_serializer=grpc__comm__manager__pb2.CommChunk.SerializeToString,
+                response_deserializer=grpc__comm__manager__pb2.CommResponse.FromString,
+                )
 
 
 class gRPCCommManagerServicer(object):
@@ -41,6 +46,12 @@ class gRPCCommManagerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def sendMessageStream(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_gRPCCommManagerServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -54,6 +65,11 @@ def add_gRPCCommManagerServicer_to_server(servicer, server):
                     request_deserializer=grpc__comm__manager__pb2.CommRequest.FromString,
                     response_serializer=grpc__comm__manager__pb2.CommResponse.SerializeToString,
             ),
+            'sendMessageStream': grpc.stream_unary_rpc_method_handler(
+                    servicer.sendMessageStream,
+                    request_deserializer=grpc__comm__manager__pb2.CommChunk.FromString,
+                    response_serializer=grpc__comm__manager__pb2.CommResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'gRPCCommManager', rpc_method_handlers)
@@ -97,3 +113,20 @@ class gRPCCommManager(object):
             grpc__comm__manager__pb2.CommResponse.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def sendMessageStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/gRPCCommManager/sendMessageStream',
+            grpc__comm__manager__pb2.CommChunk.SerializeToString,
+            grpc__comm__manager__pb2.CommResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -1,4 +1,7 @@
+import grpc
+
 from ..gRPC import grpc_comm_manager_pb2, grpc_comm_manager_pb2_grpc
+from ..message_codec import MessageStreamDecoder
 import queue
 import threading
 import logging
@@ -7,12 +10,14 @@ lock = threading.Lock()
 
 
 class GRPCCOMMServicer(grpc_comm_manager_pb2_grpc.gRPCCommManagerServicer):
-    def __init__(self, host, port, client_num, client_id):
+    def __init__(self, host, port, client_num, client_id, max_message_length=1000 * 1024 * 1024):
         # host is the ip address of server
         self.host = host
         self.port = port
         self.client_num = client_num
         self.client_id = client_id
+        # streamed messages are assembled here rather than by grpc, so its receive limit is enforced here too
+        self.max_message_length = max_message_length
 
         if self.client_id == 0:
             self.node_type = "server"
@@ -36,5 +41,37 @@ class GRPCCOMMServicer(grpc_comm_manager_pb2_grpc.gRPCCommManagerServicer):
         lock.release()
         return response
 
+    def sendMessageStream(self, request_iterator, context):
+        # chunks are copied straight into a buffer preallocated from the first chunk's total_size and the
+        # tensors are decoded as their bytes arrive; the decoded params are queued instead of the payload
+        decoder = None
+        client_id = None
+        for chunk in request_iterator:
+            if decoder is None:
+                if not 0 < chunk.total_size <= self.max_message_length:
+                    context.abort(grpc.StatusCode.INVALID_ARGUMENT, "message stream of %d bytes, the limit is %d" % (
+                        chunk.total_size, self.max_message_length))
+                decoder = MessageStreamDecoder(chunk.total_size)
+                client_id = chunk.client_id
+            try:
+                decoder.feed(chunk.offset, chunk.data)
+            except ValueError as e:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        if decoder is None:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "empty message stream")
+        try:
+            msg_params = decoder.result()
+        except ValueError as e:
+            context.abort(grpc.StatusCode.DATA_LOSS, str(e))
+        logging.info("client_{} got {} bytes streamed from client_{}".format(self.client_id, decoder.received,
+                                                                             client_id))
+
+        response = grpc_comm_manager_pb2.CommResponse()
+        response.message = "message received"
+        lock.acquire()
+        self.message_q.put(msg_params)
+        lock.release()
+        return response
+
     def handleReceiveMessage(self, request, context):
         pass
@@ -1,6 +1,8 @@
 import json
 import sys
 
+from .message_codec import BinaryMessageCodec, decode_message_params
+
 
 class Message(object):
 
@@ -16,6 +18,9 @@ class Message(object):
 
     MSG_ARG_KEY_MODEL_PARAMS = "model_params"
 
+    # codec used by to_bytes(); receivers detect the format, so it can be swapped per process
+    codec = BinaryMessageCodec()
+
     def __init__(self, type=0, sender_id=0, receiver_id=0):
         self.type = type
         self.sender_id = sender_id
@@ -35,6 +40,15 @@ class Message(object):
         self.receiver_id = self.msg_params[Message.MSG_ARG_KEY_RECEIVER]
         # print("msg_params = " + str(self.msg_params))
 
+    def init_from_bytes(self, payload, allow_pickle=False):
+        self.init_from_params(decode_message_params(payload, allow_pickle))
+
+    def init_from_params(self, msg_params):
+        self.msg_params = msg_params
+        self.type = self.msg_params[Message.MSG_ARG_KEY_TYPE]
+        self.sender_id = self.msg_params[Message.MSG_ARG_KEY_SENDER]
+        self.receiver_id = self.msg_params[Message.MSG_ARG_KEY_RECEIVER]
+
     def get_sender_id(self):
         return self.sender_id
 
@@ -64,6 +78,13 @@ class Message(object):
         print("json string size = " + str(sys.getsizeof(json_string)))
         return json_string
 
+    def to_bytes(self, codec=None):
+        return (codec or Message.codec).encode(self.msg_params)
+
+    def to_chunks(self, chunk_size):
+        """to_bytes() split into bytes objects of at most chunk_size bytes."""
+        return Message.codec.encode_chunks(self.msg_params, chunk_size)
+
     def get_content(self):
         print_dict = self.msg_params.copy()
         msg_str = str(self.__to_msg_type_string()) + ": " + str(print_dict)
@@ -0,0 +1,245 @@
+import json
+import pickle
+import struct
+
+import numpy as np
+import torch
+
+
+class JsonMessageCodec(object):
+    """The original wire format: the whole params dict dumped as a JSON string."""
+
+    def encode(self, msg_params):
+        return json.dumps(msg_params).encode("utf-8")
+
+    def encode_chunks(self, msg_params, chunk_size):
+        payload = self.encode(msg_params)
+        return [payload[start:start + chunk_size] for start in range(0, len(payload), chunk_size)]
+
+    def decode(self, payload):
+        if not isinstance(payload, str):
+            payload = bytes(payload).decode("utf-8")
+        return json.loads(payload)
+
+
+class BinaryMessageCodec(object):
+    """Small JSON header followed by the raw bytes of every tensor / ndarray.
+
+    Layout: MAGIC | uint32 header length | header | padding | buffer 0 | buffer 1 | ...
+    Buffers are aligned to ALIGNMENT bytes. Dicts are stored as [key, value] pairs
+    so non-string keys survive the round trip, and tensors / arrays are replaced by
+    references into the buffer table. On decode the tensors are views into the
+    payload, so no per-element Python objects are ever created.
+    Lists and tuples are walked like dicts and numpy scalars become Python numbers.
+    Any other value is rejected: a payload may come from the network, so nothing in
+    it is unpickled unless the codec is built with allow_pickle=True, which only
+    backends whose peers are trusted processes of the same job (TRPC) do.
+    """
+
+    MAGIC = b"FMLB"
+    ALIGNMENT = 64
+
+    def __init__(self, allow_pickle=False):
+        self.allow_pickle = allow_pickle
+
+    def encode(self, msg_params):
+        header, descriptors, sources, data_size = self._layout(msg_params)
+        data_start = self._align(len(header))
+        payload = bytearray(data_start + data_size)
+        payload[:len(header)] = header
+        out = np.frombuffer(payload, dtype=np.uint8)
+        for descriptor, source in zip(descriptors, sources):
+            start = data_start + descriptor[3]
+            out[start:start + source.nbytes] = source
+        return payload
+
+    def encode_chunks(self, msg_params, chunk_size):
+        """The payload of encode() as a list of bytes objects of at most chunk_size bytes.
+
+        Every chunk is joined straight from the header and the tensor / array memory, so the message data
+        is copied once, into the chunks, instead of into a full payload that is then sliced again.
+        """
+        header, descriptors, sources, data_size = self._layout(msg_params)
+        zeros = bytes(self.ALIGNMENT)
+        segments = [memoryview(header), zeros[:self._align(len(header)) - len(header)]]
+        for source in sources:
+            segments.append(memoryview(source))
+            segments.append(zeros[:self._align(source.nbytes) - source.nbytes])
+
+        chunks = []
+        pieces, size = [], 0
+        for segment in segments:
+            while len(segment) > 0:
+                piece = segment[:chunk_size - size]
+                segment = segment[len(piece):]
+                pieces.append(piece)
+                size += len(piece)
+                if size == chunk_size:
+                    chunks.append(b"".join(pieces))
+                    pieces, size = [], 0
+        if size > 0:
+            chunks.append(b"".join(pieces))
+        return chunks
+
+    def _layout(self, msg_params):
+        # magic, header length and header, then every buffer as a uint8 array with its offset after the header
+        buffers = []
+        params = self._pack(msg_params, buffers)
+        descriptors = []
+        sources = []
+        offset = 0
+        for value in buffers:
+            if isinstance(value, torch.Tensor):
+                requires_grad = value.requires_grad
+                value = value.detach().cpu().contiguous()
+                source = value.reshape(-1).view(torch.uint8).numpy()
+                descriptors.append(["tensor", str(value.dtype).replace("torch.", ""), list(value.shape), offset,
+                                    requires_grad])
+            else:
+                value = np.ascontiguousarray(value)
+                source = value.reshape(-1).view(np.uint8)
+                descriptors.append(["ndarray", value.dtype.str, list(value.shape), offset])
+            sources.append(source)
+            offset = self._align(offset + source.nbytes)
+
+        header = json.dumps({"params": params, "buffers": descriptors}).encode("utf-8")
+        header = self.MAGIC + struct.pack("<I", len(header)) + header
+        return header, descriptors, sources, offset
+
+    def decode(self, payload):
+        view = memoryview(payload).cast("B")
+        header, data_start = self._read_header(view)
+        if view.readonly and any(d[0] == "tensor" for d in header["buffers"]):
+            # torch tensors must not alias read-only memory: take one bulk copy of the payload
+            view = memoryview(bytearray(view))
+        buffers = [self._buffer(view, data_start, descriptor) for descriptor in header["buffers"]]
+        return self._unpack(header["params"], buffers)
+
+    def _read_header(self, view):
+        header_len = struct.unpack_from("<I", view, len(self.MAGIC))[0]
+        header_start = len(self.MAGIC) + 4
+        header = json.loads(bytes(view[header_start:header_start + header_len]).decode("utf-8"))
+        return header, self._align(header_start + header_len)
+
+    def _buffer(self, view, data_start, descriptor):
+        kind, dtype, shape, offset, *flags = descriptor
+        start = data_start + offset
+        count = int(np.prod(shape, dtype=np.int64))
+        if kind == "tensor":
+            dtype = getattr(torch, dtype)
+            if count == 0:
+                tensor = torch.empty(shape, dtype=dtype)
+            else:
+                tensor = torch.frombuffer(view, dtype=dtype, count=count, offset=start).view(shape)
+            return tensor.requires_grad_() if flags and flags[0] else tensor
+        return np.frombuffer(view, dtype=np.dtype(dtype), count=count, offset=start).reshape(shape)
+
+    def _buffer_end(self, data_start, descriptor):
+        kind, dtype, shape, offset = descriptor[:4]
+        if kind == "tensor":
+            itemsize = torch.empty(0, dtype=getattr(torch, dtype)).element_size()
+        else:
+            itemsize = np.dtype(dtype).itemsize
+        return data_start + offset + int(np.prod(shape, dtype=np.int64)) * itemsize
+
+    def _pack(self, value, buffers):
+        if isinstance(value, torch.Tensor) or (isinstance(value, np.ndarray) and value.dtype != object):
+            buffers.append(value)
+            return {"__buffer__": len(buffers) - 1}
+        if isinstance(value, dict):
+            return {"__dict__": [[self._pack(k, buffers), self._pack(v, buffers)] for k, v in value.items()]}
+        if isinstance(value, list):
+            return [self._pack(v, buffers) for v in value]
+        if isinstance(value, tuple):
+            return {"__tuple__": [self._pack(v, buffers) for v in value]}
+        if isinstance(value, np.generic) and not isinstance(value, (np.void, np.object_)):
+            return value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if not self.allow_pickle:
+            raise TypeError("cannot encode a value of type %s: message params may only hold JSON values, "
+                            "tensors, ndarrays, numpy scalars, lists, tuples and dicts" % type(value).__name__)
+        buffers.append(np.frombuffer(pickle.dumps(value), dtype=np.uint8))
+        return {"__pickle__": len(buffers) - 1}
+
+    def _unpack(self, value, buffers):
+        if isinstance(value, dict):
+            if "__buffer__" in value:
+                return buffers[value["__buffer__"]]
+            if "__dict__" in value:
+                return {self._unpack(k, buffers): self._unpack(v, buffers) for k, v in value["__dict__"]}
+            if "__tuple__" in value:
+                return tuple(self._unpack(v, buffers) for v in value["__tuple__"])
+            if "__pickle__" in value:
+                if not self.allow_pickle:
+                    raise ValueError("refusing to unpickle a value of the message: pickled values are only "
+                                     "accepted by a codec built with allow_pickle=True")
+                return pickle.loads(buffers[value["__pickle__"]].tobytes())
+        if isinstance(value, list):
+            return [self._unpack(v, buffers) for v in value]
+        return value
+
+    def _align(self, n):
+        return (n + self.ALIGNMENT - 1) // self.ALIGNMENT * self.ALIGNMENT
+
+
+def decode_message_params(payload, allow_pickle=False):
+    """Decodes a payload produced by either codec."""
+    if isinstance(payload, str):
+        return JsonMessageCodec().decode(payload)
+    if bytes(memoryview(payload)[:len(BinaryMessageCodec.MAGIC)]) == BinaryMessageCodec.MAGIC:
+        return BinaryMessageCodec(allow_pickle).decode(payload)
+    return JsonMessageCodec().decode(payload)
+
+
+class MessageStreamDecoder(object):
+    """Decodes a payload of either codec that arrives in order, chunk by chunk.
+
+    The chunks are copied into one buffer of the announced total size. For a binary payload the header is
+    parsed as soon as it is complete and every tensor / array becomes a view into the buffer as soon as its
+    byte range has arrived, so when the last chunk comes in only the params dict is left to assemble.
+    """
+
+    def __init__(self, total_size):
+        self.buffer = bytearray(total_size)
+        self.view = memoryview(self.buffer)
+        self.received = 0
+        self._codec = BinaryMessageCodec()
+        self._binary = None
+        self._header = None
+        self._data_start = None
+        self._buffers = []
+
+    def feed(self, offset, data):
+        if offset != self.received:
+            raise ValueError("chunk at offset %d, expected offset %d" % (offset, self.received))
+        if offset + len(data) > len(self.buffer):
+            raise ValueError("chunk ends at %d, past the total size %d" % (offset + len(data), len(self.buffer)))
+        self.view[offset:offset + len(data)] = data
+        self.received += len(data)
+        self._decode_available()
+
+    def _decode_available(self):
+        magic = self._codec.MAGIC
+        if self._binary is None and self.received >= min(len(magic), len(self.buffer)):
+            self._binary = bytes(self.view[:len(magic)]) == magic
+        if not self._binary:
+            return
+        if self._header is None:
+            if self.received < len(magic) + 4:
+                return
+            header_len = struct.unpack_from("<I", self.view, len(magic))[0]
+            if self.received < len(magic) + 4 + header_len:
+                return
+            self._header, self._data_start = self._codec._read_header(self.view)
+        descriptors = self._header["buffers"]
+        while len(self._buffers) < len(descriptors) and \
+                self._codec._buffer_end(self._data_start, descriptors[len(self._buffers)]) <= self.received:
+            self._buffers.append(self._codec._buffer(self.view, self._data_start, descriptors[len(self._buffers)]))
+
+    def result(self):
+        if self.received != len(self.buffer):
+            raise ValueError("received %d of %d bytes" % (self.received, len(self.buffer)))
+        if not self._binary:
+            return decode_message_params(self.buffer)
+        return self._codec._unpack(self._header["params"], self._buffers)
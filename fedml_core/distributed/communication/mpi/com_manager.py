@@ -1,6 +1,6 @@
 import logging
 import queue
-import time
+import threading
 from typing import List
 
 from ..base_com_manager import BaseCommunicationManager
@@ -11,6 +11,9 @@ from ..observer import Observer
 
 
 class MpiCommunicationManager(BaseCommunicationManager):
+    # upper bound on how long the receive loop takes to notice is_running was cleared
+    POLL_TIMEOUT = 1.0
+
     def __init__(self, comm, rank, size, node_type="client"):
         self.comm = comm
         self.rank = rank
@@ -71,15 +74,19 @@ class MpiCommunicationManager(BaseCommunicationManager):
     def handle_receive_message(self):
         self.is_running = True
         while self.is_running:
-            if self.q_receiver.qsize() > 0:
-                msg_params = self.q_receiver.get()
-                self.notify(msg_params)
-
-            time.sleep(0.3)
+            try:
+                msg_params = self.q_receiver.get(timeout=self.POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            if msg_params is None:
+                # sentinel put by stop_receive_message()
+                break
+            self.notify(msg_params)
         logging.info("!!!!!!handle_receive_message stopped!!!")
 
     def stop_receive_message(self):
         self.is_running = False
+        self.q_receiver.put(None)
         self.__stop_thread(self.server_send_thread)
         self.__stop_thread(self.server_receive_thread)
         self.__stop_thread(self.server_collective_thread)
@@ -93,6 +100,6 @@ class MpiCommunicationManager(BaseCommunicationManager):
             observer.receive_message(msg_type, msg_params)
 
     def __stop_thread(self, thread):
-        if thread:
-            thread.raise_exception()
+        if thread and thread is not threading.current_thread():
+            thread.stop()
             thread.join()
@@ -1,4 +1,3 @@
-import ctypes
 import logging
 import threading
 import traceback
@@ -18,9 +17,12 @@ class MPIReceiveThread(threading.Thread):
 
     def run(self):
         logging.debug("Starting Thread:" + self.name + ". Process ID = " + str(self.rank))
-        while True:
+        while not self.stopped():
             try:
                 msg_str = self.comm.recv()
+                if msg_str is None:
+                    # sentinel sent to ourselves by stop()
+                    break
                 msg = Message()
                 msg.init(msg_str)
                 self.q.put(msg)
@@ -29,22 +31,8 @@ class MPIReceiveThread(threading.Thread):
 
     def stop(self):
         self._stop_event.set()
+        # comm.recv() cannot be interrupted, so wake it up with an empty message to this rank
+        self.comm.send(None, dest=self.rank)
 
     def stopped(self):
         return self._stop_event.is_set()
-
-    def get_id(self):
-        # returns id of the respective thread
-        if hasattr(self, '_thread_id'):
-            return self._thread_id
-        for id, thread in threading._active.items():
-            if thread is self:
-                return id
-
-    def raise_exception(self):
-        thread_id = self.get_id()
-        res = ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id,
-                                                         ctypes.py_object(SystemExit))
-        if res > 1:
-            ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, 0)
-            print('Exception raise failure')
\ No newline at end of file
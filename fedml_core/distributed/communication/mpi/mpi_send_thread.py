@@ -1,7 +1,5 @@
-import ctypes
 import logging
 import threading
-import time
 import traceback
 
 from ..message import Message
@@ -20,34 +18,19 @@ class MPISendThread(threading.Thread):
     def run(self):
         logging.debug("Starting " + self.name + ". Process ID = " + str(self.rank))
         while True:
+            msg = self.q.get()
+            if msg is None:
+                # sentinel put by stop(); everything queued before it has been sent
+                break
             try:
-                if not self.q.empty():
-                    msg = self.q.get()
-                    dest_id = msg.get(Message.MSG_ARG_KEY_RECEIVER)
-                    self.comm.send(msg.to_string(), dest=dest_id)
-                else:
-                    time.sleep(0.003)
+                dest_id = msg.get(Message.MSG_ARG_KEY_RECEIVER)
+                self.comm.send(msg.to_string(), dest=dest_id)
             except Exception:
                 traceback.print_exc()
 
     def stop(self):
         self._stop_event.set()
+        self.q.put(None)
 
     def stopped(self):
         return self._stop_event.is_set()
-
-    def get_id(self):
-        # returns id of the respective thread
-        if hasattr(self, '_thread_id'):
-            return self._thread_id
-        for id, thread in threading._active.items():
-            if thread is self:
-                return id
-
-    def raise_exception(self):
-        thread_id = self.get_id()
-        res = ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id,
-                                                         ctypes.py_object(SystemExit))
-        if res > 1:
-            ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, 0)
-            print('Exception raise failure')
@@ -8,12 +8,15 @@ import paho.mqtt.client as mqtt
 
 from FedML.fedml_core.distributed.communication.base_com_manager import BaseCommunicationManager
 from FedML.fedml_core.distributed.communication.message import Message
+from FedML.fedml_core.distributed.communication.message_codec import BinaryMessageCodec, JsonMessageCodec
 from FedML.fedml_core.distributed.communication.observer import Observer
 
 
 class MqttCommManager(BaseCommunicationManager):
-    def __init__(self, host, port, topic='fedml', client_id=0, client_num=0):
+    def __init__(self, host, port, topic='fedml', client_id=0, client_num=0, is_mobile=False):
         self._unacked_sub = list()
+        # mobile peers parse the params as JSON (the tensors are sent as lists), the others get the binary format
+        self._codec = JsonMessageCodec() if is_mobile else BinaryMessageCodec()
         self._observers: List[Observer] = []
         self._topic = topic
         if client_id is None:
@@ -70,9 +73,8 @@ class MqttCommManager(BaseCommunicationManager):
             print(result)
 
     def _on_message(self, client, userdata, msg):
-        msg.payload = str(msg.payload, encoding='utf-8')
         # print("_on_message: " + str(msg.payload))
-        self._notify(str(msg.payload))
+        self._notify(msg.payload)
 
     @staticmethod
     def _on_disconnect(client, userdata, rc):
@@ -91,7 +93,7 @@ class MqttCommManager(BaseCommunicationManager):
     def _notify(self, msg):
         # print("_notify: " + msg)
         msg_params = Message()
-        msg_params.init_from_json_string(str(msg))
+        msg_params.init_from_bytes(msg)
         msg_type = msg_params.get_type()
         for observer in self._observers:
             observer.receive_message(msg_type, msg_params)
@@ -112,12 +114,12 @@ class MqttCommManager(BaseCommunicationManager):
             receiver_id = msg.get_receiver_id()
             topic = self._topic + str(0) + "_" + str(receiver_id)
             logging.info("topic = %s" % str(topic))
-            payload = msg.to_json()
+            payload = msg.to_bytes(self._codec)
             self._client.publish(topic, payload=payload)
             logging.info("sent")
         else:
             # client
-            self._client.publish(self._topic + str(self.client_id), payload=msg.to_json())
+            self._client.publish(self._topic + str(self.client_id), payload=msg.to_bytes(self._codec))
 
     def handle_receive_message(self):
         pass
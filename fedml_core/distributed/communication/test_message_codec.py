@@ -0,0 +1,113 @@
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from fedml_core.distributed.communication.message import Message
+from fedml_core.distributed.communication.message_codec import BinaryMessageCodec, JsonMessageCodec, \
+    MessageStreamDecoder, decode_message_params
+
+
+class BinaryMessageCodecTest(unittest.TestCase):
+
+    def round_trip(self, value):
+        codec = BinaryMessageCodec()
+        return codec.decode(codec.encode({"value": value}))["value"]
+
+    def test_tensors_and_arrays(self):
+        params = OrderedDict([("w", torch.randn(3, 4)), ("b", torch.zeros(0)), ("n", torch.arange(5))])
+        decoded = self.round_trip({"model": params, "idx": np.arange(7, dtype=np.int32), 3: "int key"})
+        for k, v in params.items():
+            self.assertTrue(torch.equal(decoded["model"][k], v))
+            self.assertEqual(decoded["model"][k].dtype, v.dtype)
+        self.assertTrue(np.array_equal(decoded["idx"], np.arange(7, dtype=np.int32)))
+        self.assertEqual(decoded[3], "int key")
+
+    def test_list_and_tuple_of_tensors(self):
+        acts, labels = torch.randn(2, 8, requires_grad=True) * 2, torch.tensor([1, 0])
+        decoded = self.round_trip((acts, labels))
+        self.assertIsInstance(decoded, tuple)
+        self.assertTrue(torch.equal(decoded[0], acts.detach()))
+        self.assertTrue(decoded[0].requires_grad)
+        self.assertTrue(torch.equal(decoded[1], labels))
+
+        decoded = self.round_trip([torch.ones(2), [np.ones(3), (1, "a")], None])
+        self.assertIsInstance(decoded, list)
+        self.assertTrue(torch.equal(decoded[0], torch.ones(2)))
+        self.assertTrue(np.array_equal(decoded[1][0], np.ones(3)))
+        self.assertEqual(decoded[1][1], (1, "a"))
+        self.assertIsNone(decoded[2])
+
+    def test_numpy_scalars(self):
+        decoded = self.round_trip({"count": np.int64(42), "loss": np.float32(0.5), "flag": np.bool_(True)})
+        self.assertEqual(decoded, {"count": 42, "loss": 0.5, "flag": True})
+        self.assertIsInstance(decoded["count"], int)
+        self.assertIsInstance(decoded["loss"], float)
+
+    def test_unsupported_values_are_rejected(self):
+        for value in [{1, 2, 3}, 1 + 2j, b"\x00\x01", object()]:
+            with self.assertRaises(TypeError):
+                BinaryMessageCodec().encode({"value": value})
+
+    def test_pickle_payload_is_rejected(self):
+        value = {"classes": {1, 2, 3}, "complex": 1 + 2j}
+        payload = BinaryMessageCodec(allow_pickle=True).encode({"value": value})
+        with self.assertRaises(ValueError):
+            BinaryMessageCodec().decode(payload)
+        with self.assertRaises(ValueError):
+            decode_message_params(payload)
+        with self.assertRaises(ValueError):
+            Message().init_from_bytes(payload)
+        self.assertEqual(decode_message_params(payload, allow_pickle=True)["value"], value)
+
+    def test_message_round_trip(self):
+        msg = Message(7, 1, 0)
+        msg.add_params("acts", (torch.randn(4, 2), torch.tensor([0, 1, 1, 0])))
+        msg.add_params("num_samples", np.int64(10))
+        decoded = Message()
+        decoded.init_from_bytes(msg.to_bytes())
+        self.assertEqual(decoded.get_type(), 7)
+        self.assertEqual(decoded.get("num_samples"), 10)
+        self.assertTrue(torch.equal(decoded.get("acts")[0], msg.get("acts")[0]))
+
+    def test_chunks_and_stream_decoder(self):
+        params = {"model": OrderedDict([("w", torch.randn(33, 7)), ("b", torch.randn(5).double())]),
+                  "idx": np.arange(11), "round": 3}
+        for codec in [BinaryMessageCodec(), JsonMessageCodec()]:
+            value = params if isinstance(codec, BinaryMessageCodec) else {"round": 3, "name": "x" * 300}
+            payload = bytes(codec.encode(value))
+            for chunk_size in [1, 7, 64, 1000, len(payload)]:
+                chunks = codec.encode_chunks(value, chunk_size)
+                self.assertEqual(b"".join(chunks), payload)
+                self.assertTrue(all(len(chunk) <= chunk_size for chunk in chunks))
+
+                decoder = MessageStreamDecoder(len(payload))
+                offset = 0
+                for chunk in chunks:
+                    decoder.feed(offset, chunk)
+                    offset += len(chunk)
+                decoded = decoder.result()
+                if isinstance(codec, JsonMessageCodec):
+                    self.assertEqual(decoded, value)
+                    continue
+                for k, v in params["model"].items():
+                    self.assertTrue(torch.equal(decoded["model"][k], v))
+                self.assertTrue(np.array_equal(decoded["idx"], params["idx"]))
+                self.assertEqual(decoded["round"], 3)
+
+    def test_stream_decoder_rejects_bad_streams(self):
+        payload = bytes(BinaryMessageCodec().encode({"w": torch.ones(100)}))
+        decoder = MessageStreamDecoder(len(payload))
+        decoder.feed(0, payload[:10])
+        with self.assertRaises(ValueError):
+            decoder.feed(20, payload[20:30])
+        with self.assertRaises(ValueError):
+            decoder.result()
+
+    def test_json_payload_still_decodes(self):
+        self.assertEqual(decode_message_params('{"msg_type": 1, "sender": 0}'), {"msg_type": 1, "sender": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
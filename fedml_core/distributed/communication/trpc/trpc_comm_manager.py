@@ -2,6 +2,7 @@ import csv
 import decimal
 import logging
 import os
+import queue
 import threading
 import time
 from typing import List
@@ -15,6 +16,7 @@ from torch.distributed import rpc
 from .trpc_server import TRPCCOMMServicer
 from ...communication.base_com_manager import BaseCommunicationManager
 from ...communication.message import Message
+from ...communication.message_codec import BinaryMessageCodec
 from ...communication.observer import Observer
 
 lock = threading.Lock()
@@ -24,6 +26,10 @@ WORKER = "worker{}"
 
 
 class TRPCCommManager(BaseCommunicationManager):
+    # upper bound on how long the receive loop takes to notice is_running was cleared
+    POLL_TIMEOUT = 1.0
+    TRUSTED_CODEC = BinaryMessageCodec(allow_pickle=True)
+
     def __init__(
         self,
         trpc_master_config_path,
@@ -110,8 +116,12 @@ class TRPCCommManager(BaseCommunicationManager):
 
         logging.info("sending message to {}".format(receiver_id))
 
+        # the encoded message travels as one uint8 tensor so TensorPipe moves it as a raw buffer
+        # the peers are ranks of the same job, so values the binary format cannot hold may be pickled
+        payload = torch.frombuffer(msg.to_bytes(self.TRUSTED_CODEC), dtype=torch.uint8)
+
         # Should I wait?
-        rpc.rpc_sync(WORKER.format(receiver_id), TRPCCOMMServicer.sendMessage, args=(self.process_id, msg))
+        rpc.rpc_sync(WORKER.format(receiver_id), TRPCCOMMServicer.sendMessage, args=(self.process_id, payload))
 
         logging.debug("sent")
 
@@ -127,16 +137,24 @@ class TRPCCommManager(BaseCommunicationManager):
 
     def message_handling_subroutine(self):
         while self.is_running:
-            if self.trpc_servicer.message_q.qsize() > 0:
-                lock.acquire()
-                msg = self.trpc_servicer.message_q.get()
-                self.notify(msg)
-                lock.release()
+            try:
+                payload = self.trpc_servicer.message_q.get(timeout=self.POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            if payload is None:
+                # sentinel put by stop_receive_message()
+                break
+            lock.acquire()
+            msg = Message()
+            msg.init_from_bytes(payload.numpy(), allow_pickle=True)
+            self.notify(msg)
+            lock.release()
         return
 
     def stop_receive_message(self):
         rpc.shutdown()
         self.is_running = False
+        self.trpc_servicer.message_q.put(None)
 
     def notify(self, message: Message):
         msg_type = message.get_type()
@@ -24,7 +24,8 @@ class ServerManager(Observer):
             HOST = "0.0.0.0"
             # HOST = "broker.emqx.io"
             PORT = 1883
-            self.com_manager = MqttCommManager(HOST, PORT, client_id=rank, client_num=size - 1)
+            self.com_manager = MqttCommManager(HOST, PORT, client_id=rank, client_num=size - 1,
+                                               is_mobile=getattr(args, "is_mobile", 0) == 1)
         elif backend == "GRPC":
             HOST = "0.0.0.0"
             PORT = 50000 + rank
@@ -55,6 +56,9 @@ class ServerManager(Observer):
     def send_message(self, message):
         self.com_manager.send_message(message)
 
+    def flush(self):
+        self.com_manager.flush()
+
     @abstractmethod
     def register_message_receive_handlers(self) -> None:
         pass
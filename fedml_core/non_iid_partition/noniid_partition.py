@@ -33,44 +33,83 @@ def non_iid_partition_with_dirichlet_distribution(label_list,
             samples : ndarray,
                 The drawn samples, of shape ``(size, k)``.
     """
-    net_dataidx_map = {}
-    K = classes
+    flat_idx, offsets = dirichlet_partition_offsets(label_list, client_num, classes, alpha, task)
+    net_dataidx_map = {i: flat_idx[offsets[i]:offsets[i + 1]] for i in range(client_num)}
 
-    # For multiclass labels, the list is ragged and not a numpy array
-    N = len(label_list) if task == 'segmentation' else label_list.shape[0]
+    return net_dataidx_map
+
+
+def dirichlet_partition_offsets(label_list, client_num, classes, alpha, task='classification'):
+    """
+        Same partition (and the same draws from np.random) as non_iid_partition_with_dirichlet_distribution,
+        returned as a flat index array where client i owns flat_idx[offsets[i]:offsets[i + 1]].
+    """
+    if task == 'segmentation':
+        # For multiclass labels, the list is ragged and not a numpy array
+        N = len(label_list)
+        sample_class = _first_segmentation_class(label_list, classes)
+        class_num = len(classes)
+    else:
+        N = label_list.shape[0]
+        sample_class = np.asarray(label_list).reshape(N)
+        class_num = classes
+
+    # sample indexes grouped by class, ascending within a class like np.where
+    class_order = np.argsort(sample_class, kind='stable')
+    sorted_class = sample_class[class_order]
+    class_start = np.searchsorted(sorted_class, np.arange(class_num), side='left')
+    class_end = np.searchsorted(sorted_class, np.arange(class_num), side='right')
 
     # guarantee the minimum number of sample in each client
     min_size = 0
     while min_size < 10:
-        idx_batch = [[] for _ in range(client_num)]
-
-        if task == 'segmentation':
-            # Unlike classification tasks, here, one instance may have multiple categories/classes
-            for c, cat in enumerate(classes):
-                if c > 0:
-                    idx_k = np.asarray([np.any(label_list[i] == cat) and not np.any(
-                        np.in1d(label_list[i], classes[:c])) for i in
-                                        range(len(label_list))])
-                else:
-                    idx_k = np.asarray(
-                        [np.any(label_list[i] == cat) for i in range(len(label_list))])
-
-                # Get the indices of images that have category = c
-                idx_k = np.where(idx_k)[0]
-                idx_batch, min_size = partition_class_samples_with_dirichlet_distribution(N, alpha, client_num,
-                                                                                          idx_batch, idx_k)
-        else:
-            # for each classification in the dataset
-            for k in range(K):
-                # get a list of batch indexes which are belong to label k
-                idx_k = np.where(label_list == k)[0]
-                idx_batch, min_size = partition_class_samples_with_dirichlet_distribution(N, alpha, client_num,
-                                                                                          idx_batch, idx_k)
+        client_size = np.zeros(client_num, dtype=np.int64)
+        class_idx = []
+        split_counts = np.zeros((class_num, client_num), dtype=np.int64)
+        for k in range(class_num):
+            idx_k = class_order[class_start[k]:class_end[k]].copy()
+            split_counts[k] = _split_class_samples(N, alpha, client_num, client_size, idx_k)
+            client_size += split_counts[k]
+            class_idx.append(idx_k)
+        min_size = client_size.min()
+
+    # lay the class chunks out client by client, keeping class order within a client
+    chunk_owner = np.repeat(np.tile(np.arange(client_num), class_num), split_counts.ravel())
+    flat_idx = np.concatenate(class_idx)[np.argsort(chunk_owner, kind='stable')] if class_idx else \
+        np.zeros(0, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(client_size)])
     for i in range(client_num):
-        np.random.shuffle(idx_batch[i])
-        net_dataidx_map[i] = idx_batch[i]
-
-    return net_dataidx_map
+        np.random.shuffle(flat_idx[offsets[i]:offsets[i + 1]])
+
+    return flat_idx, offsets
+
+
+def _first_segmentation_class(label_list, classes):
+    """Position in classes of the first class each sample contains, len(classes) if it contains none."""
+    N = len(label_list)
+    lengths = np.array([len(np.atleast_1d(labels)) for labels in label_list], dtype=np.int64)
+    sample_class = np.full(N, len(classes), dtype=np.int64)
+    if lengths.sum() == 0 or len(classes) == 0:
+        return sample_class
+    flat_labels = np.concatenate([np.atleast_1d(labels) for labels in label_list])
+    classes = np.asarray(classes)
+    class_sort = np.argsort(classes, kind='stable')
+    pos = np.searchsorted(classes[class_sort], flat_labels)
+    pos = np.minimum(pos, len(classes) - 1)
+    found = classes[class_sort][pos] == flat_labels
+    label_class = np.where(found, class_sort[pos], len(classes))
+    np.minimum.at(sample_class, np.repeat(np.arange(N), lengths), label_class)
+    return sample_class
+
+
+def _split_class_samples(N, alpha, client_num, client_size, idx_k):
+    """Shuffles idx_k in place and returns how many of its samples go to each client."""
+    np.random.shuffle(idx_k)
+    proportions = np.random.dirichlet(np.repeat(alpha, client_num))
+    proportions = proportions * (client_size < N / client_num)
+    proportions = proportions / proportions.sum()
+    proportions = (np.cumsum(proportions) * len(idx_k)).astype(int)[:-1]
+    return np.diff(np.concatenate([[0], proportions, [len(idx_k)]]))
 
 
 def partition_class_samples_with_dirichlet_distribution(N, alpha, client_num, idx_batch, idx_k):
@@ -0,0 +1,68 @@
+import torch
+from torch.utils.data import BatchSampler, DataLoader, RandomSampler, SequentialSampler, TensorDataset
+from torch.utils.data._utils.collate import default_collate
+
+
+class TensorBatcher(object):
+    """Batches of a TensorDataset sliced directly out of its tensors, without per-sample __getitem__ and collate.
+
+    Yields the same batches in the same order as the DataLoader it replaces, and draws the same numbers from
+    the global torch RNG, so switching between the two does not change a seeded run.
+    """
+
+    def __init__(self, data_loader, device=None):
+        self.dataset = data_loader.dataset
+        self.batch_size = data_loader.batch_size
+        self.drop_last = data_loader.drop_last
+        self.shuffle = isinstance(data_loader.sampler, RandomSampler)
+        self.generator = data_loader.generator
+        self.sampler_generator = data_loader.sampler.generator if self.shuffle else None
+        # the client's data is small, it is moved to the device once instead of batch by batch
+        self.tensors = [t.to(device) if device is not None else t for t in self.dataset.tensors]
+
+    def __len__(self):
+        n = len(self.dataset)
+        if self.drop_last:
+            return n // self.batch_size
+        return (n + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        n = len(self.dataset)
+        # same RNG draws as a DataLoader iteration: the worker base seed, then the sampler seed
+        torch.empty((), dtype=torch.int64).random_(generator=self.generator)
+        perm = None
+        if self.shuffle:
+            generator = self.sampler_generator
+            if generator is None:
+                generator = torch.Generator()
+                generator.manual_seed(int(torch.empty((), dtype=torch.int64).random_().item()))
+            perm = torch.randperm(n, generator=generator).to(self.tensors[0].device)
+        for start in range(0, n, self.batch_size):
+            end = min(start + self.batch_size, n)
+            if self.drop_last and end - start < self.batch_size:
+                break
+            if perm is None:
+                yield [t[start:end] for t in self.tensors]
+            else:
+                index = perm[start:end]
+                yield [t.index_select(0, index) for t in self.tensors]
+
+
+def is_tensor_loader(data_loader):
+    if not isinstance(data_loader, DataLoader) or type(data_loader.dataset) is not TensorDataset:
+        return False
+    if data_loader.num_workers != 0 or data_loader.collate_fn is not default_collate or data_loader.batch_size is None:
+        return False
+    if type(data_loader.batch_sampler) is not BatchSampler:
+        return False
+    sampler = data_loader.sampler
+    if type(sampler) is RandomSampler:
+        return not sampler.replacement and sampler._num_samples is None
+    return type(sampler) is SequentialSampler
+
+
+def get_batch_iterator(train_data, device=None):
+    """Fast path for clients whose data is a TensorDataset behind a plain DataLoader, anything else is returned as is."""
+    if is_tensor_loader(train_data):
+        return TensorBatcher(train_data, device)
+    return train_data
@@ -78,6 +78,7 @@ def add_args(parser):
     parser.add_argument('--fedcs_time', type=int, default=65)
     parser.add_argument('--tifl_mode', type=str, default='prob')  # "prob" or "credit"
     parser.add_argument('--resume_dir', type=str, default='none')
+    parser.add_argument('--aggregation_mode', type=str, default='buffered')  # "buffered" or "incremental"
     # Oort params
 
     parser.add_argument('--pacer_delta', type=float, default=5)
@@ -97,6 +97,16 @@ def add_args(parser):
     parser.add_argument('--gpu_num_per_server', type=int, default=8,
                         help='gpu_num_per_server')
 
+    parser.add_argument('--feature_compression', type=str, default='none',
+                        help='how clients send the extracted feature maps: none (float32), fp16 or int8')
+
+    parser.add_argument('--server_feature_store_dir', type=str, default='',
+                        help='keep the received features in memory-mapped files under this directory')
+
+    parser.add_argument('--server_batch_size', type=int, default=0,
+                        help='train the server model on shuffled batches of this size drawn across clients; '
+                             '0 replays every client\'s own batches')
+
     args = parser.parse_args()
     return args
 
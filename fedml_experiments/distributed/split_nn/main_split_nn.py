@@ -68,6 +68,12 @@ def add_args(parser):
 
     parser.add_argument('--gpu_num_per_server', type=int, default=4,
                         help='gpu_num_per_server')
+
+    parser.add_argument('--pipeline_micro_batches', type=int, default=1,
+                        help='batches a client keeps in flight to the server; 1 is the lock-step protocol')
+
+    parser.add_argument('--pipeline_staleness', type=int, default=0,
+                        help='max optimizer steps between a batch\'s forward pass and the application of its gradient')
     args = parser.parse_args()
     return args
 
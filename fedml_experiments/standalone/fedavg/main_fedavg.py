@@ -88,6 +88,10 @@ def add_args(parser):
 
     parser.add_argument('--ci', type=int, default=0,
                         help='CI')
+
+    parser.add_argument('--client_parallel_workers', type=int, default=0,
+                        help='number of processes training the clients of a round in parallel (CPU only), '
+                             '0 trains them one after another')
     return parser
 
 